@@ -0,0 +1,306 @@
+"""Performance baseline for the download queue, driven by the stand-in yt-dlp in fake_ytdlp.py.
+
+Runs the window offscreen with the yt-dlp executable engine and reports, for each number of
+concurrent jobs: output lines parsed per second, UI event-loop latency, spawn overhead (job
+start to its first progress line), and resident memory and thread count of the app process. Each job count runs
+in a fresh process, so memory figures do not carry over.
+
+    python benchmarks/bench.py
+    python benchmarks/bench.py --jobs 1 8 32 --lines 2000 --rate 0 --json baseline.json
+    python benchmarks/bench.py --baseline baseline.json     # show changes against an earlier run
+"""
+import argparse
+import json
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+# The event loop is probed this often (ms); how late each tick fires is the UI latency
+PROBE_INTERVAL_MS = 5
+# Memory is sampled every this many probe ticks
+RSS_SAMPLE_TICKS = 10
+
+# (label, key, format, whether higher is better) of the figures in the report
+REPORT_COLUMNS = [
+    ("lines/s", 'lines_per_sec', "{:.0f}", True),
+    ("spawn p50 ms", 'spawn_p50_ms', "{:.1f}", False),
+    ("spawn max ms", 'spawn_max_ms', "{:.1f}", False),
+    ("UI p50 ms", 'ui_latency_p50_ms', "{:.1f}", False),
+    ("UI p99 ms", 'ui_latency_p99_ms', "{:.1f}", False),
+    ("UI max ms", 'ui_latency_max_ms', "{:.1f}", False),
+    ("RSS start MiB", 'rss_start_mb', "{:.1f}", False),
+    ("RSS peak MiB", 'rss_peak_mb', "{:.1f}", False),
+    ("threads start", 'threads_start', "{:d}", False),
+    ("threads peak", 'threads_peak', "{:d}", False),
+    ("wall s", 'wall_s', "{:.2f}", False),
+]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def make_launcher(directory):
+    """An executable that runs fake_ytdlp.py with this interpreter, to stand in for yt-dlp."""
+    fake = os.path.join(HERE, 'fake_ytdlp.py')
+    if os.name == 'nt':
+        path = os.path.join(directory, 'yt-dlp.cmd')
+        with open(path, 'w') as launcher:
+            launcher.write(f'@"{sys.executable}" "{fake}" %*\n')
+    else:
+        path = os.path.join(directory, 'yt-dlp')
+        with open(path, 'w') as launcher:
+            launcher.write(f'#!/bin/sh\nexec "{sys.executable}" "{fake}" "$@"\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def thread_count():
+    """Threads of this process, Qt's and the OS's own included where they can be listed."""
+    try:
+        return len(os.listdir('/proc/self/task'))
+    except OSError:
+        return threading.active_count()
+
+
+def isolate_user_dirs(directory):
+    """Point the app's settings, caches and job store at a scratch directory."""
+    for name in ('HOME', 'XDG_CONFIG_HOME', 'XDG_DATA_HOME', 'XDG_CACHE_HOME', 'APPDATA', 'LOCALAPPDATA'):
+        os.environ[name] = directory
+
+
+def bench_parse(lines):
+    """Lines per second through parse_progress_line alone, on the fake's synthetic output."""
+    from fake_ytdlp import synthetic_output
+    from yt_dlp_core import PROGRESS_TEMPLATE, POSTPROCESS_TEMPLATE, parse_progress_line
+    argv = ['--progress-template', f'download:{PROGRESS_TEMPLATE}',
+            '--progress-template', f'postprocess:{POSTPROCESS_TEMPLATE}', 'https://example.com/parse']
+    sample = list(synthetic_output(argv, lines, 50))
+    started = time.perf_counter()
+    for line in sample:
+        parse_progress_line(line)
+    return len(sample) / (time.perf_counter() - started)
+
+
+def bench_queue(jobs, timeout):
+    """Run ``jobs`` fake downloads at once through the window and measure them."""
+    from PyQt5.QtCore import QEventLoop, QTimer
+    from PyQt5.QtWidgets import QApplication
+    from yt_dlp_core import ENGINE_SUBPROCESS, UiUpdateBuffer, DownloadJob, current_rss_mb
+    from yt_dlp_gui import ModernYTDLPGUI
+
+    class CountingBuffer(UiUpdateBuffer):
+        """Update buffer that also counts what each job delivers and when its progress began.
+
+        The first progress line marks the fake process as up; log lines can come earlier, from
+        the task itself.
+        """
+
+        def __init__(self):
+            super().__init__()
+            self.counts = {}
+            self.first_progress = {}
+
+        def _count(self, key, progress=False):
+            # A job's output arrives on the reactor thread, its retry progress on the steps
+            # thread (and in-process engines write from their own), so take the buffer's lock
+            with self._lock:
+                if progress and key not in self.first_progress:
+                    self.first_progress[key] = time.perf_counter()
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+        def add_line(self, key, line):
+            self._count(key)
+            super().add_line(key, line)
+
+        def set_progress(self, key, event):
+            self._count(key, progress=True)
+            super().set_progress(key, event)
+
+    app = QApplication.instance() or QApplication([])
+    window = ModernYTDLPGUI()
+    window.engine_combo.setCurrentIndex(window.engine_combo.findData(ENGINE_SUBPROCESS))
+    for checkbox in (window.playlist_cb, window.archive_cb, window.metadata_cache_cb):
+        checkbox.setChecked(False)
+    window.speed_limit_spin.setValue(0)
+    window.speed_schedule_input.clear()
+    window.apply_bandwidth_settings()
+    window.site_max_spin.setValue(0)
+    window.site_interval_spin.setValue(0)
+    window.max_workers_spin.setMaximum(max(jobs, window.max_workers_spin.maximum()))
+    window.max_workers_spin.setValue(jobs)
+    buffer = window.ui_updates = CountingBuffer()
+
+    started = {}
+    start_job = window.start_job
+
+    def timed_start_job(job):
+        started[job] = time.perf_counter()
+        start_job(job)
+    window.start_job = timed_start_job
+
+    latencies = []
+    rss = [current_rss_mb() or 0.0]
+    threads = [thread_count()]
+    last_tick = [time.perf_counter()]
+
+    def probe():
+        now = time.perf_counter()
+        latencies.append(max(0.0, (now - last_tick[0]) * 1000 - PROBE_INTERVAL_MS))
+        last_tick[0] = now
+        if len(latencies) % RSS_SAMPLE_TICKS == 0:
+            rss.append(current_rss_mb() or 0.0)
+            threads.append(thread_count())
+
+    loop = QEventLoop()
+
+    def check_done():
+        if window.job_model.jobs and not window.running_jobs and not window.pending_count:
+            loop.quit()
+
+    probe_timer = QTimer()
+    probe_timer.timeout.connect(probe)
+    done_timer = QTimer()
+    done_timer.timeout.connect(check_done)
+    QTimer.singleShot(int(timeout * 1000), loop.quit)
+
+    output_dir = os.path.join(os.environ['XDG_DATA_HOME'], 'downloads')
+    urls = [f"https://bench.invalid/video/{index}" for index in range(jobs)]
+    begin = time.perf_counter()
+    last_tick[0] = begin
+    probe_timer.start(PROBE_INTERVAL_MS)
+    done_timer.start(20)
+    window.enqueue_jobs(urls, window.collect_options(), output_dir)
+    window.schedule_jobs()
+    loop.exec_()
+    wall = time.perf_counter() - begin
+    probe_timer.stop()
+    done_timer.stop()
+    window.flush_ui_updates()
+    rss.append(current_rss_mb() or 0.0)
+
+    spawn = [(buffer.first_progress[job] - started[job]) * 1000 for job in started if job in buffer.first_progress]
+    result = {
+        'jobs': jobs,
+        'done': sum(job.state == DownloadJob.DONE for job in window.job_model.jobs),
+        'lines': sum(buffer.counts.values()),
+        'wall_s': wall,
+        'lines_per_sec': sum(buffer.counts.values()) / wall,
+        'spawn_p50_ms': percentile(spawn, 0.5),
+        'spawn_max_ms': max(spawn, default=0.0),
+        'ui_latency_p50_ms': percentile(latencies, 0.5),
+        'ui_latency_p99_ms': percentile(latencies, 0.99),
+        'ui_latency_max_ms': max(latencies, default=0.0),
+        'rss_start_mb': rss[0],
+        'rss_peak_mb': max(rss),
+        'rss_end_mb': rss[-1],
+        'threads_start': threads[0],
+        'threads_peak': max(threads),
+    }
+    if window.job_store:
+        window.job_store.close()
+    app.processEvents()
+    return result
+
+
+def run_single(args):
+    """Child process body: one job count, result printed as a JSON line."""
+    scratch = tempfile.mkdtemp(prefix='ytdlp-gui-bench-')
+    isolate_user_dirs(scratch)
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ['YT_DLP_GUI_YTDLP'] = make_launcher(scratch)
+    os.environ['FAKE_YTDLP_LINES'] = str(args.lines)
+    os.environ['FAKE_YTDLP_RATE'] = str(args.rate)
+    os.environ['FAKE_YTDLP_STARTUP'] = str(args.startup)
+    if args.replay:
+        os.environ['FAKE_YTDLP_REPLAY'] = os.path.abspath(args.replay)
+    print(json.dumps(bench_queue(args.run, args.timeout)), flush=True)
+    # Skip Qt's teardown of the window and worker threads; only the figures matter here
+    os._exit(0)
+
+
+def format_row(label, result, baseline):
+    cells = [f"{label:>6}"]
+    for _, key, fmt, higher_is_better in REPORT_COLUMNS:
+        cell = fmt.format(result[key])
+        old = baseline.get(key) if baseline else None
+        if old:
+            change = (result[key] - old) / old * 100
+            worse = change < 0 if higher_is_better else change > 0
+            cell += f" ({change:+.0f}%{'!' if worse and abs(change) >= 10 else ''})"
+        cells.append(cell)
+    return cells
+
+
+def print_report(report, baseline):
+    print(f"Parser alone: {report['parse_lines_per_sec']:.0f} lines/s")
+    headers = ["jobs"] + [label for label, *_ in REPORT_COLUMNS]
+    rows = [headers]
+    for jobs, result in report['runs'].items():
+        previous = baseline.get('runs', {}).get(jobs) if baseline else None
+        rows.append(format_row(jobs, result, previous))
+    widths = [max(len(row[column]) for row in rows) for column in range(len(headers))]
+    for row in rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+    for jobs, result in report['runs'].items():
+        if result['done'] != result['jobs']:
+            print(f"warning: only {result['done']} of {result['jobs']} jobs finished in the {jobs}-job run")
+    if baseline:
+        print("(changes against the baseline; '!' marks a regression of 10% or more)")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the download queue against a fake yt-dlp")
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 8, 32], help="Concurrent job counts to run")
+    parser.add_argument('--lines', type=int, default=2000, help="Progress lines per fake download")
+    parser.add_argument('--rate', type=float, default=0, help="Lines per second per job (0 = as fast as possible)")
+    parser.add_argument('--startup', type=float, default=0, help="Simulated extraction time per job (seconds)")
+    parser.add_argument('--replay', metavar='FILE', help="Replay recorded yt-dlp output instead of synthetic lines")
+    parser.add_argument('--timeout', type=float, default=300, help="Give up on a run after this many seconds")
+    parser.add_argument('--json', metavar='FILE', help="Write the results to FILE, e.g. as a baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="Compare against results written with --json")
+    parser.add_argument('--run', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.run:
+        run_single(args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as stored:
+            baseline = json.load(stored)
+    report = {
+        'settings': {'lines': args.lines, 'rate': args.rate, 'startup': args.startup, 'replay': args.replay},
+        'parse_lines_per_sec': bench_parse(max(args.lines, 10000)),
+        'runs': {},
+    }
+    child_args = [sys.executable, os.path.abspath(__file__), '--lines', str(args.lines), '--rate', str(args.rate),
+                  '--startup', str(args.startup), '--timeout', str(args.timeout)]
+    if args.replay:
+        child_args += ['--replay', args.replay]
+    for jobs in args.jobs:
+        child = subprocess.run(child_args + ['--run', str(jobs)], capture_output=True, text=True)
+        lines = child.stdout.strip().splitlines()
+        if child.returncode != 0 or not lines:
+            print(f"{jobs}-job run failed:\n{child.stderr}", file=sys.stderr)
+            return 1
+        report['runs'][str(jobs)] = json.loads(lines[-1])
+
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as out:
+            json.dump(report, out, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,135 @@
+"""Stand-in for the yt-dlp executable that prints synthetic or recorded output, for benchmarks.
+
+It renders the ``--progress-template`` arguments it is given the way yt-dlp would, so the app
+parses exactly what it parses in real use. Behaviour is set through environment variables:
+
+    FAKE_YTDLP_LINES    progress lines per download (default 200)
+    FAKE_YTDLP_RATE     lines per second, 0 = as fast as possible (default 0)
+    FAKE_YTDLP_STARTUP  seconds of "extraction" before the first progress line (default 0)
+    FAKE_YTDLP_NOISE    print a plain log line after every N progress lines, 0 = never (default 50)
+    FAKE_YTDLP_EXIT     exit code (default 0); non-zero exits print FAKE_YTDLP_ERROR to stderr
+    FAKE_YTDLP_ERROR    error line for failing runs
+    FAKE_YTDLP_REPLAY   file of recorded yt-dlp output to replay (at FAKE_YTDLP_RATE) instead
+"""
+import json
+import os
+import re
+import sys
+import time
+
+FIELD_RE = re.compile(r'%\((?:progress\.|info\.)?(\w+)(?:\|([^)]*))?\)([sjd])')
+DEFAULT_ERROR = "ERROR: [generic] fake: Unable to download webpage: HTTP Error 500: Internal Server Error"
+TOTAL_BYTES = 50 * 1024 * 1024
+
+
+def render(template, fields):
+    """Fill a yt-dlp output template with ``fields`` (``|default`` and the s/d/j conversions)."""
+    def substitute(match):
+        name, default, conversion = match.groups()
+        value = fields.get(name)
+        if conversion == 'j':
+            return json.dumps(value)
+        if value is None:
+            return default if default is not None else 'NA'
+        return str(value)
+    return FIELD_RE.sub(substitute, template)
+
+
+def progress_templates(argv):
+    templates = {}
+    for index, arg in enumerate(argv[:-1]):
+        if arg == '--progress-template':
+            kind, _, template = argv[index + 1].partition(':')
+            templates[kind] = template
+    return templates
+
+
+def output_dir(argv):
+    if '-o' in argv[:-1]:
+        return os.path.dirname(argv[argv.index('-o') + 1]) or '.'
+    return '.'
+
+
+class Pacer:
+    """Spread lines evenly at ``rate`` per second (0 = no pacing)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.started = time.perf_counter()
+        self.count = 0
+
+    def emit(self, line):
+        if self.rate:
+            delay = self.started + self.count / self.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.count += 1
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+
+def synthetic_output(argv, lines, noise):
+    templates = progress_templates(argv)
+    url = argv[-1] if argv else 'https://example.com/video'
+    video_id = re.sub(r'\W+', '_', url.rstrip('/').rsplit('/', 1)[-1]) or 'video'
+    filename = os.path.join(output_dir(argv), f"{video_id}.mp4")
+    download = templates.get('download')
+    yield f"[generic] Extracting URL: {url}"
+    yield f"[info] {video_id}: Downloading 1 format(s): 18"
+    yield f"[download] Destination: {filename}"
+    started = time.time()
+    for index in range(1, lines + 1):
+        downloaded = TOTAL_BYTES * index // lines
+        fields = {
+            'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': TOTAL_BYTES,
+            'speed': 5 * 1024 * 1024.0, 'eta': (TOTAL_BYTES - downloaded) // (5 * 1024 * 1024),
+            'elapsed': round(time.time() - started, 3), 'filename': filename,
+        }
+        if download:
+            yield render(download, fields)
+        else:
+            yield f"[download] {downloaded * 100 / TOTAL_BYTES:5.1f}% of 50.00MiB at 5.00MiB/s ETA 00:{fields['eta']:02d}"
+        if noise and index % noise == 0:
+            yield f"[debug] fake line {index} for {video_id}"
+    if download:
+        yield render(download, dict(fields, status='finished', eta=None))
+    postprocess = templates.get('postprocess')
+    for status in ('started', 'finished'):
+        if postprocess:
+            yield render(postprocess, {'status': status, 'postprocessor': 'MoveFiles', 'filepath': filename})
+
+
+def main(argv):
+    if '--version' in argv:
+        print('2099.01.01.fake')
+        return 0
+    if '-U' in argv:
+        print('yt-dlp is up to date (fake)')
+        return 0
+    if '-J' in argv:
+        url = argv[-1]
+        print(json.dumps({'id': 'fake', 'title': 'fake', 'webpage_url': url, 'extractor': 'generic',
+                          '_type': 'video', 'entries': None}))
+        return 0
+
+    time.sleep(float(os.environ.get('FAKE_YTDLP_STARTUP', 0)))
+    pacer = Pacer(float(os.environ.get('FAKE_YTDLP_RATE', 0)))
+    replay = os.environ.get('FAKE_YTDLP_REPLAY')
+    if replay:
+        with open(replay, encoding='utf-8', errors='replace') as recorded:
+            for line in recorded:
+                pacer.emit(line.rstrip('\r\n'))
+    else:
+        lines = int(os.environ.get('FAKE_YTDLP_LINES', 200))
+        noise = int(os.environ.get('FAKE_YTDLP_NOISE', 50))
+        for line in synthetic_output(argv, lines, noise):
+            pacer.emit(line)
+
+    exit_code = int(os.environ.get('FAKE_YTDLP_EXIT', 0))
+    if exit_code:
+        print(os.environ.get('FAKE_YTDLP_ERROR', DEFAULT_ERROR), file=sys.stderr, flush=True)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
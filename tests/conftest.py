@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The app's modules sit at the top of the repository, the yt-dlp stand-in in benchmarks/
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+
+@pytest.fixture
+def fake_ytdlp(tmp_path, monkeypatch):
+    """Run downloads with benchmarks/fake_ytdlp.py as yt-dlp, and keep settings and caches in tmp_path."""
+    from bench import make_launcher
+    for name in ('HOME', 'XDG_CONFIG_HOME', 'XDG_DATA_HOME', 'XDG_CACHE_HOME', 'APPDATA', 'LOCALAPPDATA'):
+        monkeypatch.setenv(name, str(tmp_path))
+    monkeypatch.setenv('YT_DLP_GUI_YTDLP', make_launcher(str(tmp_path)))
+    monkeypatch.setenv('FAKE_YTDLP_LINES', '5')
+    return tmp_path
@@ -0,0 +1,32 @@
+import pytest
+
+from yt_dlp_core import split_bandwidth
+
+
+@pytest.mark.parametrize('total', [1, 2, 3, 5, 7, 10, 99, 1000])
+@pytest.mark.parametrize('jobs', [1, 3, 8, 40])
+def test_shares_never_exceed_the_total(total, jobs):
+    shares = split_bandwidth(total, [None] * jobs)
+    assert sum(shares) <= total
+    # A share of 0 would mean unlimited
+    assert all(share > 0 for share in shares)
+
+
+def test_whole_shares_add_up_to_the_total():
+    assert split_bandwidth(10, [None, None, None]) == [4, 3, 3]
+
+
+def test_slow_jobs_get_what_they_need():
+    shares = split_bandwidth(1000, [100, None, None])
+    assert shares == [100, 450, 450]
+
+
+@pytest.mark.parametrize('demands', [[0.5, None, None], [0.5, 0.5, 0.5, None], [2, None] * 5])
+def test_small_totals_with_demands(demands):
+    shares = split_bandwidth(3, demands)
+    assert sum(shares) <= 3
+    assert all(share > 0 for share in shares)
+
+
+def test_unlimited_total():
+    assert split_bandwidth(0, [None, 5]) == [0, 0]
@@ -0,0 +1,18 @@
+import yt_dlp_core
+from yt_dlp_core import DownloadTask, UiUpdateBuffer
+
+
+def test_missing_ffmpeg_keeps_the_download_and_succeeds(tmp_path, monkeypatch):
+    monkeypatch.setattr(yt_dlp_core, 'ffmpeg_executable', lambda: None)
+    path = tmp_path / 'clip.webm'
+    path.write_bytes(b'data')
+    updates = UiUpdateBuffer()
+    task = DownloadTask('https://example.com/clip', {'video_format': 'mp4'}, str(tmp_path), updates, 1)
+    task.output_files = [str(path)]
+    assert task.needs_conversion
+    success, message = task.convert()
+    assert success
+    assert 'conversion skipped' in message
+    assert task.output_files == [str(path)] and path.exists()
+    lines, _, _ = updates.drain()
+    assert any('ffmpeg not found' in line for _, line in lines)
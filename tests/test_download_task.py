@@ -0,0 +1,135 @@
+import threading
+import time
+
+import yt_dlp_core
+from yt_dlp_core import (ENGINE_SUBPROCESS, FAILURE_SERVER, DownloadTask, RetryPolicy, RETRY_BACKOFF,
+                         SessionCookies, UiUpdateBuffer)
+
+
+def make_task(tmp_path, key=1, **options):
+    options = dict({'engine': ENGINE_SUBPROCESS}, **options)
+    return DownloadTask(f'https://example.com/video/{key}', options, str(tmp_path / 'out'), UiUpdateBuffer(), key)
+
+
+def start(task):
+    results = []
+    task.start(lambda *result: results.append(result))
+    return results
+
+
+def test_download_reports_its_result(fake_ytdlp):
+    task = make_task(fake_ytdlp)
+    results = start(task)
+    assert task.wait(30)
+    assert results == [(True, "Download completed successfully!")]
+    assert task.history[-1]['result'] == 'done'
+
+
+def test_running_downloads_hold_no_thread_each(fake_ytdlp, monkeypatch):
+    monkeypatch.setenv('FAKE_YTDLP_LINES', '40')
+    monkeypatch.setenv('FAKE_YTDLP_RATE', '40')
+    # The shared reactor and steps threads are started by the first download
+    warm_up = make_task(fake_ytdlp, key=0)
+    start(warm_up)
+    assert warm_up.wait(30)
+    before = threading.active_count()
+    tasks = [make_task(fake_ytdlp, key) for key in range(1, 9)]
+    for task in tasks:
+        start(task)
+    time.sleep(0.5)
+    assert threading.active_count() <= before + 1
+    assert all(task.wait(30) for task in tasks)
+
+
+def test_cookie_export_does_not_hold_up_other_downloads(fake_ytdlp, monkeypatch):
+    exporting = threading.Event()
+    release = threading.Event()
+
+    def slow_export(browser, path):
+        exporting.set()
+        release.wait(30)
+        with open(path, 'w') as jar:
+            jar.write('# Netscape HTTP Cookie File\n')
+
+    monkeypatch.setattr(yt_dlp_core, 'export_browser_cookies', slow_export)
+    with_cookies = DownloadTask('https://example.com/video/1', {'engine': ENGINE_SUBPROCESS, 'cookies_browser': 'Firefox'},
+                                str(fake_ytdlp / 'out'), UiUpdateBuffer(), 1, cookies=SessionCookies())
+    results = start(with_cookies)
+    assert exporting.wait(30)
+    other = make_task(fake_ytdlp, key=2)
+    start(other)
+    assert other.wait(30)
+    assert not with_cookies.wait(0)
+    release.set()
+    assert with_cookies.wait(30)
+    assert results == [(True, "Download completed successfully!")]
+
+
+def test_failures_are_retried_without_a_thread(fake_ytdlp, monkeypatch):
+    monkeypatch.setenv('FAKE_YTDLP_EXIT', '1')
+    monkeypatch.setitem(yt_dlp_core.FAILURE_POLICIES, FAILURE_SERVER,
+                        RetryPolicy("Server error (HTTP 5xx)", RETRY_BACKOFF, retries=2, base_delay=0.05))
+    task = make_task(fake_ytdlp)
+    results = start(task)
+    assert task.wait(30)
+    success, message = results[0]
+    assert not success
+    assert message.startswith("Server error (HTTP 5xx)") and "gave up after 3 attempts" in message
+    assert [entry['result'] for entry in task.history] == [FAILURE_SERVER] * 3
+
+
+def test_cancel_stops_a_running_download(fake_ytdlp, monkeypatch):
+    monkeypatch.setenv('FAKE_YTDLP_LINES', '1000')
+    monkeypatch.setenv('FAKE_YTDLP_RATE', '50')
+    task = make_task(fake_ytdlp)
+    results = start(task)
+    time.sleep(0.5)
+    task.cancel()
+    assert task.wait(10)
+    assert results == [(False, "Download cancelled by user")]
+
+
+def test_cancel_during_backoff(fake_ytdlp, monkeypatch):
+    monkeypatch.setenv('FAKE_YTDLP_EXIT', '1')
+    monkeypatch.setitem(yt_dlp_core.FAILURE_POLICIES, FAILURE_SERVER,
+                        RetryPolicy("Server error (HTTP 5xx)", RETRY_BACKOFF, retries=2, base_delay=60))
+    task = make_task(fake_ytdlp)
+    results = start(task)
+    deadline = time.monotonic() + 10
+    while not task.history or 'retry_in' not in task.history[-1]:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    task.cancel()
+    assert task.wait(5)
+    assert results == [(False, "Download cancelled by user")]
+
+
+def test_probe_runs_before_the_download(fake_ytdlp):
+    task = make_task(fake_ytdlp, select_formats=True)
+    results = start(task)
+    assert task.wait(30)
+    assert results == [(True, "Download completed successfully!")]
+    lines = [line for _, line in task.updates.drain()[0]]
+    assert "[formats] Probing formats..." in lines
+    assert any(line.startswith("[formats] ") and "Probing" not in line for line in lines)
+
+
+def test_run_waits_for_the_result(fake_ytdlp):
+    assert make_task(fake_ytdlp).run() == (True, "Download completed successfully!")
+
+
+def test_new_rate_restarts_the_process(fake_ytdlp, monkeypatch):
+    monkeypatch.setenv('FAKE_YTDLP_LINES', '40')
+    monkeypatch.setenv('FAKE_YTDLP_RATE', '40')
+    monkeypatch.setattr(yt_dlp_core, 'BANDWIDTH_RESTART_INTERVAL', 0)
+    task = make_task(fake_ytdlp)
+    task.set_rate_limit(1000)
+    results = start(task)
+    time.sleep(0.5)
+    first = task.process
+    task.set_rate_limit(100)
+    assert task.wait(30)
+    assert results == [(True, "Download completed successfully!")]
+    assert task.process is not first
+    assert "[bandwidth] Restarting at 100 KB/s" in [line for _, line in task.updates.drain()[0]]
+    assert len(task.history) == 1
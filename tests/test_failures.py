@@ -0,0 +1,33 @@
+import pytest
+
+from fake_ytdlp import DEFAULT_ERROR
+from yt_dlp_core import (FAILURE_EXTRACTOR, FAILURE_FORBIDDEN, FAILURE_NETWORK, FAILURE_POLICIES,
+                         FAILURE_SERVER, FAILURE_THROTTLED, FAILURE_UNKNOWN, RETRY_BACKOFF, classify_failure)
+
+
+@pytest.mark.parametrize('line', [
+    DEFAULT_ERROR,
+    "ERROR: [youtube] abc: Unable to download webpage: HTTP Error 502: Bad Gateway",
+    "ERROR: [vimeo] 123: Unable to download JSON metadata: HTTP Error 503: Service Unavailable",
+    "ERROR: unable to download video data: HTTP Error 504: Gateway Time-out",
+])
+def test_server_errors_are_retried_with_backoff(line):
+    assert classify_failure(["[download] Destination: a.mp4", line]) == FAILURE_SERVER
+    policy = FAILURE_POLICIES[FAILURE_SERVER]
+    assert policy.action == RETRY_BACKOFF and policy.retries > 0
+
+
+@pytest.mark.parametrize('line, failure', [
+    ("ERROR: [generic] x: Unable to download webpage: <urlopen error [Errno 111] Connection refused>",
+     FAILURE_NETWORK),
+    ("ERROR: [youtube] abc: Unable to download webpage: The read operation timed out", FAILURE_NETWORK),
+    ("ERROR: [youtube] abc: Unable to download webpage: HTTP Error 404: Not Found", FAILURE_EXTRACTOR),
+    ("ERROR: [youtube] abc: Video unavailable", FAILURE_EXTRACTOR),
+    ("ERROR: Unsupported URL: https://example.com/", FAILURE_EXTRACTOR),
+    ("ERROR: [youtube] abc: Unable to download webpage: HTTP Error 429: Too Many Requests", FAILURE_THROTTLED),
+    ("ERROR: unable to download video data: HTTP Error 403: Forbidden", FAILURE_FORBIDDEN),
+    # Extractor-tagged errors that are not known to be permanent get a retry
+    ("ERROR: [youtube] abc: Something unexpected happened", FAILURE_UNKNOWN),
+])
+def test_classification(line, failure):
+    assert classify_failure([line]) == failure
@@ -0,0 +1,22 @@
+import io
+import json
+
+from yt_dlp_core import DownloadJob, HeadlessRunner, headless_main
+
+
+def test_duplicate_urls_in_one_batch_become_one_job():
+    runner = HeadlessRunner({}, '.', 2, out=io.StringIO())
+    jobs = runner.add_urls(['https://example.com/a', 'https://example.com/b', 'https://example.com/a'])
+    assert [job.url for job in jobs] == ['https://example.com/a', 'https://example.com/b']
+    assert runner.add_urls(['https://example.com/b']) == []
+
+
+def test_headless_run_downloads_a_repeated_url_once(fake_ytdlp, capsys):
+    batch = fake_ytdlp / 'urls.txt'
+    batch.write_text('https://example.com/a\nhttps://example.com/a\n')
+    code = headless_main(['https://example.com/a', '-a', str(batch), '-o', str(fake_ytdlp / 'out'),
+                          '-j', '2', '--json'])
+    assert code == 0
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{')]
+    finished = {event['job'] for event in events if event.get('state') == DownloadJob.DONE}
+    assert finished == {1}
@@ -0,0 +1,31 @@
+import re
+
+from yt_dlp_core import LOG_INDEX_STRIDE, JobLogStore, LogFile
+
+
+def test_line_breaks_inside_an_entry_become_separate_lines(tmp_path):
+    log = LogFile(str(tmp_path / 'session.log'))
+    log.append([f"[#1] line {i}" for i in range(LOG_INDEX_STRIDE - 1)])
+    log.append(["[#1] alpha\nbeta", "[#1] carriage\rreturn", "[#1] gamma"])
+    assert log.line_count == LOG_INDEX_STRIDE + 4
+    assert log.read_lines(LOG_INDEX_STRIDE - 1, 10) == [
+        "[#1] alpha", "beta", "[#1] carriage", "return", "[#1] gamma"]
+    # The second indexed block starts on the right line
+    assert log.read_lines(LOG_INDEX_STRIDE, 1) == ["beta"]
+    assert log.read_lines(log.line_count - 1, 1) == ["[#1] gamma"]
+    found = [line for chunk in log.search(re.compile('gamma|beta')) for line in chunk]
+    assert found == [LOG_INDEX_STRIDE, LOG_INDEX_STRIDE + 3]
+
+
+def test_empty_entry_is_kept_as_an_empty_line(tmp_path):
+    log = LogFile(str(tmp_path / 'session.log'))
+    log.append(["one", "", "three"])
+    assert log.line_count == 3
+    assert log.read_lines(0, 3) == ["one", "", "three"]
+
+
+def test_job_lines_go_to_session_and_job_logs(tmp_path):
+    store = JobLogStore(str(tmp_path))
+    store.write([(1, "[#1] first\nsecond"), (None, "general")])
+    assert store.session.read_lines(0, 10) == ["[#1] first", "second", "general"]
+    assert store.job(1).read_lines(0, 10) == ["[#1] first", "second"]
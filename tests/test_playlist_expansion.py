@@ -0,0 +1,43 @@
+import os
+import stat
+import time
+
+import pytest
+
+from yt_dlp_core import ENGINE_SUBPROCESS, PlaylistExpansion
+
+
+def group_running(group):
+    """Whether any process of a process group is still running (exited ones may await reaping)."""
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/stat') as status:
+                fields = status.read().rpartition(')')[2].split()
+        except OSError:
+            continue
+        if int(fields[2]) == group and fields[0] != 'Z':
+            return True
+    return False
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc'), reason="looks for leftover processes in /proc")
+def test_cancel_stops_the_listing_process_tree(tmp_path, monkeypatch):
+    # A yt-dlp that takes its time listing, in a child process of its own
+    slow = tmp_path / 'yt-dlp'
+    slow.write_text('#!/bin/sh\nsleep 60\n')
+    slow.chmod(slow.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('YT_DLP_GUI_YTDLP', str(slow))
+    expansion = PlaylistExpansion('https://example.com/playlist', {'engine': ENGINE_SUBPROCESS})
+    results = []
+    expansion.start(lambda *result: results.append(result))
+    deadline = time.monotonic() + 10
+    while not (expansion.process and group_running(expansion.process.pid)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    expansion.cancel()
+    assert expansion.wait(10)
+    playlist, error = results[0]
+    assert playlist is None and error
+    deadline = time.monotonic() + 10
+    while group_running(expansion.process.pid) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not group_running(expansion.process.pid)
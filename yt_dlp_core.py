@@ -0,0 +1,3784 @@
+"""Qt-free core of the yt-dlp GUI: command building, progress parsing, engines, caches and the
+download queue, shared by the window and the ``--headless`` console mode."""
+import sys
+import os
+import argparse
+import subprocess
+import threading
+import queue
+import json
+import random
+import time
+import hashlib
+import importlib.util
+import codecs
+import locale
+import selectors
+import socket
+import heapq
+import signal
+import multiprocessing
+import re
+import platform
+import shutil
+import sqlite3
+import stat
+import tempfile
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from array import array
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from functools import partial
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+def is_valid_url(url):
+    """Validate if string is a valid http:// or https:// URL."""
+    try:
+        result = urlparse(url)
+        return all([result.scheme, result.netloc]) and result.scheme in ['http', 'https']
+    except:
+        return False
+
+# Links inside arbitrary text (web pages, chat logs); trailing punctuation is trimmed afterwards
+URL_IN_TEXT_RE = re.compile(r'https?://[^\s<>"\'`{}|\\^\[\]]+', re.IGNORECASE)
+URL_TRAILING_PUNCTUATION = '.,;:!?*'
+
+def extract_urls(text):
+    """Every distinct http(s) URL found in a block of text, in order of appearance."""
+    found = {}
+    for match in URL_IN_TEXT_RE.finditer(text):
+        url = match.group().rstrip(URL_TRAILING_PUNCTUATION)
+        # A closing parenthesis is part of the URL only if the URL opened one (Wikipedia style)
+        while url.endswith(')') and url.count(')') > url.count('('):
+            url = url[:-1].rstrip(URL_TRAILING_PUNCTUATION)
+        if is_valid_url(url):
+            found.setdefault(url, None)
+    return list(found)
+
+def iter_batch_urls(lines):
+    """Yield the entries of a yt-dlp style batch file, skipping blanks and comments."""
+    for line in lines:
+        line = line.strip()
+        # yt-dlp treats lines starting with '#', ';' or ']' as comments
+        if line and line[0] not in '#;]':
+            yield line
+
+
+# yt-dlp renders these templates on every progress update; |null keeps the output valid JSON
+# when a field is missing
+PROGRESS_PREFIX = '[gui-progress] '
+POSTPROCESS_PREFIX = '[gui-postprocess] '
+PROGRESS_TEMPLATE = PROGRESS_PREFIX + (
+    '{"status":"%(progress.status)s",'
+    '"downloaded_bytes":%(progress.downloaded_bytes|null)s,'
+    '"total_bytes":%(progress.total_bytes|null)s,'
+    '"total_bytes_estimate":%(progress.total_bytes_estimate|null)s,'
+    '"speed":%(progress.speed|null)s,'
+    '"eta":%(progress.eta|null)s,'
+    '"elapsed":%(progress.elapsed|null)s,'
+    '"fragment_index":%(progress.fragment_index|null)s,'
+    '"fragment_count":%(progress.fragment_count|null)s,'
+    '"filename":%(progress.filename|null)j}'
+)
+POSTPROCESS_TEMPLATE = POSTPROCESS_PREFIX + (
+    '{"status":"%(progress.status)s","postprocessor":%(progress.postprocessor|null)j,'
+    '"filepath":%(info.filepath|null)j}'
+)
+STRUCTURED_PREFIXES = (PROGRESS_PREFIX, POSTPROCESS_PREFIX)
+PERCENT_RE = re.compile(r'(\d+\.\d+)%')
+
+# Workers leave at most this many unread log lines in their update buffer
+LOG_MAX_LINES = 5000
+
+
+def format_bytes(num_bytes):
+    if num_bytes is None:
+        return "?"
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.2f}{unit}" if unit != 'B' else f"{int(num_bytes)}B"
+        num_bytes /= 1024
+    return f"{num_bytes:.2f}TiB"
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+@dataclass
+class ProgressEvent:
+    """A single progress update reported by yt-dlp for one job."""
+    status: str
+    percent: float | None = None
+    downloaded_bytes: int | None = None
+    total_bytes: int | None = None
+    total_bytes_estimate: int | None = None
+    speed: float | None = None
+    eta: int | None = None
+    elapsed: float | None = None
+    fragment_index: int | None = None
+    fragment_count: int | None = None
+    filename: str | None = None
+    postprocessor: str | None = None
+
+    @property
+    def is_postprocessing(self):
+        return self.postprocessor is not None
+
+    def describe(self):
+        """Render the event as a human readable log line."""
+        if self.is_postprocessing:
+            if self.status == 'processing':
+                return f"[postprocess] {self.postprocessor} {self.percent or 0:5.1f}%"
+            return f"[postprocess] {self.postprocessor} {self.status}"
+        if self.status == 'retrying':
+            return f"[retry] Waiting {format_eta(self.eta)}"
+        if self.status == 'finished':
+            return f"[download] 100% of {format_bytes(self.total_bytes or self.downloaded_bytes)}"
+        total = self.total_bytes or self.total_bytes_estimate
+        parts = [f"[download] {self.percent or 0:5.1f}%"]
+        if total:
+            parts.append(f"of {'' if self.total_bytes else '~'}{format_bytes(total)}")
+        if self.speed:
+            parts.append(f"at {format_bytes(self.speed)}/s")
+        parts.append(f"ETA {format_eta(self.eta)}")
+        if self.fragment_index is not None:
+            parts.append(f"(frag {self.fragment_index}/{self.fragment_count or '?'})")
+        return ' '.join(parts)
+
+    def summary(self):
+        """Short status text for the queue view."""
+        if self.is_postprocessing:
+            if self.status == 'processing':
+                percent = f" {self.percent:.0f}%" if self.percent is not None else "..."
+                return f"{self.postprocessor}{percent}, ETA {format_eta(self.eta)}"
+            return f"Post-processing: {self.postprocessor} ({self.status})"
+        if self.status == 'retrying':
+            return f"Retrying in {format_eta(self.eta)}"
+        if self.status == 'finished':
+            return f"Downloaded {format_bytes(self.total_bytes or self.downloaded_bytes)}"
+        text = f"{format_bytes(self.speed)}/s, ETA {format_eta(self.eta)}" if self.speed else "Downloading..."
+        if self.fragment_index is not None:
+            text += f", frag {self.fragment_index}/{self.fragment_count or '?'}"
+        return text
+
+
+def progress_event_from_dict(data):
+    """Build a ProgressEvent from a yt-dlp download progress dict."""
+    downloaded = data.get('downloaded_bytes')
+    total = data.get('total_bytes') or data.get('total_bytes_estimate')
+    if data.get('status') == 'finished':
+        percent = 100.0
+    elif downloaded is not None and total:
+        percent = min(100.0, downloaded * 100.0 / total)
+    else:
+        percent = None
+    return ProgressEvent(
+        status=data.get('status') or 'downloading',
+        percent=percent,
+        downloaded_bytes=downloaded,
+        total_bytes=data.get('total_bytes'),
+        total_bytes_estimate=data.get('total_bytes_estimate'),
+        speed=data.get('speed'),
+        eta=data.get('eta'),
+        elapsed=data.get('elapsed'),
+        fragment_index=data.get('fragment_index'),
+        fragment_count=data.get('fragment_count'),
+        filename=data.get('filename'),
+    )
+
+def parse_progress_line(line):
+    """Parse a yt-dlp output line into a ProgressEvent, or None if it carries no progress."""
+    if line.startswith(PROGRESS_PREFIX):
+        try:
+            return progress_event_from_dict(json.loads(line[len(PROGRESS_PREFIX):]))
+        except ValueError:
+            return None
+    if line.startswith(POSTPROCESS_PREFIX):
+        try:
+            data = json.loads(line[len(POSTPROCESS_PREFIX):])
+        except ValueError:
+            return None
+        return ProgressEvent(status=data.get('status') or 'started',
+                             postprocessor=data.get('postprocessor') or 'PostProcessor',
+                             filename=data.get('filepath'))
+    # Fall back to scraping the percentage for output we don't recognise
+    progress_match = PERCENT_RE.search(line)
+    if progress_match:
+        return ProgressEvent(status='downloading', percent=float(progress_match.group(1)))
+    return None
+
+
+ENGINE_SUBPROCESS = 'subprocess'
+ENGINE_LIBRARY = 'library'
+ENGINE_POOL = 'pool'
+ENGINE_LABELS = {
+    ENGINE_SUBPROCESS: "yt-dlp executable",
+    ENGINE_LIBRARY: "Built-in (in-process)",
+    ENGINE_POOL: "Worker pool (pre-loaded)",
+}
+
+# Pool workers report chunk progress at most this often (seconds), and get this long to
+# acknowledge a cancel before they are killed
+POOL_PROGRESS_INTERVAL = 0.1
+POOL_CANCEL_GRACE = 5
+
+# Probed metadata is reused for this long (seconds); signed stream URLs usually last a few hours
+METADATA_CACHE_TTL = 3 * 60 * 60
+METADATA_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Browser cookies exported for the session are read afresh after this long (seconds)
+COOKIE_JAR_TTL = 30 * 60
+COOKIE_EXPORT_TIMEOUT = 60
+
+
+def local_ytdlp_path():
+    """Where a bootstrapped copy of the yt-dlp executable lives."""
+    exe_name = 'yt-dlp.exe' if platform.system() == 'Windows' else 'yt-dlp'
+    return os.path.join(os.getcwd(), exe_name)
+
+def ytdlp_executable():
+    """Path of the yt-dlp executable: ``YT_DLP_GUI_YTDLP`` if set (e.g. the benchmarks' stand-in),
+    a local copy if present, otherwise whatever is on PATH."""
+    if os.environ.get('YT_DLP_GUI_YTDLP'):
+        return os.environ['YT_DLP_GUI_YTDLP']
+    local_exe = local_ytdlp_path()
+    return local_exe if os.path.exists(local_exe) else os.path.basename(local_exe)
+
+def ytdlp_installed():
+    if os.environ.get('YT_DLP_GUI_YTDLP'):
+        return os.path.exists(os.environ['YT_DLP_GUI_YTDLP'])
+    return os.path.exists(local_ytdlp_path()) or shutil.which(os.path.basename(local_ytdlp_path())) is not None
+
+
+# Release downloads; the base URL can point at a mirror or local stand-in through the environment
+YTDLP_RELEASE_URL = os.environ.get(
+    'YT_DLP_GUI_RELEASE_URL', "https://github.com/yt-dlp/yt-dlp/releases/latest/download/"
+)
+YTDLP_CHECKSUMS = 'SHA2-256SUMS'
+BOOTSTRAP_CHUNK_SIZE = 256 * 1024
+BOOTSTRAP_RETRIES = 3
+BOOTSTRAP_TIMEOUT = 30
+
+def ytdlp_release_asset():
+    """Name of the release file with the standalone executable for this platform."""
+    system = platform.system()
+    if system == 'Windows':
+        return 'yt-dlp.exe'
+    if system == 'Darwin':
+        return 'yt-dlp_macos'
+    return 'yt-dlp'
+
+def fetch_release_checksum(base_url, asset):
+    """The published SHA-256 of ``asset`` from the release's checksum file."""
+    with urllib.request.urlopen(base_url + YTDLP_CHECKSUMS, timeout=BOOTSTRAP_TIMEOUT) as response:
+        text = response.read().decode('utf-8', 'replace')
+    for line in text.splitlines():
+        parts = line.split()
+        # "<hash>  <name>", with a '*' before the name for binary mode
+        if len(parts) == 2 and parts[1].lstrip('*') == asset:
+            return parts[0].lower()
+    raise RuntimeError(f"{asset} is not listed in {YTDLP_CHECKSUMS}")
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(partial(f.read, BOOTSTRAP_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def download_ytdlp(dest_path, base_url=YTDLP_RELEASE_URL, asset=None, progress=None, is_cancelled=None):
+    """Download the yt-dlp executable to ``dest_path``, verified against the published checksum.
+
+    Data goes to ``dest_path + '.part'``, which a later call resumes with an HTTP range request
+    if the download is interrupted. Only a verified file replaces ``dest_path``, atomically.
+    ``progress(done_bytes, total_bytes or None)`` is called after every chunk; raises on failure.
+    """
+    asset = asset or ytdlp_release_asset()
+    expected = fetch_release_checksum(base_url, asset)
+    part_path = dest_path + '.part'
+    restarted = False
+    attempt = 0
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        try:
+            _fetch_release_file(base_url + asset, part_path, offset, progress, is_cancelled)
+        except urllib.error.HTTPError as e:
+            # 416: the part file already holds the whole file
+            if e.code != 416:
+                raise
+        except OSError:
+            # Dropped connection or timeout: resume from what has arrived so far
+            attempt += 1
+            if attempt >= BOOTSTRAP_RETRIES:
+                raise
+            continue
+        
+        if file_sha256(part_path) == expected:
+            break
+        os.remove(part_path)
+        if offset and not restarted:
+            # The part file was left by an older release; start over once from scratch
+            restarted = True
+            continue
+        raise RuntimeError("Downloaded yt-dlp does not match the published checksum")
+    
+    if platform.system() != 'Windows':
+        os.chmod(part_path, os.stat(part_path).st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+    os.replace(part_path, dest_path)
+    return dest_path
+
+def _fetch_release_file(url, part_path, offset, progress, is_cancelled):
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header('Range', f'bytes={offset}-')
+    with urllib.request.urlopen(request, timeout=BOOTSTRAP_TIMEOUT) as response:
+        if offset and response.status != 206:
+            # The server ignored the range; take the whole file again
+            offset = 0
+        length = response.headers.get('Content-Length')
+        total = offset + int(length) if length else None
+        done = offset
+        with open(part_path, 'ab' if offset else 'wb') as part:
+            while True:
+                if is_cancelled and is_cancelled():
+                    raise RuntimeError("Download cancelled")
+                chunk = response.read(BOOTSTRAP_CHUNK_SIZE)
+                if not chunk:
+                    break
+                part.write(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+        if total is not None and done < total:
+            raise ConnectionResetError(f"Connection closed after {done} of {total} bytes")
+
+def cookies_browser(options):
+    """The browser to read cookies from (lower-cased, as yt-dlp wants it), or None."""
+    browser = options.get('cookies_browser')
+    return browser.lower() if browser and browser != 'None' else None
+
+def cookie_args(options):
+    # A cookie file exported for the session (SessionCookies) stands in for the browser's store
+    if options.get('cookies_file'):
+        return ['--cookies', options['cookies_file']]
+    browser = cookies_browser(options)
+    return ['--cookies-from-browser', browser] if browser else []
+
+# Fragments fetched at once per DASH/HLS download; first entry of the downloaders means yt-dlp's own
+DEFAULT_CONCURRENT_FRAGMENTS = 4
+EXTERNAL_DOWNLOADERS = ["Built-in", "aria2c"]
+DEFAULT_DOWNLOADER_CONNECTIONS = 16
+
+def transfer_args(options):
+    """yt-dlp arguments for fragment concurrency, HTTP chunking and the external downloader."""
+    args = []
+    if options.get('concurrent_fragments', 1) > 1:
+        args.extend(['-N', str(options['concurrent_fragments'])])
+    if options.get('http_chunk_size'):
+        args.extend(['--http-chunk-size', f"{options['http_chunk_size']}M"])
+    if options.get('external_downloader'):
+        args.extend(['--downloader', options['external_downloader']])
+        args.extend(['--downloader-args', f"aria2c:{' '.join(aria2c_args(options))}"])
+    return args
+
+def aria2c_args(options):
+    connections = str(options.get('downloader_connections') or DEFAULT_DOWNLOADER_CONNECTIONS)
+    # Split every file across the connections; 1M pieces keep short files parallel too
+    return ['-x', connections, '-s', connections, '-k', '1M']
+
+def resolve_transfer_options(options):
+    """Return ``(options, notes)`` with an uninstalled external downloader dropped.
+
+    ``notes`` are job log lines describing the effective transfer configuration.
+    """
+    notes = []
+    downloader = options.get('external_downloader')
+    if downloader and not shutil.which(downloader):
+        notes.append(f"{downloader} not found, using the built-in downloader")
+        options = dict(options, external_downloader=None)
+    parts = [f"{options.get('concurrent_fragments', 1)} concurrent fragment(s)"]
+    parts.append(f"HTTP chunks of {options['http_chunk_size']} MB" if options.get('http_chunk_size') else "no HTTP chunking")
+    if options.get('external_downloader'):
+        parts.append(f"{options['external_downloader']} with {options.get('downloader_connections') or DEFAULT_DOWNLOADER_CONNECTIONS} connections")
+    else:
+        parts.append("built-in downloader")
+    notes.append("Transfer: " + ", ".join(parts))
+    return options, notes
+
+def library_engine_available():
+    """Whether the yt_dlp package can be imported for in-process downloads."""
+    return importlib.util.find_spec('yt_dlp') is not None
+
+def build_ydl_params(options, output_path):
+    """Map a download option dict onto YoutubeDL params, mirroring build_command."""
+    params = {
+        'noprogress': True,
+        'no_color': True,
+        'postprocessors': [],
+    }
+    
+    if options.get('format'):
+        params['format'] = options['format']
+    
+    # Audio extraction and container conversion run afterwards in the PostProcessPool
+    if options.get('extract_audio'):
+        params.setdefault('format', 'bestaudio/best')
+    elif merge_format(options):
+        params['merge_output_format'] = merge_format(options)
+    
+    if options.get('subtitle'):
+        params['writesubtitles'] = True
+        if options.get('auto_sub'):
+            params['writeautomaticsub'] = True
+    
+    if options.get('thumbnail'):
+        params['writethumbnail'] = True
+    
+    if options.get('description'):
+        params['writedescription'] = True
+    
+    if options.get('playlist'):
+        params['noplaylist'] = False
+        if options.get('playlist_start'):
+            params['playliststart'] = options['playlist_start']
+        if options.get('playlist_end'):
+            params['playlistend'] = options['playlist_end']
+    else:
+        params['noplaylist'] = True
+    
+    if options.get('speed_limit') and options['speed_limit'] > 0:
+        params['ratelimit'] = options['speed_limit'] * 1024
+    
+    if options.get('concurrent_fragments', 1) > 1:
+        params['concurrent_fragment_downloads'] = options['concurrent_fragments']
+    if options.get('http_chunk_size'):
+        params['http_chunk_size'] = options['http_chunk_size'] * 1024 * 1024
+    if options.get('external_downloader'):
+        params['external_downloader'] = {'default': options['external_downloader']}
+        params['external_downloader_args'] = {'aria2c': aria2c_args(options)}
+    
+    if options.get('cookies_file'):
+        params['cookiefile'] = options['cookies_file']
+    elif cookies_browser(options):
+        params['cookiesfrombrowser'] = (cookies_browser(options),)
+    
+    if options.get('download_archive'):
+        params['download_archive'] = options['download_archive']
+    
+    if output_path:
+        params['outtmpl'] = {'default': f'{output_path}/%(title)s.%(ext)s'}
+    
+    return params
+
+
+class YtdlpLogger:
+    """yt-dlp logger that forwards every message to a callback."""
+
+    def __init__(self, emit):
+        self.emit = emit
+
+    def debug(self, message):
+        # yt-dlp sends regular output through debug() too; only real debug lines carry the prefix
+        if not message.startswith('[debug] '):
+            self.emit(message)
+
+    def info(self, message):
+        self.emit(message)
+
+    def warning(self, message):
+        self.emit(message)
+
+    def error(self, message):
+        self.emit(message)
+
+
+def run_ydl_download(url, options, output_path, emit_line, emit_progress, is_cancelled, info_path=None,
+                     rate_limiter=None):
+    """Download ``url`` with yt_dlp.YoutubeDL in the current process.
+
+    When ``info_path`` points at a previously probed info JSON the extraction step is skipped.
+    A ``RateLimiter`` holds the transfer to its (changeable) rate from the progress hook.
+    Returns a ``(success, message)`` tuple; output and ProgressEvents go to the callbacks.
+    """
+    import yt_dlp
+    
+    def progress_hook(data):
+        if is_cancelled():
+            raise yt_dlp.utils.DownloadCancelled()
+        emit_progress(progress_event_from_dict(data))
+        if rate_limiter:
+            rate_limiter.throttle(data, is_cancelled)
+    
+    def postprocessor_hook(data):
+        if is_cancelled():
+            raise yt_dlp.utils.DownloadCancelled()
+        emit_progress(ProgressEvent(status=data.get('status') or 'started',
+                                    postprocessor=data.get('postprocessor') or 'PostProcessor',
+                                    filename=(data.get('info_dict') or {}).get('filepath')))
+    
+    params = build_ydl_params(options, output_path)
+    if rate_limiter and not options.get('external_downloader'):
+        # The hook enforces the rate; yt-dlp's own limit would pin it to the starting value
+        params.pop('ratelimit', None)
+    params['logger'] = YtdlpLogger(emit_line)
+    params['progress_hooks'] = [progress_hook]
+    params['postprocessor_hooks'] = [postprocessor_hook]
+    try:
+        with yt_dlp.YoutubeDL(params) as ydl:
+            if info_path:
+                returncode = ydl.download_with_info_file(info_path)
+            else:
+                returncode = ydl.download([url])
+    except yt_dlp.utils.DownloadCancelled:
+        return False, "Download cancelled by user"
+    except yt_dlp.utils.DownloadError as e:
+        if is_cancelled():
+            return False, "Download cancelled by user"
+        return False, f"Download failed: {str(e)}"
+    
+    if is_cancelled():
+        return False, "Download cancelled by user"
+    if returncode == 0:
+        return True, "Download completed successfully!"
+    return False, f"Download failed with return code: {returncode}"
+
+
+def run_ydl_probe(url, options, emit_line, is_cancelled):
+    """Extract metadata for a single video without downloading it.
+
+    Returns ``(True, info_json)`` on success or ``(False, message)``.
+    """
+    import yt_dlp
+    
+    params = build_ydl_params(options, None)
+    params.update({'noplaylist': True, 'logger': YtdlpLogger(emit_line), 'postprocessors': []})
+    # The archive is checked by the download itself; here it would only skip the extraction
+    params.pop('download_archive', None)
+    try:
+        with yt_dlp.YoutubeDL(params) as ydl:
+            info = ydl.extract_info(url, download=False)
+            return not is_cancelled(), json.dumps(ydl.sanitize_info(info))
+    except yt_dlp.utils.YoutubeDLError as e:
+        return False, f"Metadata probe failed: {str(e)}"
+
+
+def playlist_range_args(options):
+    args = []
+    if options.get('playlist_start'):
+        args.extend(['--playlist-start', str(options['playlist_start'])])
+    if options.get('playlist_end'):
+        args.extend(['--playlist-end', str(options['playlist_end'])])
+    return args
+
+def expand_playlist_flat(url, options, use_library, on_process=None):
+    """Flat, metadata-only expansion of a playlist honouring the playlist range options.
+
+    Returns ``{'title', 'is_playlist', 'entries'}`` where each entry is a dict with
+    ``url``, ``title`` and ``archive_key`` (None when the extractor/ID are unknown).
+    ``on_process`` is given the yt-dlp process once started, so it can be stopped.
+    """
+    if use_library:
+        import yt_dlp
+        params = build_ydl_params(options, None)
+        params.update({
+            'extract_flat': 'in_playlist',
+            'skip_download': True,
+            'postprocessors': [],
+            'logger': YtdlpLogger(lambda message: None),
+        })
+        params.pop('download_archive', None)
+        with yt_dlp.YoutubeDL(params) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+    else:
+        cmd = [ytdlp_executable(), '--flat-playlist', '-J', '--no-warnings', '--no-colors']
+        cmd.extend(cookie_args(options))
+        cmd.extend(playlist_range_args(options))
+        cmd.append(url)
+        # A large playlist takes minutes to list; in a group of its own it can be stopped as a tree
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                   encoding='utf-8', errors='replace', **process_group_options())
+        if on_process:
+            on_process(process)
+        stdout, stderr = process.communicate()
+        if process.returncode != 0:
+            error_lines = [line for line in stderr.splitlines() if line.strip()]
+            raise RuntimeError(error_lines[-1] if error_lines else f"yt-dlp exited with {process.returncode}")
+        info = json.loads(stdout)
+    
+    if not info or info.get('_type') != 'playlist':
+        return {'title': (info or {}).get('title'), 'is_playlist': False, 'entries': []}
+    
+    entries = []
+    for entry in info.get('entries') or []:
+        if not entry:
+            continue
+        entry_url = entry.get('url') if is_valid_url(entry.get('url') or '') else entry.get('webpage_url')
+        if not entry_url:
+            continue
+        archive_key = None
+        if entry.get('ie_key') and entry.get('id'):
+            archive_key = f"{entry['ie_key'].lower()} {entry['id']}"
+        entries.append({'url': entry_url, 'title': entry.get('title'), 'archive_key': archive_key})
+    return {'title': info.get('title'), 'is_playlist': True, 'entries': entries}
+
+class PlaylistExpansion:
+    """A playlist job's ``expand_playlist_flat`` that another thread can cancel.
+
+    Cancelling stops the yt-dlp process tree; the built-in engine can't be interrupted,
+    so its result is simply discarded.
+    """
+
+    def __init__(self, url, options):
+        self.url = url
+        self.options = options
+        self.process = None
+        self._is_cancelled = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def run(self):
+        """Expand on the calling thread, returning the playlist or raising its error."""
+        use_library = self.options.get('engine') != ENGINE_SUBPROCESS and library_engine_available()
+        return expand_playlist_flat(self.url, self.options, use_library, self._started)
+
+    def start(self, on_finished):
+        """Expand on a thread; ``on_finished(playlist, error)`` gets the playlist or the error message."""
+        def expand():
+            try:
+                playlist = self.run()
+            except Exception as e:
+                on_finished(None, str(e))
+            else:
+                on_finished(playlist, None)
+        self._thread = threading.Thread(target=expand, daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Wait for a ``start``-ed expansion to finish; False if it is still running."""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def cancel(self):
+        with self._lock:
+            self._is_cancelled = True
+            process = self.process
+        if process:
+            stop_process_tree(process)
+
+    def _started(self, process):
+        with self._lock:
+            self.process = process
+            cancelled = self._is_cancelled
+        if cancelled:
+            stop_process_tree(process)
+
+
+# A job whose budget share changes by less than this fraction keeps its rate, and an
+# executable-engine job is restarted for a new rate at most this often (seconds)
+BANDWIDTH_CHANGE_THRESHOLD = 0.25
+BANDWIDTH_RESTART_INTERVAL = 30
+# No running job is squeezed below this share (KB/s) while the budget allows it
+BANDWIDTH_MIN_SHARE = 64
+# Shares are recomputed this often (seconds) to follow job speeds and the schedule
+BANDWIDTH_REBALANCE_INTERVAL = 5
+
+class RateLimiter:
+    """Token bucket that the in-process engines' progress hook uses to hold a download to a rate.
+
+    The rate (KB/s, 0 = unlimited) can be changed while the download runs.
+    """
+
+    def __init__(self, kbps=0):
+        self._lock = threading.Lock()
+        self._rate = kbps * 1024
+        self._next_free = 0.0
+        self._seen = {}
+
+    def set_rate(self, kbps):
+        with self._lock:
+            self._rate = kbps * 1024
+            self._next_free = min(self._next_free, time.monotonic())
+
+    def throttle(self, data, is_cancelled=None):
+        """Account for the bytes reported by a progress hook call and sleep off any excess."""
+        if data.get('status') != 'downloading':
+            return
+        name = data.get('tmpfilename') or data.get('filename')
+        done = data.get('downloaded_bytes') or 0
+        with self._lock:
+            # Concurrent fragment threads may report slightly out of order; count only growth
+            last = self._seen.get(name, 0)
+            self._seen[name] = max(last, done)
+            if self._rate <= 0 or done <= last:
+                return
+            now = time.monotonic()
+            # Allow at most a second of burst after an idle period
+            self._next_free = max(self._next_free, now - 1.0) + (done - last) / self._rate
+            wait = self._next_free - now
+        while wait > 0 and not (is_cancelled and is_cancelled()):
+            time.sleep(min(wait, 0.25))
+            wait -= 0.25
+
+
+def parse_bandwidth_schedule(text):
+    """Parse ``"HH:MM-HH:MM=KB, ..."`` into ``[(start_minute, end_minute, kbps)]``.
+
+    Ranges may wrap past midnight; ``0`` means unlimited. Raises ValueError on bad input.
+    """
+    rules = []
+    for part in re.split(r'[,;\n]+', text or ''):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r'(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(\d+)', part)
+        if not match:
+            raise ValueError(f"Invalid schedule entry '{part}' (expected HH:MM-HH:MM=KB)")
+        h1, m1, h2, m2, kbps = (int(group) for group in match.groups())
+        if h1 > 24 or h2 > 24 or m1 > 59 or m2 > 59:
+            raise ValueError(f"Invalid time in schedule entry '{part}'")
+        rules.append((h1 * 60 + m1, h2 * 60 + m2, kbps))
+    return rules
+
+def split_bandwidth(total_kbps, demands):
+    """Split ``total_kbps`` across jobs, one share per entry of ``demands``.
+
+    A demand is the rate (KB/s) a job is known to be limited to by its source, or None if it
+    could use more. Max-min fair: jobs that need less than an equal share get what they need,
+    the rest is split equally, and the shares never add up to more than the total. Shares are
+    whole KB/s where the total allows; below 1 KB/s per job they are whole bytes/s, as a share
+    of 0 would mean unlimited.
+    """
+    count = len(demands)
+    if not count:
+        return []
+    if total_kbps <= 0:
+        return [0] * count
+    floor = min(BANDWIDTH_MIN_SHARE, total_kbps // count)
+    shares = [0] * count
+    remaining = total_kbps
+    open_jobs = set(range(count))
+    for index in sorted((i for i in range(count) if demands[i] is not None), key=lambda i: demands[i]):
+        fair = remaining / len(open_jobs)
+        if demands[index] >= fair:
+            break
+        shares[index] = max(int(demands[index]), floor) or max(int(demands[index] * 1024), 1) / 1024
+        remaining -= shares[index]
+        open_jobs.discard(index)
+    if not open_jobs:
+        return shares
+    if remaining < len(open_jobs):
+        for index in open_jobs:
+            shares[index] = max(int(remaining * 1024 / len(open_jobs)), 1) / 1024
+        return shares
+    # The rounding remainder goes to the first jobs, one KB/s each
+    share, extra = divmod(int(remaining), len(open_jobs))
+    for rank, index in enumerate(sorted(open_jobs)):
+        shares[index] = share + (rank < extra)
+    return shares
+
+
+class BandwidthBudget:
+    """Global download rate shared by all running jobs.
+
+    ``total_kbps`` (0 = unlimited) applies unless a time-of-day ``schedule`` rule from
+    ``parse_bandwidth_schedule`` matches. Jobs are added when they start and removed when
+    they finish; ``rebalance`` pushes new shares to them via ``set_rate_limit``.
+    """
+
+    def __init__(self, total_kbps=0, schedule=()):
+        self._lock = threading.Lock()
+        self.total_kbps = total_kbps
+        self.schedule = list(schedule)
+        self._tasks = []
+
+    def configure(self, total_kbps, schedule=()):
+        self.total_kbps = total_kbps
+        self.schedule = list(schedule)
+        self.rebalance()
+
+    def current_total(self, now=None):
+        now = now or time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        for start, end, kbps in self.schedule:
+            if (start <= minute < end) if start <= end else (minute >= start or minute < end):
+                return kbps
+        return self.total_kbps
+
+    def add(self, task):
+        with self._lock:
+            self._tasks.append(task)
+        self.rebalance()
+
+    def remove(self, task):
+        with self._lock:
+            if task not in self._tasks:
+                return
+            self._tasks.remove(task)
+        self.rebalance()
+
+    def rebalance(self):
+        with self._lock:
+            tasks = list(self._tasks)
+        shares = split_bandwidth(self.current_total(), [task.bandwidth_demand() for task in tasks])
+        for task, share in zip(tasks, shares):
+            task.set_rate_limit(share)
+
+
+def current_rss_mb():
+    """Resident memory of this process in MiB, or None if it can't be measured."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current RSS; ru_maxrss is in bytes on macOS and KiB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def pool_worker_main(conn, max_jobs, max_rss_mb):
+    """Entry point of a pool worker process: import yt-dlp once, then serve jobs from ``conn``."""
+    import yt_dlp
+    # Pay for loading every extractor up front instead of on the first job
+    list(yt_dlp.extractor.gen_extractor_classes())
+    
+    jobs_done = 0
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message[0] == 'stop':
+            return
+        if message[0] not in ('job', 'probe'):
+            # A cancel for a job that already finished
+            continue
+        
+        url, options = message[1], message[2]
+        cancelled = False
+        last_progress = 0.0
+        rate_limiter = RateLimiter(options.get('speed_limit') or 0)
+        
+        def is_cancelled():
+            nonlocal cancelled
+            while not cancelled and conn.poll():
+                request = conn.recv()
+                if request[0] in ('cancel', 'stop'):
+                    cancelled = True
+                elif request[0] == 'rate':
+                    rate_limiter.set_rate(request[1])
+            return cancelled
+        
+        def emit_progress(event):
+            nonlocal last_progress
+            # Chunk updates are throttled here so the pipe isn't flooded; milestones always go through
+            now = time.monotonic()
+            if event.status == 'downloading' and now - last_progress < POOL_PROGRESS_INTERVAL:
+                return
+            last_progress = now
+            conn.send(('progress', asdict(event)))
+        
+        emit_line = lambda line: conn.send(('line', line))
+        if message[0] == 'probe':
+            success, result = run_ydl_probe(url, options, emit_line, is_cancelled)
+        else:
+            output_path, info_path = message[3], message[4]
+            success, result = run_ydl_download(
+                url, options, output_path, emit_line, emit_progress, is_cancelled, info_path, rate_limiter
+            )
+        jobs_done += 1
+        rss = current_rss_mb() if max_rss_mb else None
+        retire = bool(max_jobs and jobs_done >= max_jobs) or bool(rss and rss > max_rss_mb)
+        conn.send(('done', success, result, retire))
+        if retire:
+            return
+
+
+class PoolWorker:
+    """Parent-side handle of one pool worker process."""
+
+    def __init__(self, context, max_jobs, max_rss_mb):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=pool_worker_main, args=(child_conn, max_jobs, max_rss_mb), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.retiring = False
+
+    def stop(self):
+        try:
+            self.conn.send(('stop',))
+        except (OSError, ValueError):
+            pass
+        self.conn.close()
+
+    def kill(self):
+        self.retiring = True
+        self.process.kill()
+
+
+class WorkerPool:
+    """Long-lived worker processes with yt-dlp already imported, leased out one job at a time.
+
+    Workers retire themselves after ``max_jobs`` jobs or once their memory grows past
+    ``max_rss_mb`` (0 disables either limit), and are replaced straight away so the pool stays warm.
+    """
+
+    def __init__(self, size, max_jobs=50, max_rss_mb=1024):
+        # Forking a process that runs Qt and worker threads is unsafe, so always spawn
+        self._context = multiprocessing.get_context('spawn')
+        self._cond = threading.Condition()
+        self._idle = []
+        self._busy = set()
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self._closed = False
+
+    def configure(self, size, max_jobs, max_rss_mb):
+        """Apply new limits; extra workers are retired as they become idle."""
+        with self._cond:
+            self.size = size
+            self.max_jobs = max_jobs
+            self.max_rss_mb = max_rss_mb
+            while self._idle and len(self._idle) + len(self._busy) > self.size:
+                self._idle.pop().stop()
+            self._cond.notify_all()
+
+    def warm_up(self):
+        """Start workers until the pool is at full size."""
+        with self._cond:
+            self._fill()
+
+    def _fill(self):
+        while not self._closed and len(self._idle) + len(self._busy) < self.size:
+            self._idle.append(PoolWorker(self._context, self.max_jobs, self.max_rss_mb))
+
+    def acquire(self, is_cancelled):
+        """Wait for an idle worker; returns None if ``is_cancelled`` turns true first."""
+        with self._cond:
+            while True:
+                if self._closed or is_cancelled():
+                    return None
+                self._fill()
+                if self._idle:
+                    worker = self._idle.pop()
+                    self._busy.add(worker)
+                    return worker
+                self._cond.wait(0.2)
+
+    def release(self, worker):
+        with self._cond:
+            self._busy.discard(worker)
+            if worker.retiring or not worker.process.is_alive():
+                worker.conn.close()
+                worker.process.join(timeout=1)
+            elif self._closed or len(self._idle) + len(self._busy) >= self.size:
+                worker.stop()
+            else:
+                self._idle.append(worker)
+            # Replace retired workers right away so the next job gets a warm one
+            self._fill()
+            self._cond.notify_all()
+
+    def shutdown(self, timeout=2):
+        with self._cond:
+            self._closed = True
+            workers = self._idle + list(self._busy)
+            self._idle = []
+            self._cond.notify_all()
+        for worker in workers:
+            worker.stop()
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.process.join(max(0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.kill()
+
+
+class UiUpdateBuffer:
+    """Thread-safe mailbox where workers leave log lines and progress for the UI to collect.
+
+    Only the latest progress event per job is kept, and log lines beyond ``max_lines`` per frame
+    are dropped (oldest first) since the log view could not show them anyway. Finished
+    downloads leave their result here too (``add_result``).
+    """
+
+    def __init__(self, max_lines=LOG_MAX_LINES):
+        self._lock = threading.Lock()
+        self._lines = deque(maxlen=max_lines)
+        self._progress = {}
+        self._dropped = 0
+        self._results = []
+
+    def add_result(self, key, success, message):
+        with self._lock:
+            self._results.append((key, success, message))
+
+    def drain_results(self):
+        """Return and reset the pending ``(key, success, message)`` results.
+
+        A result is only added after the job's last lines, so draining results before
+        ``drain`` never picks up a result whose lines are still to come.
+        """
+        with self._lock:
+            results, self._results = self._results, []
+        return results
+
+    def add_line(self, key, line):
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append((key, line))
+
+    def set_progress(self, key, event):
+        with self._lock:
+            self._progress[key] = event
+
+    def drain(self):
+        """Return and reset the pending (lines, progress, dropped count)."""
+        with self._lock:
+            lines = list(self._lines)
+            progress = self._progress
+            dropped = self._dropped
+            self._lines.clear()
+            self._progress = {}
+            self._dropped = 0
+        return lines, progress, dropped
+
+
+# Child process output is read this much at a time; lines end at \n or \r (progress redraws)
+OUTPUT_READ_CHUNK = 64 * 1024
+LINE_BREAK_RE = re.compile(r'[\r\n]')
+
+class LineSplitter:
+    """Turn chunks of a byte stream into lines: decoded incrementally, with bad bytes replaced."""
+
+    def __init__(self, on_line, encoding):
+        self.on_line = on_line
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._partial = ''
+
+    def feed(self, data, final=False):
+        lines = LINE_BREAK_RE.split(self._partial + self._decoder.decode(data, final))
+        self._partial = '' if final else lines.pop()
+        for line in lines:
+            # \r\n leaves an empty piece between the two
+            if line:
+                self.on_line(line)
+
+
+class OutputReactor:
+    """One thread that reads the output pipes of every running child process and runs timers.
+
+    ``watch`` hands over a process's stdout; its lines are passed to ``on_line`` on the
+    reactor's thread, then ``on_done`` is called and the returned event set once the last one
+    was delivered. ``call_later`` runs a callback on the reactor's thread after a delay.
+    Pipes can't be polled on Windows, so there each pipe gets a reader thread of its own instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timers = []
+        self._timer_seq = 0
+        self._selector = None
+        self._wakeup = None
+        self._thread = None
+
+    def watch(self, stream, on_line, encoding=None, on_done=None):
+        splitter = LineSplitter(on_line, encoding or locale.getpreferredencoding(False))
+        done = threading.Event()
+        watched = (stream, splitter, done, on_done)
+        if os.name == 'nt':
+            threading.Thread(target=self._drain, args=watched, daemon=True).start()
+            return done
+        os.set_blocking(stream.fileno(), False)
+        with self._lock:
+            self._start()
+            # The selector is only touched on the reactor thread; it registers the pipe when woken
+            self._pending.append(watched)
+        self._wake()
+        return done
+
+    def call_later(self, delay, callback):
+        with self._lock:
+            self._start()
+            self._timer_seq += 1
+            heapq.heappush(self._timers, (time.monotonic() + delay, self._timer_seq, callback))
+        self._wake()
+
+    def _start(self):
+        if self._thread is None:
+            self._selector = selectors.DefaultSelector()
+            # A socket pair rather than a pipe, since only sockets can be selected on Windows
+            self._wakeup = socket.socketpair()
+            for end in self._wakeup:
+                end.setblocking(False)
+            self._selector.register(self._wakeup[0], selectors.EVENT_READ)
+            self._thread = threading.Thread(target=self._run, name='output-reactor', daemon=True)
+            self._thread.start()
+
+    def _wake(self):
+        try:
+            self._wakeup[1].send(b'\0')
+        except BlockingIOError:
+            # Already plenty of wake-ups waiting to be read
+            pass
+
+    def _run(self):
+        while True:
+            with self._lock:
+                timeout = max(0, self._timers[0][0] - time.monotonic()) if self._timers else None
+            for key, _ in self._selector.select(timeout):
+                if key.fileobj is self._wakeup[0]:
+                    self._register_pending()
+                    continue
+                stream, splitter, done, on_done = key.data
+                try:
+                    data = os.read(key.fd, OUTPUT_READ_CHUNK)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b''
+                if data:
+                    self._deliver(splitter, data)
+                else:
+                    self._selector.unregister(key.fd)
+                    self._finish(*key.data)
+            self._run_timers()
+
+    def _run_timers(self):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._timers and self._timers[0][0] <= now:
+                due.append(heapq.heappop(self._timers)[2])
+        for callback in due:
+            self._call(callback)
+
+    def _register_pending(self):
+        try:
+            while self._wakeup[0].recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for watched in pending:
+            self._selector.register(watched[0].fileno(), selectors.EVENT_READ, watched)
+
+    def _drain(self, stream, splitter, done, on_done):
+        try:
+            while True:
+                data = os.read(stream.fileno(), OUTPUT_READ_CHUNK)
+                if not data:
+                    break
+                self._deliver(splitter, data)
+        except OSError:
+            pass
+        self._finish(stream, splitter, done, on_done)
+
+    def _finish(self, stream, splitter, done, on_done):
+        self._deliver(splitter, b'', final=True)
+        stream.close()
+        done.set()
+        if on_done:
+            self._call(on_done)
+
+    @staticmethod
+    def _call(callback):
+        try:
+            callback()
+        except Exception:
+            # One job's callback failing must not stop the output of all the others
+            pass
+
+    @staticmethod
+    def _deliver(splitter, data, final=False):
+        try:
+            splitter.feed(data, final)
+        except Exception:
+            pass
+
+
+_output_reactor = None
+_output_reactor_lock = threading.Lock()
+
+def output_reactor():
+    """The process-wide ``OutputReactor``, started on first use."""
+    global _output_reactor
+    with _output_reactor_lock:
+        if _output_reactor is None:
+            _output_reactor = OutputReactor()
+        return _output_reactor
+
+_download_steps = None
+
+def download_steps():
+    """The one thread that runs yt-dlp executable downloads between their output: starting
+    processes, handling their exit, retries. Started on first use."""
+    global _download_steps
+    with _output_reactor_lock:
+        if _download_steps is None:
+            _download_steps = ThreadPoolExecutor(max_workers=1, thread_name_prefix='download-steps')
+        return _download_steps
+
+_cookie_exports = None
+
+def cookie_exports():
+    """The thread that checks out browser cookies for yt-dlp executable downloads, since an
+    export can take seconds and must not hold up ``download_steps``. Started on first use."""
+    global _cookie_exports
+    with _output_reactor_lock:
+        if _cookie_exports is None:
+            # SessionCookies runs one checkout at a time anyway
+            _cookie_exports = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cookie-exports')
+        return _cookie_exports
+
+# A stopped process tree gets this long (seconds) to exit before it is killed; shutting down
+# waits this long for all running jobs together
+PROCESS_KILL_GRACE = 3
+SHUTDOWN_TIMEOUT = 5
+
+def process_group_options():
+    """Popen arguments that start a child in a process group of its own, so whatever it starts
+    (ffmpeg, aria2c) can be stopped along with it."""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+def signal_process_tree(process, kill=False):
+    """Terminate (or kill) a child started with ``process_group_options`` and its descendants."""
+    if os.name == 'nt':
+        # Console programs can't be asked to exit on Windows; taskkill /T takes the children along
+        subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL if kill else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def stop_process_tree(process, grace=PROCESS_KILL_GRACE):
+    """Stop a process tree in the background and return at once.
+
+    The tree gets SIGTERM (so yt-dlp keeps its ``.part`` file), and whatever is left of it
+    after ``grace`` seconds is killed; with ``grace=0`` it is killed right away.
+    """
+    def stop():
+        if grace:
+            signal_process_tree(process)
+            try:
+                process.wait(timeout=grace)
+            except subprocess.TimeoutExpired:
+                pass
+        # Also catches children that outlive a leader which exited on SIGTERM
+        signal_process_tree(process, kill=True)
+    threading.Thread(target=stop, daemon=True).start()
+
+def user_cache_dir():
+    """Per-user cache directory for the application."""
+    system = platform.system()
+    if system == 'Windows':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'YTDLPGui', 'Cache')
+    if system == 'Darwin':
+        return os.path.join(os.path.expanduser('~/Library/Caches'), 'YTDLPGui')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'ytdlp-gui')
+
+def default_archive_path():
+    return os.path.join(user_data_dir(), 'archive.txt')
+
+def user_data_dir():
+    """Per-user data directory for files that must survive cache cleanups."""
+    system = platform.system()
+    if system == 'Windows':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'YTDLPGui')
+    if system == 'Darwin':
+        return os.path.join(os.path.expanduser('~/Library/Application Support'), 'YTDLPGui')
+    base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+    return os.path.join(base, 'ytdlp-gui')
+
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = {'si', 'feature', 'fbclid', 'gclid', 'igshid', 'ref', 'ref_src'}
+
+def normalize_url(url):
+    """Canonical form of a URL so trivially different links share one cache entry."""
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith('utm_') and key not in TRACKING_PARAMS
+    )
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or '/', urlencode(query), ''))
+
+
+class MetadataCache:
+    """On-disk cache of yt-dlp info JSON, keyed by normalized URL.
+
+    Entries expire ``ttl`` seconds after they were fetched (stream URLs inside them go stale),
+    and the least recently used ones are evicted once the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory, ttl=METADATA_CACHE_TTL, max_bytes=METADATA_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # file name -> (fetched_at, size), least recently used first
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._load()
+
+    def _load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.info.json') and entry.is_file():
+                stat_result = entry.stat()
+                found.append((stat_result.st_mtime, entry.name, stat_result.st_size))
+        for fetched_at, name, size in sorted(found):
+            self._entries[name] = (fetched_at, size)
+            self._total_bytes += size
+
+    def _name(self, url):
+        return hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest() + '.info.json'
+
+    def _remove(self, name):
+        _, size = self._entries.pop(name)
+        self._total_bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def lookup(self, url):
+        """Path of a fresh cached info JSON for ``url``, or None."""
+        name = self._name(url)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and time.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return os.path.join(self.directory, name)
+            if entry:
+                self._remove(name)
+            self.misses += 1
+            return None
+
+    def store(self, url, info_json):
+        """Save probed info JSON for ``url`` and return its path."""
+        name = self._name(url)
+        path = os.path.join(self.directory, name)
+        data = info_json.encode('utf-8')
+        # Write to a temp file first so a reader never sees a half-written entry
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if name in self._entries:
+                self._total_bytes -= self._entries.pop(name)[1]
+            self._entries[name] = (time.time(), len(data))
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+        return path
+
+    def invalidate(self, url):
+        name = self._name(url)
+        with self._lock:
+            if name in self._entries:
+                self._remove(name)
+
+    def stats_text(self):
+        with self._lock:
+            return (f"Metadata cache: {self.hits} hits, {self.misses} misses, "
+                    f"{len(self._entries)} entries ({format_bytes(self._total_bytes)})")
+
+
+def export_browser_cookies(browser, path):
+    """Save a browser's cookies to ``path`` as the Netscape cookie file ``--cookies`` reads."""
+    if library_engine_available():
+        import yt_dlp
+        params = {'cookiesfrombrowser': (browser,), 'cookiefile': path, 'quiet': True, 'no_warnings': True}
+        with yt_dlp.YoutubeDL(params) as ydl:
+            # Loading the jar reads the browser's store; closing the YoutubeDL saves it to ``path``
+            ydl.cookiejar
+    else:
+        # yt-dlp writes the cookies it loaded to --cookies on exit, even without a URL to download
+        result = subprocess.run(
+            [ytdlp_executable(), '--ignore-config', '--cookies-from-browser', browser, '--cookies', path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, encoding='utf-8',
+            errors='replace', timeout=COOKIE_EXPORT_TIMEOUT
+        )
+        if not os.path.exists(path):
+            errors = [line for line in result.stderr.splitlines() if 'ERROR' in line]
+            raise OSError(errors[-1] if errors else f"yt-dlp exited with code {result.returncode}")
+
+
+class SessionCookies:
+    """Browser cookies exported once into a private cookie jar that every job reads from.
+
+    Reading a browser's store means copying and decrypting its database, which takes seconds
+    and contends with the browser itself; here it happens once per ``ttl``, or again after
+    ``invalidate`` (an auth failure). Each job checks out its own copy of the jar, because
+    yt-dlp writes its cookie file back when it exits.
+    """
+
+    def __init__(self, ttl=COOKIE_JAR_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._directory = None
+        # browser -> (jar path, exported_at), and browser -> (failed_at, message)
+        self._jars = {}
+        self._failures = {}
+
+    def checkout(self, browser):
+        """Copy the browser's jar for one job, exporting it first if stale: ``(path, exported_at)``.
+
+        Raises ``OSError`` if the export fails (remembered for ``ttl``); the job then reads
+        the browser itself.
+        """
+        with self._lock:
+            failure = self._failures.get(browser)
+            if failure and time.time() - failure[0] < self.ttl:
+                raise OSError(failure[1])
+            if self._directory is None:
+                self._directory = tempfile.mkdtemp(prefix='ytdlp-gui-cookies-')
+            path, exported_at = self._jars.get(browser, (None, 0))
+            if path is None or time.time() - exported_at >= self.ttl:
+                path, exported_at = self._export(browser)
+            fd, copy_path = tempfile.mkstemp(prefix=f'{browser}-', suffix='.txt', dir=self._directory)
+            with os.fdopen(fd, 'wb') as copy, open(path, 'rb') as jar:
+                shutil.copyfileobj(jar, copy)
+        return copy_path, exported_at
+
+    def _export(self, browser):
+        path = os.path.join(self._directory, f'{browser}.txt')
+        tmp_path = f'{path}.tmp'
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            export_browser_cookies(browser, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self._failures[browser] = (time.time(), str(e) or type(e).__name__)
+            self._jars.pop(browser, None)
+            raise OSError(self._failures[browser][1]) from e
+        self._failures.pop(browser, None)
+        self._jars[browser] = (path, time.time())
+        return self._jars[browser]
+
+    def invalidate(self, browser, exported_at=None):
+        """Export the browser's cookies afresh on the next checkout.
+
+        With ``exported_at``, only if the jar is still that export: jobs failing on the same
+        stale cookies then trigger one export between them.
+        """
+        with self._lock:
+            entry = self._jars.get(browser)
+            if entry and (exported_at is None or entry[1] == exported_at):
+                del self._jars[browser]
+            self._failures.pop(browser, None)
+
+    def close(self):
+        """Delete the session's cookie files."""
+        with self._lock:
+            if self._directory:
+                shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+            self._jars.clear()
+            self._failures.clear()
+
+
+class DownloadArchive:
+    """In-memory index over a yt-dlp download archive file (one "extractor id" line per item).
+
+    yt-dlp appends to the file itself, under a file lock, whenever a download completes;
+    ``refresh`` picks up only the bytes appended since the last read, so keeping the index
+    current stays cheap however large the archive grows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._keys = set()
+        self._offset = 0
+        # yt-dlp appends to the file but won't create its directory
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def refresh(self):
+        """Index lines appended to the archive since the last call."""
+        with self._lock:
+            try:
+                with open(self.path, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size < self._offset:
+                        # The file was truncated or replaced; start over
+                        self._offset = 0
+                        self._keys = set()
+                    f.seek(self._offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return
+            # Leave a trailing partial line for the next call, a writer may still be mid-line
+            end = data.rfind(b'\n') + 1
+            new_keys = {line.strip() for line in data[:end].decode('utf-8', 'replace').splitlines()}
+            new_keys.discard('')
+            self._keys |= new_keys
+            self._offset += end
+
+
+class ArchiveKeyResolver:
+    """Work out a URL's download archive key offline, from yt-dlp's extractor URL patterns.
+
+    Needs the yt_dlp package; ``resolve`` returns None until ``warm_up`` has loaded the
+    extractors, or when no specific extractor recognises the URL.
+    """
+
+    # After this many URLs of a host matched no extractor, stop scanning them all for that host
+    MAX_HOST_MISSES = 20
+
+    def __init__(self):
+        self._extractors = None
+        self._by_host = {}
+        self._host_misses = {}
+
+    @property
+    def ready(self):
+        return self._extractors is not None
+
+    def warm_up(self):
+        if self._extractors is None and library_engine_available():
+            import yt_dlp
+            self._extractors = [
+                ie for ie in yt_dlp.extractor.gen_extractor_classes() if ie.ie_key() != 'Generic'
+            ]
+
+    def resolve(self, url):
+        if self._extractors is None:
+            return None
+        host = urlsplit(url).netloc.lower()
+        known = self._by_host.setdefault(host, [])
+        for ie in known:
+            if ie.suitable(url):
+                return self._key(ie, url)
+        if self._host_misses.get(host, 0) >= self.MAX_HOST_MISSES:
+            return None
+        for ie in self._extractors:
+            if ie not in known and ie.suitable(url):
+                # Remember which extractors serve this host so later URLs skip the full scan
+                known.append(ie)
+                return self._key(ie, url)
+        self._host_misses[host] = self._host_misses.get(host, 0) + 1
+        return None
+
+    def _key(self, ie, url):
+        video_id = ie.get_temp_id(url)
+        return f"{ie.ie_key().lower()} {video_id}" if video_id else None
+
+
+
+# Choices offered by the option widgets and the headless command line
+QUALITY_PROFILES = ["Best Quality", "1080p", "720p", "480p", "360p", "Audio Only"]
+CONTAINERS = ["Auto (Best)", "MP4", "MKV", "WEBM"]
+AUDIO_FORMATS = ["mp3", "m4a", "wav", "flac"]
+COOKIE_BROWSERS = ["None", "Chrome", "Firefox", "Safari", "Edge", "Brave", "Opera"]
+
+def target_container(options):
+    """The container (file extension) the Container option asks for, or None for Auto."""
+    video_format = options.get('video_format')
+    if options.get('extract_audio') or not video_format or video_format == 'Auto (Best)':
+        return None
+    return video_format.lower()
+
+def merge_format(options):
+    """yt-dlp's --merge-output-format: the target container when the streams fit, else MKV."""
+    container = target_container(options)
+    if container is None or container == 'mkv':
+        return container
+    return f"{container}/mkv"
+
+def apply_quality_profile(options, profile):
+    """Set the format selection of an option dict from one of ``QUALITY_PROFILES``."""
+    # Kept for select_formats, which picks exact formats once the format list is probed
+    options['quality'] = profile
+    if profile == "Best Quality":
+        # Let yt-dlp auto-select and merge the best formats (no -f)
+        pass
+    elif profile == "Audio Only":
+        options['extract_audio'] = True
+        # Prefer bestaudio with a safe fallback
+        options['format'] = "bestaudio/best"
+    elif profile.endswith('p'):
+        height = profile[:-1]
+        # Select best video up to the chosen height + best audio, with fallback to a single file up to that height
+        options['format'] = f"bestvideo[height<={height}]+bestaudio/best[height<={height}]"
+    return options
+
+def build_command(url, options, output_path, info_path=None):
+    """Build the yt-dlp command line for a download."""
+    cmd = [ytdlp_executable()]
+    
+    # Ask for machine-readable progress, one JSON update per line
+    cmd.extend(['--newline', '--no-colors'])
+    cmd.extend(['--progress-template', f'download:{PROGRESS_TEMPLATE}'])
+    cmd.extend(['--progress-template', f'postprocess:{POSTPROCESS_TEMPLATE}'])
+    
+    # Add options based on selections
+    if options.get('format'):
+        cmd.extend(['-f', options['format']])
+    
+    # Audio extraction and container conversion run afterwards in the PostProcessPool, so
+    # the download only fetches (and merges) the streams
+    if options.get('extract_audio'):
+        if not options.get('format'):
+            cmd.extend(['-f', 'bestaudio/best'])
+    elif merge_format(options):
+        cmd.extend(['--merge-output-format', merge_format(options)])
+    
+    if options.get('subtitle'):
+        cmd.append('--write-subs')
+        if options.get('auto_sub'):
+            cmd.append('--write-auto-subs')
+    
+    if options.get('thumbnail'):
+        cmd.append('--write-thumbnail')
+    
+    if options.get('description'):
+        cmd.append('--write-description')
+    
+    # Playlist options
+    if options.get('playlist'):
+        cmd.extend(playlist_range_args(options))
+    else:
+        cmd.append('--no-playlist')
+    
+    # Speed limit
+    if options.get('speed_limit') and options['speed_limit'] > 0:
+        cmd.extend(['-r', f"{options['speed_limit']}K"])
+    
+    # Fragment concurrency, chunking and external downloader
+    cmd.extend(transfer_args(options))
+    
+    # Cookies from browser
+    cmd.extend(cookie_args(options))
+    
+    # Skip (and record) items listed in the download archive
+    if options.get('download_archive'):
+        cmd.extend(['--download-archive', options['download_archive']])
+    
+    # Output directory
+    if output_path:
+        cmd.extend(['-o', f'{output_path}/%(title)s.%(ext)s'])
+    
+    # Add URL, or the cached metadata which saves yt-dlp the extraction
+    if info_path:
+        cmd.extend(['--load-info-json', info_path])
+    else:
+        cmd.append(url)
+    return cmd
+
+
+# Codecs (as ffmpeg names them) each container holds as they are; None takes anything.
+# Streams in other codecs are re-encoded with the container's encoder arguments
+CONTAINER_CODECS = {
+    'mp4': {'video': {'h264', 'hevc', 'av1', 'vp9', 'mpeg4'},
+            'audio': {'aac', 'mp3', 'opus', 'alac', 'flac', 'ac3', 'eac3'}},
+    'webm': {'video': {'vp8', 'vp9', 'av1'}, 'audio': {'opus', 'vorbis'}},
+    'mkv': {'video': None, 'audio': None},
+}
+CONTAINER_ENCODERS = {
+    'mp4': {'video': ['libx264', '-crf', '23', '-preset', 'medium'], 'audio': ['aac', '-b:a', '192k']},
+    'webm': {'video': ['libvpx-vp9', '-crf', '32', '-b:v', '0', '-row-mt', '1'], 'audio': ['libopus', '-b:a', '128k']},
+}
+# Audio Format choices: the codec a source must already have to be copied, and the encoder otherwise
+AUDIO_ENCODERS = {
+    'mp3': ('mp3', ['libmp3lame', '-q:a', '5']),
+    'm4a': ('aac', ['aac', '-b:a', '192k']),
+    'wav': ('pcm_s16le', ['pcm_s16le']),
+    'flac': ('flac', ['flac']),
+}
+FFMPEG_DURATION_RE = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+FFMPEG_PROGRESS_RE = re.compile(r'^(\w+)=(.*)$')
+FFMPEG_STREAM_RE = re.compile(r'Stream #\d+:\d+\S*: (Video|Audio): (\w+)(.*)')
+
+
+def ffmpeg_executable():
+    return shutil.which('ffmpeg')
+
+def probe_media(ffmpeg, path):
+    """Read a media file's duration (seconds) and stream codecs from ``ffmpeg -i``.
+
+    Returns ``(duration, streams)`` with ``streams`` a list of ``('video'|'audio', codec)``;
+    cover art attached as a picture stream is left out.
+    """
+    result = subprocess.run([ffmpeg, '-hide_banner', '-nostdin', '-i', path], stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace')
+    duration = None
+    match = FFMPEG_DURATION_RE.search(result.stderr)
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    streams = [(kind.lower(), codec) for kind, codec, rest in FFMPEG_STREAM_RE.findall(result.stderr)
+               if 'attached pic' not in rest]
+    return duration, streams
+
+def plan_conversion(path, options, streams):
+    """Work out how to turn a downloaded file into what the options ask for.
+
+    Streams the target container holds are copied (a remux, about as fast as the disk);
+    only the others are re-encoded. Returns ``(target_path, ffmpeg_args, label)``, or None
+    when the file already is what was asked for.
+    """
+    base, ext = os.path.splitext(path)
+    ext = ext[1:].lower()
+    codecs = {kind: [codec for stream_kind, codec in streams if stream_kind == kind] for kind in ('video', 'audio')}
+    if options.get('extract_audio'):
+        target = options.get('audio_format', 'mp3')
+        if not codecs['audio']:
+            raise ValueError("the download has no audio stream")
+        source_codec, encoder = AUDIO_ENCODERS[target]
+        copy = codecs['audio'][0] == source_codec
+        if copy and ext == target:
+            return None
+        args = ['-map', '0:a:0', '-vn', '-c:a'] + (['copy'] if copy else encoder)
+        return f"{base}.{target}", args, "Remux" if copy else "ExtractAudio"
+    
+    target = target_container(options)
+    if target is None:
+        return None
+    args = ['-map', '0:V?', '-map', '0:a?']
+    recoded = []
+    for kind in ('video', 'audio'):
+        allowed = CONTAINER_CODECS[target][kind]
+        if allowed is None or all(codec in allowed for codec in codecs[kind]):
+            args.extend([f'-c:{kind[0]}', 'copy'])
+        else:
+            args.extend([f'-c:{kind[0]}'] + CONTAINER_ENCODERS[target][kind])
+            recoded.append(kind)
+    if not recoded and ext == target:
+        return None
+    if target == 'mp4':
+        args.extend(['-movflags', '+faststart'])
+    label = "Remux" if not recoded else f"Recode {'+'.join(recoded)}"
+    return f"{base}.{target}", args, label
+
+
+class PostProcessPool:
+    """Worker threads for the CPU-heavy step after a download: container conversion and
+    audio extraction, each run as an ffmpeg process.
+
+    A download hands its files over with ``submit`` and frees its network slot straight away;
+    up to ``workers`` conversions (one per CPU core by default) run at once, the rest wait.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='postprocess')
+
+    def submit(self, task, done):
+        """Convert ``task``'s downloaded files; ``done(success, message)`` runs on a worker thread.
+
+        ``task.cancel()`` stops a running conversion, or skips it if it has not started yet.
+        """
+        future = self._executor.submit(task.convert)
+        future.add_done_callback(lambda future: done(*future.result()))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Prefixes of the codec strings in yt-dlp's format lists (avc1.640028, vp09.00.40.08, mp4a.40.2, ...)
+# and the ffmpeg codec names they stand for
+CODEC_PREFIXES = [
+    ('avc', 'h264'), ('h264', 'h264'), ('hev', 'hevc'), ('hvc', 'hevc'), ('h265', 'hevc'),
+    ('vp09', 'vp9'), ('vp9', 'vp9'), ('vp8', 'vp8'), ('av01', 'av1'), ('mp4v', 'mpeg4'),
+    ('mp4a', 'aac'), ('aac', 'aac'), ('opus', 'opus'), ('vorbis', 'vorbis'), ('mp3', 'mp3'),
+    ('flac', 'flac'), ('alac', 'alac'), ('ac-3', 'ac3'), ('ec-3', 'eac3'),
+]
+# File extensions yt-dlp merges into each container without falling back to MKV
+CONTAINER_EXTS = {'mp4': {'mp4', 'm4a'}, 'webm': {'webm'}}
+
+
+def codec_name(codec):
+    """The ffmpeg name of a format-list codec string, or None for 'none' and unknown codecs."""
+    codec = (codec or 'none').lower()
+    if codec == 'none':
+        return None
+    for prefix, name in CODEC_PREFIXES:
+        if codec.startswith(prefix):
+            return name
+    return codec.split('.')[0]
+
+def format_size(fmt, duration):
+    """A format's size in bytes and whether it is an estimate, or ``(None, True)`` if unknown."""
+    if fmt.get('filesize'):
+        return fmt['filesize'], False
+    if fmt.get('filesize_approx'):
+        return fmt['filesize_approx'], True
+    if fmt.get('tbr') and duration:
+        # tbr is in kbit/s
+        return int(fmt['tbr'] * duration * 125), True
+    return None, True
+
+
+@dataclass
+class FormatSelection:
+    """Formats picked from probed metadata: the ``-f`` value, the chosen formats and their total size."""
+    format_id: str
+    formats: list
+    total_bytes: int | None = None
+    estimated: bool = False
+
+    def size_text(self):
+        if self.total_bytes is None:
+            return "size unknown"
+        return f"{'~' if self.estimated else ''}{format_bytes(self.total_bytes)}"
+
+    def summary(self):
+        """Short text for the queue view, e.g. ``137+140, 124.60MiB``."""
+        return f"{self.format_id}, {self.size_text()}"
+
+    def describe(self):
+        """Log line naming each format's resolution or bitrate, codec and container."""
+        parts = []
+        for fmt in self.formats:
+            vcodec, acodec = codec_name(fmt.get('vcodec')), codec_name(fmt.get('acodec'))
+            details = [f"{fmt['height']}p" if vcodec and fmt.get('height') else None, vcodec, acodec,
+                       f"{fmt['abr']:.0f}k" if not vcodec and fmt.get('abr') else None, fmt.get('ext')]
+            parts.append(f"{fmt['format_id']} ({' '.join(detail for detail in details if detail)})")
+        return f"{' + '.join(parts)}, {self.size_text()}"
+
+
+def select_formats(info, options):
+    """Pick exact formats from a probed format list for the quality, container and audio options.
+
+    Streams rank by height (up to the quality profile's limit), then by whether the requested
+    container takes their codec as it is (so the PostProcessPool at most remuxes) and their
+    extension (so yt-dlp merges straight into it), then by bitrate, with the smaller file
+    winning ties. Returns a ``FormatSelection``, or None to leave it to the generic selector.
+    """
+    formats = [fmt for fmt in info.get('formats') or [] if fmt.get('format_id')]
+    duration = info.get('duration')
+    quality = options.get('quality') or ''
+    max_height = int(quality[:-1]) if quality.endswith('p') and quality[:-1].isdigit() else None
+    container = target_container(options)
+    # 'none' marks a missing stream; a missing codec field only means it is unknown
+    video_only = [fmt for fmt in formats if fmt.get('vcodec') != 'none' and fmt.get('acodec') == 'none']
+    audio_only = [fmt for fmt in formats if fmt.get('acodec') != 'none' and fmt.get('vcodec') == 'none']
+    combined = [fmt for fmt in formats if fmt.get('vcodec') != 'none' and fmt.get('acodec') != 'none']
+    
+    def fits(fmt, kind):
+        if container is None:
+            return True
+        allowed = CONTAINER_CODECS[container][kind]
+        return allowed is None or codec_name(fmt.get(f'{kind[0]}codec')) in allowed
+    
+    def rank(fmt, kind, exts):
+        size, _ = format_size(fmt, duration)
+        return (fits(fmt, kind), not exts or fmt.get('ext') in exts, fmt.get('tbr') or fmt.get('abr') or 0, -(size or 0))
+    
+    def best_video(candidates):
+        if max_height:
+            candidates = [fmt for fmt in candidates if fmt.get('height') and fmt['height'] <= max_height]
+        if not candidates:
+            return None
+        exts = CONTAINER_EXTS.get(container)
+        return max(candidates, key=lambda fmt: (fmt.get('height') or 0, fmt.get('fps') or 0) + rank(fmt, 'video', exts))
+    
+    if options.get('extract_audio'):
+        copy_codec = AUDIO_ENCODERS[options.get('audio_format', 'mp3')][0]
+        candidates = audio_only or combined
+        if not candidates:
+            return None
+        chosen = [max(candidates, key=lambda fmt: (codec_name(fmt.get('acodec')) == copy_codec,
+                                                   fmt.get('abr') or fmt.get('tbr') or 0))]
+    else:
+        video = best_video(video_only)
+        if video and audio_only:
+            # With Auto, audio of the video's kind still merges without falling back to MKV
+            exts = CONTAINER_EXTS.get(container or video.get('ext'))
+            chosen = [video, max(audio_only, key=lambda fmt: rank(fmt, 'audio', exts))]
+        else:
+            single = best_video(combined)
+            if single is None:
+                return None
+            chosen = [single]
+    
+    total, estimated = 0, False
+    for fmt in chosen:
+        size, approx = format_size(fmt, duration)
+        if size is None:
+            total = None
+            break
+        total += size
+        estimated = estimated or approx
+    return FormatSelection('+'.join(fmt['format_id'] for fmt in chosen), chosen, total, estimated)
+
+
+# Failure classes recognised in a failed run's output, and what is done about each
+FAILURE_FORBIDDEN = 'forbidden'
+FAILURE_THROTTLED = 'throttled'
+FAILURE_GEO_BLOCKED = 'geo_blocked'
+FAILURE_EXTRACTOR = 'extractor'
+FAILURE_SERVER = 'server'
+FAILURE_NETWORK = 'network'
+FAILURE_FFMPEG = 'ffmpeg'
+FAILURE_UNKNOWN = 'unknown'
+
+RETRY_BACKOFF = 'backoff'
+RETRY_REFRESH = 'refresh'
+RETRY_FAIL_FAST = 'fail'
+
+# Checked in order against the error lines; the first match wins
+FAILURE_PATTERNS = [
+    (FAILURE_FFMPEG, re.compile(
+        r'Postprocessing:|ffmpeg exited with code|ffprobe and ffmpeg not found|ffmpeg not found|'
+        r'Conversion failed|Error (?:opening|while) (?:input|output|filtering)', re.I)),
+    (FAILURE_GEO_BLOCKED, re.compile(
+        r'not (?:made this video )?available (?:in|from) your (?:country|location)|geo[- ]?restrict', re.I)),
+    (FAILURE_THROTTLED, re.compile(r'HTTP Error 429|Too Many Requests|rate[- ]limit', re.I)),
+    (FAILURE_FORBIDDEN, re.compile(
+        r'HTTP Error 403|403: Forbidden|Sign in to confirm|cookies (?:are|have) (?:no longer valid|expired)', re.I)),
+    (FAILURE_SERVER, re.compile(
+        r'HTTP Error 5\d\d|Internal Server Error|Bad Gateway|Service (?:Temporarily )?Unavailable|'
+        r'Gateway Time-?out', re.I)),
+    # A failed page or API request is only permanent when the server said so (4xx, matched below)
+    (FAILURE_NETWORK, re.compile(
+        r'Connection (?:reset|refused|aborted)|Remote end closed|timed out|IncompleteRead|'
+        r'Temporary failure in name resolution|Name or service not known|Network is unreachable|'
+        r'\[Errno (?:104|110|111|113|-2|-3)\]|getaddrinfo failed|bytes read, \d+ more expected|'
+        r'SSL: |EOF occurred in violation of protocol|'
+        r'Unable to download (?:webpage|API JSON|JSON metadata|video data)(?!: HTTP Error 4)', re.I)),
+    # Only messages known to be permanent; other errors are retried once as unknown
+    (FAILURE_EXTRACTOR, re.compile(
+        r'Unsupported URL|Unable to extract|Video unavailable|Private video|has been removed|'
+        r'is not a valid URL|members-only|This video is (?:private|unavailable)|HTTP Error 40[04]|'
+        r'HTTP Error 410|No video formats found|Requested format is not available|'
+        r'This live event will begin|Premieres in', re.I)),
+]
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How a failure class is handled: the action, how often it is retried and the backoff (seconds)."""
+    label: str
+    action: str
+    retries: int = 0
+    base_delay: float = 5
+    max_delay: float = 300
+
+    def delay(self, retry):
+        """Jittered exponential backoff before the given retry (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (retry - 1))
+        # Equal jitter: keep half the backoff, randomise the rest so jobs do not retry in step
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+FAILURE_POLICIES = {
+    FAILURE_FORBIDDEN: RetryPolicy("Access denied (HTTP 403)", RETRY_REFRESH, retries=2, base_delay=5),
+    FAILURE_THROTTLED: RetryPolicy("Throttled (HTTP 429)", RETRY_BACKOFF, retries=5, base_delay=30, max_delay=600),
+    FAILURE_GEO_BLOCKED: RetryPolicy("Geo-blocked", RETRY_FAIL_FAST),
+    FAILURE_EXTRACTOR: RetryPolicy("Extractor error", RETRY_FAIL_FAST),
+    FAILURE_SERVER: RetryPolicy("Server error (HTTP 5xx)", RETRY_BACKOFF, retries=5, base_delay=10),
+    FAILURE_NETWORK: RetryPolicy("Network error", RETRY_BACKOFF, retries=5, base_delay=5),
+    FAILURE_FFMPEG: RetryPolicy("ffmpeg failed", RETRY_FAIL_FAST),
+    FAILURE_UNKNOWN: RetryPolicy("Download failed", RETRY_BACKOFF, retries=1, base_delay=10),
+}
+
+# Lines of output kept per attempt for classifying a failure
+FAILURE_TAIL_LINES = 40
+
+def classify_failure(lines):
+    """Return the failure class of a failed run from its last output lines and result message.
+
+    Only ``ERROR`` lines are looked at when there are any, since yt-dlp also warns about
+    problems it recovered from itself.
+    """
+    lines = [line for line in lines if line]
+    errors = [line for line in lines if 'ERROR' in line] or lines
+    text = '\n'.join(errors)
+    for failure, pattern in FAILURE_PATTERNS:
+        if pattern.search(text):
+            return failure
+    return FAILURE_UNKNOWN
+
+FAILURE_DETAIL_NOISE = re.compile(r' \(caused by <.*?>\)|; please report this issue on .*$')
+
+def failure_detail(lines, message):
+    """The most telling line of a failed run: its last error, else the result message."""
+    for line in reversed(lines):
+        if line.startswith('ERROR:'):
+            # Drop the bug report boilerplate yt-dlp appends to most errors
+            return FAILURE_DETAIL_NOISE.sub('', line[len('ERROR:'):]).strip()
+    return message
+
+def expansion_failure(options, error):
+    """Classify a failed playlist listing as ``(download_instead, message)``.
+
+    A listing that failed for a retriable reason is better handed to one ordinary download of
+    the playlist, whose task then retries with backoff, than failed outright.
+    """
+    lines = str(error).splitlines()
+    policy = FAILURE_POLICIES[classify_failure(lines)]
+    message = f"{policy.label}: {failure_detail(lines, str(error))}"
+    return policy.action != RETRY_FAIL_FAST and options.get('auto_retry', True), message
+
+
+# Output lines that name the file a download ends up in, most specific last
+OUTPUT_FILE_PATTERNS = [
+    re.compile(r'^\[download\] Destination: (.+)$'),
+    re.compile(r'^\[download\] (.+) has already been downloaded'),
+    re.compile(r'^\[(?:ExtractAudio|VideoConvertor|VideoRemuxer)\] .*Destination: (.+)$'),
+    re.compile(r'^\[Merger\] Merging formats into "(.+)"$'),
+    re.compile(r'^\[MoveFiles\] Moving file ".+" to "(.+)"$'),
+]
+# Peak throughput is the best average over windows of at least this many seconds; the speed
+# yt-dlp reports for single chunks spikes far above what the link sustains
+METRICS_PEAK_WINDOW = 1.0
+# The transfer begins once formats are picked (or the first destination is announced)
+DOWNLOAD_START_RE = re.compile(r'^\[info\] .+: Downloading \d+ format|^\[download\] Destination: ')
+
+class JobMetrics:
+    """Timings and throughput of one download, taken from what its engine reports as it runs.
+
+    Phases, in seconds: ``spawn`` (attempt start to the engine's first output), ``extraction``
+    (to the start of the transfer), ``ttfb`` (to the first downloaded bytes), ``download`` and
+    ``postprocess`` (first post-processor to the end). Phases describe the last attempt;
+    ``wall`` covers all of them. ``convert`` is the PostProcessPool's work after the download.
+    """
+
+    def __init__(self):
+        self.created = time.monotonic()
+        self._convert_start = None
+        self._convert_end = None
+        self.start_attempt()
+
+    def start_attempt(self):
+        self._started = time.monotonic()
+        self._first_output = None
+        self._download_start = None
+        self._first_bytes = None
+        self._download_end = None
+        self._postprocess_start = None
+        self._ended = None
+        self._bytes_by_file = {}
+        self._window = None
+        self.peak_speed = None
+        self.filename = None
+
+    def output(self, line=None):
+        now = time.monotonic()
+        if self._first_output is None:
+            self._first_output = now
+        if line is None:
+            return
+        if self._download_start is None and DOWNLOAD_START_RE.search(line):
+            self._download_start = now
+        for pattern in OUTPUT_FILE_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                self.filename = match.group(1)
+                break
+
+    def progress(self, event):
+        self.output()
+        now = time.monotonic()
+        if event.is_postprocessing:
+            if self._postprocess_start is None:
+                self._postprocess_start = now
+            return
+        if self._download_start is None:
+            self._download_start = now
+        size = event.downloaded_bytes or (event.total_bytes if event.status == 'finished' else None)
+        if size:
+            if self._first_bytes is None:
+                self._first_bytes = now
+            # Video and audio come as separate files before merging; count each once
+            key = event.filename or ''
+            self._bytes_by_file[key] = max(size, self._bytes_by_file.get(key, 0))
+            self._sample_speed(now)
+        if event.filename and not self.filename:
+            self.filename = event.filename
+        if event.status == 'finished':
+            self._download_end = now
+
+    def _sample_speed(self, now):
+        downloaded = sum(self._bytes_by_file.values())
+        if self._window is None:
+            self._window = (now, downloaded)
+            return
+        start, start_bytes = self._window
+        if now - start >= METRICS_PEAK_WINDOW:
+            self.peak_speed = max((downloaded - start_bytes) / (now - start), self.peak_speed or 0)
+            self._window = (now, downloaded)
+
+    def finish(self):
+        self._ended = time.monotonic()
+
+    def start_conversion(self):
+        self._convert_start = time.monotonic()
+
+    def finish_conversion(self, filename=None):
+        self._convert_end = time.monotonic()
+        if filename:
+            self.filename = filename
+
+    @staticmethod
+    def _span(start, end):
+        return round(end - start, 3) if start is not None and end is not None else None
+
+    def summary(self):
+        """The metrics as a flat dict (seconds, bytes, bytes/s; None where unknown)."""
+        ended = self._ended or time.monotonic()
+        downloaded = sum(self._bytes_by_file.values()) or None
+        download_end = self._download_end or self._postprocess_start or ended
+        download = self._span(self._download_start, download_end)
+        file_bytes = None
+        if self.filename:
+            try:
+                file_bytes = os.path.getsize(self.filename)
+            except OSError:
+                pass
+        average = round(downloaded / download) if downloaded and download else None
+        return {
+            'wall_s': self._span(self.created, max(ended, self._convert_end or ended)),
+            'spawn_s': self._span(self._started, self._first_output),
+            'extraction_s': self._span(self._first_output, self._download_start),
+            'ttfb_s': self._span(self._download_start, self._first_bytes),
+            'download_s': download,
+            'downloaded_bytes': downloaded,
+            'avg_bytes_per_sec': average,
+            # Downloads shorter than one window only have their average
+            'peak_bytes_per_sec': round(max(self.peak_speed or 0, average or 0)) or None,
+            'postprocess_s': self._span(self._postprocess_start, ended),
+            'convert_s': self._span(self._convert_start, self._convert_end),
+            'file_bytes': file_bytes if file_bytes is not None else downloaded,
+            'filename': self.filename,
+        }
+
+    def describe(self):
+        """One log line with the main figures."""
+        summary = self.summary()
+        parts = []
+        for label, key in (("spawn", 'spawn_s'), ("extraction", 'extraction_s'), ("TTFB", 'ttfb_s'),
+                           ("post-processing", 'postprocess_s'), ("conversion", 'convert_s')):
+            if summary[key] is not None:
+                parts.append(f"{label} {summary[key]:.2f}s")
+        if summary['avg_bytes_per_sec']:
+            parts.append(f"{format_bytes(summary['avg_bytes_per_sec'])}/s avg")
+        if summary['peak_bytes_per_sec']:
+            parts.append(f"{format_bytes(summary['peak_bytes_per_sec'])}/s peak")
+        if summary['file_bytes']:
+            parts.append(format_bytes(summary['file_bytes']))
+        return ", ".join(parts)
+
+
+class DownloadTask:
+    """One download run on the calling thread with the engine picked in the options.
+
+    Output goes to an ``UiUpdateBuffer`` under ``key`` rather than through callbacks per line,
+    so the GUI thread wrapper and the headless runner can both poll it at their own pace.
+    """
+
+    def __init__(self, url, options, output_path, updates, key, pool=None, cache=None, history=None,
+                 cookies=None):
+        self.url = url
+        self.options = options
+        self.output_path = output_path
+        self.updates = updates
+        self.key = key
+        self.pool = pool
+        self.cache = cache
+        self.cookies = cookies
+        self.process = None
+        self._is_cancelled = False
+        self._converting = False
+        # Share of the bandwidth budget (KB/s, 0 = unlimited) and how each engine applies it
+        self.rate_limit = 0
+        self.rate_limiter = RateLimiter()
+        self.speed = None
+        self._applied_rate = None
+        self._pending_rate = None
+        self._started_at = None
+        self._restart_requested = False
+        # One entry per attempt, oldest first (usually the job's own list, so it outlives the task).
+        # Entries are replaced rather than changed in place, so readers on other threads never
+        # see one half-written
+        self.history = history if history is not None else []
+        self._recent_lines = deque(maxlen=FAILURE_TAIL_LINES)
+        self.metrics = JobMetrics()
+        # Final paths of the downloaded files, as yt-dlp reports them once moved into place
+        self.output_files = []
+        # Exact formats picked from the probed format list (select_formats option)
+        self.selection = None
+        self._probe_path = None
+        # This attempt's copy of the session cookie jar, and which export it came from
+        self._cookie_path = None
+        self._cookie_exported_at = None
+        # Set by ``start``: where the result goes, and whether it was delivered yet
+        self._on_finished = None
+        self._finished = threading.Event()
+        self._retries = {}
+        self._in_attempt = False
+        self._info_path = None
+        # The process whose exit the yt-dlp executable engine waits for, and what to do then
+        self._exit_pending = None
+
+    @property
+    def needs_conversion(self):
+        """Whether any downloaded file still has to go through ``convert``.
+
+        yt-dlp only merges into the requested container when the streams fit it, so a file
+        that already has the requested extension is left as it is.
+        """
+        if self.options.get('extract_audio'):
+            target = self.options.get('audio_format', 'mp3')
+        else:
+            target = target_container(self.options)
+        return bool(target) and any(os.path.splitext(path)[1][1:].lower() != target for path in self.output_files)
+
+    def set_rate_limit(self, kbps):
+        """Change this job's share of the bandwidth budget while it runs.
+
+        The in-process engines pick it up from their rate hook; a yt-dlp executable is
+        restarted with the new ``-r`` (it resumes from its ``.part`` file), though not more
+        than every ``BANDWIDTH_RESTART_INTERVAL`` seconds or for small changes.
+        """
+        if kbps == self.rate_limit:
+            return
+        self.rate_limit = kbps
+        self.rate_limiter.set_rate(kbps)
+        self._pending_rate = kbps
+        process = self.process
+        if process and process.poll() is None and self._applied_rate is not None and not self._is_cancelled:
+            applied = self._applied_rate
+            significant = (not applied or not kbps
+                           or abs(kbps - applied) / applied >= BANDWIDTH_CHANGE_THRESHOLD)
+            if significant and time.monotonic() - self._started_at >= BANDWIDTH_RESTART_INTERVAL:
+                self._restart_requested = True
+                stop_process_tree(process)
+
+    def bandwidth_demand(self):
+        """The rate (KB/s) this job's source holds it to, or None if it could use more."""
+        if not self.speed or not self.rate_limit:
+            return None
+        kbps = self.speed / 1024
+        # Well under its share means the source is the bottleneck; leave some headroom
+        return kbps * 1.25 if kbps < self.rate_limit * 0.8 else None
+
+    def _rated_options(self):
+        options = dict(self.options, speed_limit=self.rate_limit)
+        if self.selection:
+            options['format'] = self.selection.format_id
+        if self._cookie_path:
+            options['cookies_file'] = self._cookie_path
+        return options
+
+    def cancel(self):
+        """Cancel the run; returns at once, the process tree is stopped in the background."""
+        self._is_cancelled = True
+        process = self.process
+        if process and process.poll() is None:
+            # ffmpeg answers SIGTERM by flushing its encoders into an output that is thrown away
+            stop_process_tree(process, 0 if self._converting else PROCESS_KILL_GRACE)
+            if self._exit_pending:
+                # A straggling child outside the process group may hold the pipe open after the tree is gone
+                output_reactor().call_later(1.0, partial(self._step, self._check_exit, process))
+
+    def _start_process(self, cmd, **popen_args):
+        """Start a child in a process group of its own, as ``self.process``."""
+        self.process = subprocess.Popen(cmd, **popen_args, **process_group_options())
+        if self._is_cancelled:
+            # Cancelled while starting: ``cancel`` may have looked at the previous process
+            stop_process_tree(self.process, 0)
+        return self.process
+
+    def start(self, on_finished):
+        """Start the download and return at once; ``on_finished(success, message)`` is called
+        when it ends, from a worker thread. Failures are retried as their ``FAILURE_POLICIES``
+        entry allows, and a final failure message starts with its class label.
+
+        The yt-dlp executable engine holds no thread while its process runs: the output is
+        read on the ``output_reactor`` thread and the steps in between run on the shared
+        ``download_steps`` thread. The in-process engines block while they download, so they
+        get a thread of their own.
+        """
+        self._on_finished = on_finished
+        engine = self.options.get('engine')
+        if engine == ENGINE_LIBRARY or (engine == ENGINE_POOL and self.pool):
+            threading.Thread(target=lambda: self._finish_run(*self._run_in_process()), daemon=True).start()
+        else:
+            self._step(self._start_run)
+
+    def run(self):
+        """Run the download and wait for it to end; returns ``(success, message)`` (see ``start``)."""
+        result = []
+        self.start(lambda *outcome: result.extend(outcome))
+        self.wait()
+        return tuple(result)
+
+    def wait(self, timeout=None):
+        """Wait for a started download to end; False if it is still running after ``timeout`` seconds."""
+        return self._finished.wait(timeout)
+
+    def _finish_run(self, success, message):
+        if self._finished.is_set():
+            return
+        self._finished.set()
+        self._on_finished(success, message)
+
+    def _prepare_run(self):
+        """Check the engine and settle the transfer options; returns an error message, or None."""
+        try:
+            engine = self.options.get('engine')
+            if engine in (ENGINE_LIBRARY, ENGINE_POOL) and not library_engine_available():
+                return "The built-in engine needs the yt-dlp Python package (pip install yt-dlp)"
+            
+            self.options, notes = resolve_transfer_options(self.options)
+            for note in notes:
+                self._note(f"[config] {note}")
+        except Exception as e:
+            return f"Error: {str(e)}"
+        return None
+
+    def _start_attempt(self):
+        self._recent_lines.clear()
+        entry = {'attempt': len(self.history) + 1, 'started': round(time.time(), 3)}
+        self.history.append(entry)
+        self.metrics.start_attempt()
+
+    def _end_attempt(self, success, message):
+        """Record how an attempt ended; returns ``(result, None)`` when the run is over, or
+        ``(None, delay)`` to try again after ``delay`` seconds."""
+        self.metrics.finish()
+        entry = self.history[-1]
+        failure = None
+        if not success and not self._is_cancelled:
+            failure = classify_failure(list(self._recent_lines) + [message])
+        detail = failure_detail(list(self._recent_lines), message) if failure else message
+        result = 'done' if success else failure or 'cancelled'
+        entry = dict(entry, ended=round(time.time(), 3), result=result, message=detail)
+        self.history[-1] = entry
+        if failure is None:
+            return (success, message), None
+        
+        policy = FAILURE_POLICIES[failure]
+        retry = self._retries.get(failure, 0) + 1
+        if policy.action == RETRY_FAIL_FAST or retry > policy.retries or not self.options.get('auto_retry', True):
+            tries = sum(self._retries.values()) + 1
+            suffix = f" (gave up after {tries} attempts)" if tries > 1 else ""
+            return (False, f"{policy.label}: {detail}{suffix}"), None
+        
+        self._retries[failure] = retry
+        delay = policy.delay(retry)
+        self.history[-1] = dict(entry, retry_in=round(delay, 1))
+        self._note(f"[retry] {policy.label}: {detail}")
+        if policy.action == RETRY_REFRESH:
+            self._refresh_session()
+        self._note(f"[retry] Retrying in {delay:.0f}s (retry {retry} of {policy.retries})")
+        return None, delay
+
+    def _run_in_process(self):
+        """The whole run for the in-process engines, on the calling thread."""
+        error = self._prepare_run()
+        if error:
+            return False, error
+        engine = self.options.get('engine')
+        while True:
+            self._start_attempt()
+            result, delay = self._end_attempt(*self._attempt(engine))
+            if result:
+                return result
+            if not self._wait(delay):
+                return False, "Download cancelled by user"
+
+    def convert(self):
+        """Bring the downloaded files into the requested container or audio format.
+
+        Runs on a ``PostProcessPool`` worker after ``run`` succeeded; returns ``(success, message)``.
+        """
+        if self._is_cancelled:
+            return False, "Download cancelled by user"
+        ffmpeg = ffmpeg_executable()
+        if ffmpeg is None:
+            # The download itself succeeded; keep the file as it came rather than fail the job
+            self._note("[convert] ffmpeg not found, install it to convert downloads; keeping the downloaded file")
+            return True, "Download completed, conversion skipped: ffmpeg not found"
+        self.metrics.start_conversion()
+        self._converting = True
+        converted = 0
+        try:
+            for index, path in enumerate(self.output_files):
+                success, result = self._convert_file(ffmpeg, path)
+                if not success:
+                    return False, result
+                if result != path:
+                    converted += 1
+                    self.output_files[index] = result
+        except Exception as e:
+            return False, f"{FAILURE_POLICIES[FAILURE_FFMPEG].label}: {e}"
+        finally:
+            self._converting = False
+            self.metrics.finish_conversion(self.output_files[-1] if self.output_files else None)
+        if not converted:
+            return True, "Download completed successfully!"
+        return True, f"Download completed, {converted} file{'s' if converted > 1 else ''} converted"
+
+    def _convert_file(self, ffmpeg, path):
+        """Convert one file with ffmpeg; returns ``(True, final path)`` or ``(False, message)``."""
+        duration, streams = probe_media(ffmpeg, path)
+        try:
+            plan = plan_conversion(path, self.options, streams)
+        except ValueError as e:
+            return False, f"{FAILURE_POLICIES[FAILURE_FFMPEG].label}: {e}"
+        if plan is None:
+            return True, path
+        target, args, label = plan
+        base, ext = os.path.splitext(target)
+        temp_path = f"{base}.temp{ext}"
+        self._note(f"[convert] {label}: {os.path.basename(path)} -> {os.path.basename(target)}")
+        cmd = [ffmpeg, '-hide_banner', '-nostdin', '-loglevel', 'error', '-y', '-i', path, *args,
+               '-progress', 'pipe:1', '-nostats', temp_path]
+        self._start_process(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        started = time.monotonic()
+        errors = deque(maxlen=FAILURE_TAIL_LINES)
+        
+        def on_line(line):
+            match = FFMPEG_PROGRESS_RE.match(line.strip())
+            if match is None:
+                if line.strip():
+                    errors.append(line.strip())
+                return
+            key, value = match.groups()
+            if key == 'out_time_us' and value.isdigit() and duration:
+                percent = min(100.0, int(value) / 10000 / duration)
+                elapsed = time.monotonic() - started
+                eta = int(elapsed * (100 - percent) / percent) if percent else None
+                self.updates.set_progress(self.key, ProgressEvent(
+                    'processing', percent=percent, eta=eta, postprocessor=label, filename=target))
+        
+        output_reactor().watch(self.process.stdout, on_line, 'utf-8').wait()
+        self.process.wait()
+        
+        if self._is_cancelled or self.process.returncode != 0:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            if self._is_cancelled:
+                return False, "Download cancelled by user"
+            for error in errors:
+                self._log(error)
+            detail = errors[-1] if errors else f"ffmpeg exited with code {self.process.returncode}"
+            return False, f"{FAILURE_POLICIES[FAILURE_FFMPEG].label}: {detail}"
+        os.replace(temp_path, target)
+        if target != path:
+            os.remove(path)
+        self.updates.set_progress(self.key, ProgressEvent('finished', percent=100.0, postprocessor=label,
+                                                          filename=target))
+        self._note(f"[convert] {label} done in {time.monotonic() - started:.1f}s")
+        return True, target
+
+    def _attempt(self, engine):
+        """One run of the download with an in-process engine."""
+        try:
+            info_path = None
+            self.selection = None
+            self._checkout_cookies()
+            if self._wants_probe():
+                info_path = self._cached_info_path()
+                if info_path is None:
+                    if engine == ENGINE_LIBRARY:
+                        success, result = run_ydl_probe(
+                            self.url, self._rated_options(), self._log, lambda: self._is_cancelled
+                        )
+                    else:
+                        success, result = self._run_pool(('probe', self.url, self._rated_options()))
+                    # After a failed probe the download runs its own extraction and reports the real error
+                    info_path = self._store_probe(result) if success else None
+                if self._is_cancelled:
+                    return False, "Download cancelled by user"
+                if info_path and self.options.get('select_formats'):
+                    self._select_formats(info_path)
+            
+            if engine == ENGINE_LIBRARY:
+                success, message = self._run_library(info_path)
+            else:
+                success, message = self._run_pool(
+                    ('job', self.url, self._rated_options(), self.output_path, info_path)
+                )
+            self._attempt_failed(success, info_path)
+            return success, message
+        except Exception as e:
+            return False, f"Error: {str(e)}"
+        finally:
+            self._cleanup_attempt()
+
+    def _wants_probe(self):
+        # Playlists are left to yt-dlp; probing them would extract every entry up front
+        return bool(self.cache or self.options.get('select_formats')) and not self.options.get('playlist')
+
+    def _attempt_failed(self, success, info_path):
+        if not success and info_path and self.cache and not self._is_cancelled:
+            # Stream URLs in the cached info may have expired; extract afresh on retry
+            self.cache.invalidate(self.url)
+
+    def _cleanup_attempt(self):
+        if self._probe_path:
+            try:
+                os.remove(self._probe_path)
+            except OSError:
+                pass
+            self._probe_path = None
+        if self._cookie_path:
+            try:
+                os.remove(self._cookie_path)
+            except OSError:
+                pass
+            self._cookie_path = None
+
+    def _checkout_cookies(self):
+        """Take a copy of the session's exported browser cookies for this attempt, if in use."""
+        browser = cookies_browser(self.options)
+        if not browser or not self.cookies:
+            return
+        try:
+            self._cookie_path, self._cookie_exported_at = self.cookies.checkout(browser)
+        except OSError as e:
+            self._note(f"[cookies] Could not export {browser} cookies ({e}); yt-dlp will read them itself")
+            return
+        exported = time.strftime('%H:%M:%S', time.localtime(self._cookie_exported_at))
+        self._note(f"[cookies] Using {browser} cookies exported at {exported}")
+
+    def _refresh_session(self):
+        """Drop what a 403 may have been caused by before retrying: cached metadata and cookies."""
+        if self.cache:
+            self.cache.invalidate(self.url)
+        browser = cookies_browser(self.options)
+        if browser:
+            if self.cookies:
+                # Unless another job already did, the next checkout exports a new login
+                self.cookies.invalidate(browser, self._cookie_exported_at)
+            self._note("[retry] Reloading browser cookies")
+        else:
+            self._note("[retry] No browser cookies in use; set Use Cookies if this keeps failing")
+
+    def _wait(self, delay):
+        """Sit out a retry backoff, counting down in the progress; False if cancelled meanwhile."""
+        self.speed = None
+        deadline = time.monotonic() + delay
+        while not self._is_cancelled:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            self.updates.set_progress(self.key, ProgressEvent('retrying', eta=int(remaining + 0.999)))
+            time.sleep(min(1.0, remaining))
+        return False
+
+    def _log(self, line):
+        """Pass on a line of engine output (what failures are classified and timed from)."""
+        self._recent_lines.append(line)
+        self.metrics.output(line)
+        self.updates.add_line(self.key, line)
+
+    def _note(self, line):
+        """Pass on a line of the task's own commentary."""
+        self.updates.add_line(self.key, line)
+
+    def _cached_info_path(self):
+        """Return info JSON for this URL from the metadata cache; None means it has to be probed."""
+        if self.cache:
+            info_path = self.cache.lookup(self.url)
+            if info_path:
+                self._note("[cache] Using cached metadata")
+                return info_path
+            self._note("[cache] Probing metadata...")
+        else:
+            self._note("[formats] Probing formats...")
+        return None
+
+    def _store_probe(self, result):
+        """Keep probed info JSON (in the cache if in use) and return its path."""
+        if self.cache:
+            return self.cache.store(self.url, result)
+        # Without a cache the info only has to last until this attempt's download has read it
+        fd, self._probe_path = tempfile.mkstemp(prefix='probe-', suffix='.info.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(result)
+        return self._probe_path
+
+    def _select_formats(self, info_path):
+        try:
+            with open(info_path, encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.selection = select_formats(info, self.options)
+        if self.selection:
+            self._note(f"[formats] Selected {self.selection.describe()}")
+        else:
+            self._note("[formats] Nothing in the format list fits exactly; yt-dlp will choose")
+
+    def _handle_progress(self, event, line=None):
+        self.metrics.progress(event)
+        if (event.postprocessor == 'MoveFiles' and event.status == 'finished' and event.filename
+                and event.filename not in self.output_files):
+            self.output_files.append(event.filename)
+        if event.status == 'downloading':
+            self.speed = event.speed
+        self.updates.set_progress(self.key, event)
+        if line is not None:
+            self._log(line)
+        elif event.status != 'downloading':
+            # Per-chunk updates only feed the progress display; milestones are logged
+            self._log(event.describe())
+
+    # The yt-dlp executable engine: each step below runs on the download_steps thread and
+    # ends by starting a process, whose exit (reported by the reactor) triggers the next one
+
+    def _step(self, step, *args):
+        download_steps().submit(self._run_step, step, args)
+
+    def _run_step(self, step, args):
+        try:
+            step(*args)
+        except Exception as e:
+            # Ends the attempt like any failure, or the whole run if no attempt is under way
+            self._run_step(self._attempt_ended if self._in_attempt else self._finish_run,
+                           (False, f"Error: {str(e)}"))
+
+    def _start_run(self):
+        error = self._prepare_run()
+        if error:
+            self._finish_run(False, error)
+            return
+        self._next_attempt()
+
+    def _next_attempt(self):
+        self._start_attempt()
+        self._in_attempt = True
+        self._info_path = None
+        self.selection = None
+        if cookies_browser(self.options) and self.cookies:
+            future = cookie_exports().submit(self._checkout_cookies)
+            future.add_done_callback(partial(self._step, self._cookies_checked_out))
+            return
+        self._probe_or_launch()
+
+    def _cookies_checked_out(self, future):
+        future.result()
+        self._probe_or_launch()
+
+    def _probe_or_launch(self):
+        if self._wants_probe() and not self._is_cancelled:
+            self._info_path = self._cached_info_path()
+            if self._info_path is None:
+                cmd = [ytdlp_executable(), '-J', '--no-playlist', '--no-colors', '--no-warnings']
+                cmd.extend(cookie_args(self._rated_options()))
+                cmd.append(self.url)
+                output = []
+                self._start_process(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                self._watch(output.append, partial(self._probe_exited, output), 'utf-8')
+                return
+        self._probed()
+
+    def _probe_exited(self, output):
+        if self.process.returncode == 0 and not self._is_cancelled:
+            # Otherwise the download runs its own extraction and reports the real error
+            self._info_path = self._store_probe('\n'.join(output))
+        self._probed()
+
+    def _probed(self):
+        if self._is_cancelled:
+            self._attempt_ended(False, "Download cancelled by user")
+            return
+        if self._info_path and self.options.get('select_formats'):
+            self._select_formats(self._info_path)
+        self._launch()
+
+    def _launch(self):
+        self._applied_rate = self.rate_limit
+        self._started_at = time.monotonic()
+        cmd = build_command(self.url, self._rated_options(), self.output_path, self._info_path)
+        self._start_process(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self._watch(self._output_line, self._download_exited)
+
+    def _download_exited(self):
+        returncode = self.process.returncode
+        if self._restart_requested and not self._is_cancelled and returncode != 0:
+            self._restart_requested = False
+            rate = f"{self.rate_limit:g} KB/s" if self.rate_limit else "unlimited speed"
+            self._note(f"[bandwidth] Restarting at {rate}")
+            self._launch()
+            return
+        if self._is_cancelled:
+            success, message = False, "Download cancelled by user"
+        elif returncode == 0:
+            success, message = True, "Download completed successfully!"
+        else:
+            success, message = False, f"Download failed with return code: {returncode}"
+        self._attempt_failed(success, self._info_path)
+        self._attempt_ended(success, message)
+
+    def _attempt_ended(self, success, message):
+        self._in_attempt = False
+        self._cleanup_attempt()
+        result, delay = self._end_attempt(success, message)
+        if result:
+            self._finish_run(*result)
+        else:
+            self._backoff(time.monotonic() + delay)
+
+    def _backoff(self, deadline):
+        """Sit out a retry backoff like ``_wait``, counting down once a second, then try again."""
+        self.speed = None
+        if self._is_cancelled:
+            self._finish_run(False, "Download cancelled by user")
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._next_attempt()
+            return
+        self.updates.set_progress(self.key, ProgressEvent('retrying', eta=int(remaining + 0.999)))
+        output_reactor().call_later(min(1.0, remaining), partial(self._step, self._backoff, deadline))
+
+    def _watch(self, on_line, on_exit, encoding=None):
+        """Hand the current process's output to the reactor; ``on_exit`` runs once it has exited."""
+        process = self.process
+        self._exit_pending = (process, on_exit)
+        output_reactor().watch(process.stdout, on_line, encoding,
+                               on_done=partial(self._step, self._check_exit, process, True))
+
+    def _check_exit(self, process, output_done=False):
+        """Go on from ``process`` once its output was read, or (after a cancel) once it exited at all."""
+        pending = self._exit_pending
+        if pending is None or pending[0] is not process:
+            return
+        if not output_done and process.poll() is None:
+            output_reactor().call_later(1.0, partial(self._step, self._check_exit, process))
+            return
+        self._exit_pending = None
+        process.wait()
+        pending[1]()
+
+    def _output_line(self, line):
+        if self._is_cancelled:
+            return
+        line = line.strip()
+        if line:
+            event = parse_progress_line(line)
+            if event is None:
+                self._log(line)
+            else:
+                self._handle_progress(event, None if line.startswith(STRUCTURED_PREFIXES) else line)
+
+    def _run_library(self, info_path=None):
+        """Run the download inside this process through the yt_dlp package."""
+        self.rate_limiter.set_rate(self.rate_limit)
+        return run_ydl_download(
+            self.url, self._rated_options(), self.output_path,
+            self._log, self._handle_progress,
+            lambda: self._is_cancelled, info_path, self.rate_limiter,
+        )
+
+    def _run_pool(self, request):
+        """Hand a download or probe request to a pre-loaded worker process and relay its output."""
+        worker = self.pool.acquire(lambda: self._is_cancelled)
+        if worker is None:
+            return False, "Download cancelled by user"
+        success, message = False, "Worker process exited unexpectedly"
+        try:
+            worker.conn.send(request)
+            cancel_sent_at = None
+            while True:
+                rate, self._pending_rate = self._pending_rate, None
+                if rate is not None and cancel_sent_at is None:
+                    worker.conn.send(('rate', rate))
+                if self._is_cancelled and cancel_sent_at is None:
+                    worker.conn.send(('cancel',))
+                    cancel_sent_at = time.monotonic()
+                if cancel_sent_at is not None and time.monotonic() - cancel_sent_at > POOL_CANCEL_GRACE:
+                    # Still busy (e.g. extracting, where no hook runs); drop the worker instead
+                    worker.kill()
+                    success, message = False, "Download cancelled by user"
+                    break
+                if not worker.conn.poll(0.1):
+                    if not worker.process.is_alive():
+                        break
+                    continue
+                kind, *payload = worker.conn.recv()
+                if kind == 'line':
+                    self._log(payload[0])
+                elif kind == 'progress':
+                    self._handle_progress(ProgressEvent(**payload[0]))
+                elif kind == 'done':
+                    success, message, worker.retiring = payload
+                    break
+        except (EOFError, OSError):
+            pass
+        finally:
+            self.pool.release(worker)
+        return success, message
+
+
+class DownloadJob:
+    """A single queued download and its current state."""
+    PENDING = 'Pending'
+    RUNNING = 'Running'
+    # Downloaded and waiting for (or in) the PostProcessPool; holds no download slot
+    PROCESSING = 'Processing'
+    # Stopped by the user with its partial file kept; holds no slot until resumed
+    PAUSED = 'Paused'
+    DONE = 'Done'
+    FAILED = 'Failed'
+    CANCELLED = 'Cancelled'
+
+    def __init__(self, job_id, url, options, output_path, title=None, parent=None):
+        self.job_id = job_id
+        self.url = url
+        self.site = site_key(url)
+        self.options = options
+        self.output_path = output_path
+        self.title = title
+        # Playlist fan-out: entries point at their playlist job, which lists them in ``children``
+        self.parent = parent
+        self.children = []
+        self.is_playlist = False
+        self.state = self.PENDING
+        self.percent = 0
+        self.message = ''
+        # The window's expansion thread (playlists) or DownloadTask, while the job runs
+        self.thread = None
+        self.task = None
+        self.last_event = None
+        self.cancel_requested = False
+        self.pause_requested = False
+        # Attempt records written by the DownloadTask: attempt, started, ended, result, message, retry_in
+        self.history = []
+        self.filename = None
+        # FormatSelection of the current run, when formats are picked locally
+        self.selection = None
+
+    @property
+    def attempts(self):
+        return len(self.history)
+
+    def is_active(self):
+        return self.state in (self.PENDING, self.RUNNING, self.PROCESSING, self.PAUSED)
+
+    def display_name(self):
+        name = self.title or self.url
+        if self.is_playlist:
+            return f"📃 {name}"
+        return f"   ↳ {name}" if self.parent else name
+
+
+# Hosts that serve one site, so their jobs count against the same per-site limits
+SITE_ALIASES = {
+    'youtu.be': 'youtube.com',
+    'youtube-nocookie.com': 'youtube.com',
+    'x.com': 'twitter.com',
+    'fb.watch': 'facebook.com',
+    'redd.it': 'reddit.com',
+}
+# Second-level labels that are public suffixes under country TLDs (co.uk, com.au, ne.jp, ...)
+SITE_SECOND_LEVEL_SUFFIXES = {'co', 'com', 'net', 'org', 'ac', 'gov', 'edu', 'ne', 'or'}
+
+def site_key(url):
+    """The site a URL belongs to for per-site limits: its registrable domain, e.g. ``youtube.com``."""
+    host = (urlparse(url).hostname or '').rstrip('.')
+    labels = host.split('.')
+    if len(labels) > 2 and not host.replace('.', '').isdigit():
+        keep = 3 if len(labels[-1]) == 2 and labels[-2] in SITE_SECOND_LEVEL_SUFFIXES else 2
+        host = '.'.join(labels[-keep:])
+    return SITE_ALIASES.get(host, host)
+
+
+class SiteLimiter:
+    """Per-site limits for the queue scheduler, so parallel jobs do not trip a site's rate limits.
+
+    At most ``max_per_site`` jobs of one site run at once (0 = no limit), and jobs of one site
+    start at least ``min_interval`` seconds apart. ``take_next`` passes over jobs of a blocked
+    site, so jobs of other sites fill the free slots meanwhile.
+    """
+
+    def __init__(self, max_per_site=0, min_interval=0):
+        self.max_per_site = max_per_site
+        self.min_interval = min_interval
+        self._running = {}
+        self._last_start = {}
+
+    def configure(self, max_per_site, min_interval):
+        self.max_per_site = max_per_site
+        self.min_interval = min_interval
+
+    def _wait(self, site, now):
+        """Seconds until ``site`` may start another job, or None while it is at its cap."""
+        if self.max_per_site and len(self._running.get(site, ())) >= self.max_per_site:
+            return None
+        last = self._last_start.get(site)
+        return 0 if last is None else max(0, last + self.min_interval - now)
+
+    def take_next(self, pending):
+        """Remove and return the first job in the ``pending`` deque that may start now.
+
+        Returns ``(job, wait)``. With no startable job, ``job`` is None and ``wait`` is the time
+        until a paced site frees up, or None if only caps block (those lift as jobs finish).
+        Jobs no longer pending (cancelled while queued) are dropped on the way.
+        """
+        now = time.monotonic()
+        blocked = {}
+        index = 0
+        while index < len(pending):
+            job = pending[index]
+            if job.state != DownloadJob.PENDING:
+                del pending[index]
+                continue
+            if job.site not in blocked:
+                wait = self._wait(job.site, now)
+                if wait == 0:
+                    del pending[index]
+                    self.acquire(job)
+                    return job, None
+                blocked[job.site] = wait
+            index += 1
+        waits = [wait for wait in blocked.values() if wait is not None]
+        return None, min(waits) if waits else None
+
+    def acquire(self, job):
+        self._running.setdefault(job.site, set()).add(job.job_id)
+        self._last_start[job.site] = time.monotonic()
+
+    def release(self, job):
+        """Free the job's place on its site; releasing twice or an unknown job is harmless."""
+        running = self._running.get(job.site)
+        if running is not None:
+            running.discard(job.job_id)
+            if not running:
+                del self._running[job.site]
+
+
+def default_job_store_path():
+    return os.path.join(user_data_dir(), 'jobs.sqlite3')
+
+# Queued job changes are written to the job store in one transaction this often (seconds)
+JOB_STORE_FLUSH_INTERVAL = 0.5
+
+class JobStore:
+    """SQLite record of the download queue, so it survives crashes, reboots and restarts.
+
+    ``record``/``remove`` only mark the job and return at once; a writer thread snapshots the
+    marked jobs and commits them in one transaction per ``JOB_STORE_FLUSH_INTERVAL``, so the
+    UI never waits on the disk. Interrupted jobs come back from ``load_unfinished``.
+    """
+
+    COLUMNS = ('job_id', 'url', 'options', 'output_path', 'title', 'parent_id', 'is_playlist', 'state',
+               'attempts', 'history', 'message', 'filename', 'downloaded_bytes', 'total_bytes', 'updated')
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._cond = threading.Condition()
+        self._dirty = {}
+        self._deleted = set()
+        self._closed = False
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'job_id INTEGER PRIMARY KEY, url TEXT NOT NULL, options TEXT NOT NULL, output_path TEXT, '
+                'title TEXT, parent_id INTEGER, is_playlist INTEGER NOT NULL DEFAULT 0, state TEXT NOT NULL, '
+                "attempts INTEGER NOT NULL DEFAULT 0, history TEXT NOT NULL DEFAULT '[]', message TEXT, "
+                'filename TEXT, downloaded_bytes INTEGER, total_bytes INTEGER, updated REAL)'
+            )
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+            if 'history' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN history TEXT NOT NULL DEFAULT '[]'")
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)')
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        # WAL keeps commits cheap and lets startup reads run alongside the writer
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @staticmethod
+    def _snapshot(job):
+        event = job.last_event
+        return (
+            job.job_id, job.url, json.dumps(job.options), job.output_path, job.title,
+            job.parent.job_id if job.parent else None, int(job.is_playlist), job.state, job.attempts,
+            json.dumps(job.history), job.message, job.filename, event.downloaded_bytes if event else None,
+            (event.total_bytes or event.total_bytes_estimate) if event else None, time.time(),
+        )
+
+    def record(self, job):
+        """Mark a new or changed job to be written with the next commit."""
+        with self._cond:
+            if not self._closed:
+                self._dirty[job.job_id] = job
+
+    def add(self, jobs):
+        with self._cond:
+            if self._closed:
+                return
+            for job in jobs:
+                self._dirty[job.job_id] = job
+            self._cond.notify()
+
+    def remove(self, job_ids):
+        with self._cond:
+            if self._closed:
+                return
+            for job_id in job_ids:
+                self._dirty.pop(job_id, None)
+                self._deleted.add(job_id)
+            self._cond.notify()
+
+    def next_job_id(self):
+        with self._connect() as conn:
+            return (conn.execute('SELECT MAX(job_id) FROM jobs').fetchone()[0] or 0) + 1
+
+    def load_unfinished(self):
+        """Jobs that were pending, running or processing when the app last stopped, as pending DownloadJobs.
+
+        Paused jobs come back paused. Playlist rows come back with their unfinished entries as ``children``.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT job_id, url, options, output_path, title, parent_id, is_playlist, state, history, '
+                'message, filename FROM jobs WHERE state IN (?, ?, ?, ?) ORDER BY job_id',
+                (DownloadJob.PENDING, DownloadJob.RUNNING, DownloadJob.PROCESSING, DownloadJob.PAUSED),
+            ).fetchall()
+        jobs = {}
+        for job_id, url, options, output_path, title, parent_id, is_playlist, state, history, message, filename in rows:
+            job = DownloadJob(job_id, url, json.loads(options), output_path, title, jobs.get(parent_id))
+            job.is_playlist = bool(is_playlist)
+            job.history = json.loads(history)
+            job.filename = filename
+            if state in (DownloadJob.RUNNING, DownloadJob.PROCESSING):
+                # yt-dlp finds a finished download in place, so only the conversion is redone
+                job.message = "Interrupted, will resume"
+            elif state == DownloadJob.PAUSED:
+                job.state = state
+                job.message = message
+            if job.parent:
+                job.parent.children.append(job)
+            jobs[job_id] = job
+        return list(jobs.values())
+
+    def _flush(self, conn):
+        with self._cond:
+            dirty, deleted = self._dirty, self._deleted
+            self._dirty, self._deleted = {}, set()
+        if not (dirty or deleted):
+            return
+        rows = [self._snapshot(job) for job in dirty.values()]
+        try:
+            with conn:
+                # Every row carries the whole snapshot, so replacing it covers inserts and updates
+                conn.executemany(
+                    f'INSERT OR REPLACE INTO jobs ({", ".join(self.COLUMNS)}) '
+                    f'VALUES ({", ".join("?" * len(self.COLUMNS))})', rows
+                )
+                conn.executemany('DELETE FROM jobs WHERE job_id = ?', [(job_id,) for job_id in deleted])
+        except sqlite3.Error:
+            # Locked or full database: keep the changes for the next commit
+            with self._cond:
+                for job_id, job in dirty.items():
+                    self._dirty.setdefault(job_id, job)
+                self._deleted |= deleted
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            with self._cond:
+                if not self._closed:
+                    self._cond.wait(JOB_STORE_FLUSH_INTERVAL)
+                closed = self._closed
+            self._flush(conn)
+            if closed:
+                conn.close()
+                return
+
+    def close(self):
+        """Commit what is pending and stop the writer; later changes are ignored."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._writer.join()
+
+
+def default_metrics_path():
+    return os.path.join(user_data_dir(), 'metrics.jsonl')
+
+
+def default_prometheus_path():
+    return os.path.join(user_data_dir(), 'metrics.prom')
+
+# Phases summed per site in the Prometheus output, as (metric label, JobMetrics summary key)
+METRICS_PHASES = [('spawn', 'spawn_s'), ('extraction', 'extraction_s'), ('ttfb', 'ttfb_s'),
+                  ('download', 'download_s'), ('postprocess', 'postprocess_s'), ('convert', 'convert_s')]
+
+class MetricsRecorder:
+    """Telemetry of finished jobs: one JSON line per job, plus running totals in Prometheus format.
+
+    The totals are written to ``prometheus_path`` after every job (replaced atomically, so
+    node_exporter's textfile collector can pick the file up) and/or served at
+    ``http://127.0.0.1:<port>/metrics`` once ``serve`` is called.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._phases = {}
+        self._bytes = {}
+        self._server = None
+        for path in (jsonl_path, prometheus_path):
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, job, metrics, state):
+        """Log a finished job's ``JobMetrics`` and add it to the totals; returns the JSON record."""
+        summary = metrics.summary()
+        record = {
+            'time': round(time.time(), 3), 'job': job.job_id, 'url': job.url, 'site': job.site,
+            'engine': job.options.get('engine'), 'state': state, 'attempts': job.attempts,
+        }
+        record.update(summary)
+        with self._lock:
+            key = (job.site, state)
+            self._jobs[key] = self._jobs.get(key, 0) + 1
+            for phase, field in METRICS_PHASES:
+                if summary[field] is not None:
+                    total, count = self._phases.get((job.site, phase), (0.0, 0))
+                    self._phases[(job.site, phase)] = (total + summary[field], count + 1)
+            if summary['downloaded_bytes']:
+                self._bytes[job.site] = self._bytes.get(job.site, 0) + summary['downloaded_bytes']
+            text = self.prometheus_text() if self.prometheus_path else None
+        try:
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as out:
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            if text is not None:
+                temp_path = self.prometheus_path + '.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as out:
+                    out.write(text)
+                os.replace(temp_path, self.prometheus_path)
+        except OSError:
+            # Telemetry must never fail a download
+            pass
+        return record
+
+    @staticmethod
+    def _labels(**labels):
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+    def prometheus_text(self):
+        """The totals in the Prometheus text exposition format (call with the lock held or unshared)."""
+        lines = [
+            '# HELP ytdlp_gui_jobs_total Finished download jobs by site and final state.',
+            '# TYPE ytdlp_gui_jobs_total counter',
+        ]
+        for (site, state), count in sorted(self._jobs.items()):
+            lines.append(f'ytdlp_gui_jobs_total{self._labels(site=site, state=state)} {count}')
+        lines += [
+            '# HELP ytdlp_gui_job_phase_seconds Time jobs spent in each phase of their last attempt.',
+            '# TYPE ytdlp_gui_job_phase_seconds summary',
+        ]
+        for (site, phase), (total, count) in sorted(self._phases.items()):
+            labels = self._labels(site=site, phase=phase)
+            lines.append(f'ytdlp_gui_job_phase_seconds_sum{labels} {total:.3f}')
+            lines.append(f'ytdlp_gui_job_phase_seconds_count{labels} {count}')
+        lines += [
+            '# HELP ytdlp_gui_downloaded_bytes_total Bytes downloaded by finished jobs.',
+            '# TYPE ytdlp_gui_downloaded_bytes_total counter',
+        ]
+        for site, total in sorted(self._bytes.items()):
+            lines.append(f'ytdlp_gui_downloaded_bytes_total{self._labels(site=site)} {total}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve the totals at ``/metrics`` from a background thread."""
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                with recorder._lock:
+                    body = recorder.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Log files keep the byte offset of every this many lines, so any line can be read without a scan
+LOG_INDEX_STRIDE = 1024
+LOG_SEARCH_CHUNK = 4 * 1024 * 1024
+# Session log directories kept on disk, newest first
+LOG_KEEP_SESSIONS = 5
+
+def default_log_dir():
+    return os.path.join(user_cache_dir(), 'logs')
+
+
+class LogFile:
+    """An append-only log file that can be read back from any line.
+
+    Only the byte offset of every ``LOG_INDEX_STRIDE``th line is held in memory, so the index
+    stays small however long the file grows. No file handle is kept open between calls.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.line_count = 0
+        self._lock = threading.Lock()
+        self._offsets = array('Q')
+        self._size = 0
+
+    def append(self, lines):
+        """Add lines to the end of the file; any line breaks inside one split it into several."""
+        chunks = []
+        with self._lock:
+            for entry in lines:
+                for line in entry.splitlines() or ['']:
+                    if self.line_count % LOG_INDEX_STRIDE == 0:
+                        self._offsets.append(self._size)
+                    data = line.encode('utf-8', 'replace') + b'\n'
+                    chunks.append(data)
+                    self._size += len(data)
+                    self.line_count += 1
+            with open(self.path, 'ab') as f:
+                f.write(b''.join(chunks))
+
+    def read_lines(self, start, count):
+        """Up to ``count`` lines from line ``start`` on."""
+        with self._lock:
+            if start >= self.line_count:
+                return []
+            offset = self._offsets[start // LOG_INDEX_STRIDE]
+            skip = start % LOG_INDEX_STRIDE
+        lines = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for _ in range(skip + count):
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line)
+        return [line.rstrip(b'\n').decode('utf-8', 'replace') for line in lines[skip:]]
+
+    def search(self, pattern, is_cancelled=lambda: False):
+        """Yield the numbers of the lines ``pattern`` (a compiled regex) matches, a list per chunk read.
+
+        The regex runs over whole chunks of the file rather than line by line; lines appended
+        after the search started are not looked at.
+        """
+        with self._lock:
+            remaining = self._size
+        line_number = 0
+        carry = b''
+        with open(self.path, 'rb') as f:
+            while remaining > 0 and not is_cancelled():
+                data = carry + f.read(min(LOG_SEARCH_CHUNK, remaining))
+                remaining -= len(data) - len(carry)
+                # Chunks end at a line break, which never falls inside a UTF-8 sequence
+                end = data.rfind(b'\n') + 1
+                carry = data[end:]
+                text = data[:end].decode('utf-8', 'replace')
+                found = []
+                position = 0
+                for match in pattern.finditer(text):
+                    line_number += text.count('\n', position, match.start())
+                    position = match.start()
+                    if not found or found[-1] != line_number:
+                        found.append(line_number)
+                line_number += text.count('\n', position)
+                if found:
+                    yield found
+
+
+class JobLogStore:
+    """This session's log on disk: every line in ``session.log``, and each job's lines in ``job-<id>.log``.
+
+    Sessions get a directory of their own under ``root``; older ones beyond ``keep_sessions``
+    are deleted.
+    """
+
+    def __init__(self, root, keep_sessions=LOG_KEEP_SESSIONS):
+        os.makedirs(root, exist_ok=True)
+        sessions = sorted(entry.path for entry in os.scandir(root) if entry.is_dir())
+        for path in sessions[:max(0, len(sessions) - keep_sessions + 1)]:
+            shutil.rmtree(path, ignore_errors=True)
+        self.directory = os.path.join(root, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.session = LogFile(os.path.join(self.directory, 'session.log'))
+        self._jobs = {}
+
+    def job(self, job_id):
+        log = self._jobs.get(job_id)
+        if log is None:
+            log = self._jobs[job_id] = LogFile(os.path.join(self.directory, f'job-{job_id}.log'))
+        return log
+
+    def write(self, entries):
+        """Append ``(job_id, line)`` pairs, in order, to the session log and (unless job_id is None) the job's."""
+        by_job = {}
+        for job_id, line in entries:
+            if job_id is not None:
+                by_job.setdefault(job_id, []).append(line)
+        self.session.append([line for _, line in entries])
+        for job_id, lines in by_job.items():
+            self.job(job_id).append(lines)
+
+
+# The console is refreshed at most this often (seconds) while downloads run
+HEADLESS_REPORT_INTERVAL = 1.0
+
+class HeadlessRunner:
+    """Console front end for the download queue: same jobs, engines and caches as the window.
+
+    Downloads are started with ``DownloadTask.start`` and playlists with
+    ``PlaylistExpansion.start``, both reporting back through ``results``; their output is
+    collected from a shared ``UiUpdateBuffer`` and printed either as readable lines or as one
+    JSON object per line (``json_lines``).
+    """
+
+    def __init__(self, options, output_path, max_workers, pool=None, cache=None, json_lines=False,
+                 out=None, bandwidth=None, sites=None, metrics=None, postprocess=None, cookies=None):
+        self.options = options
+        self.output_path = output_path
+        self.max_workers = max(1, max_workers)
+        self.pool = pool
+        self.cache = cache
+        self.bandwidth = bandwidth or BandwidthBudget()
+        self.sites = sites or SiteLimiter()
+        self.metrics = metrics
+        self.postprocess = postprocess or PostProcessPool()
+        self.cookies = cookies or SessionCookies()
+        self._site_wait = None
+        self.json_lines = json_lines
+        self.out = out or sys.stdout
+        self.updates = UiUpdateBuffer()
+        self.results = queue.Queue()
+        self.jobs = {}
+        self.pending_jobs = deque()
+        self.running = {}
+        # Downloaded jobs in the PostProcessPool, which no longer count against max_workers
+        self.converting = {}
+        self.known_urls = set()
+        self.next_job_id = 1
+
+    def add_urls(self, urls):
+        jobs = []
+        for url in urls:
+            if url in self.known_urls:
+                continue
+            # Track here too so duplicates inside the same batch are caught
+            self.known_urls.add(url)
+            job = DownloadJob(self.next_job_id, url, dict(self.options), self.output_path)
+            job.is_playlist = bool(self.options.get('playlist') and self.options.get('playlist_fanout'))
+            jobs.append(job)
+            self.next_job_id += 1
+        self._add_jobs(jobs)
+        return jobs
+
+    def _add_jobs(self, jobs):
+        for job in jobs:
+            self.jobs[job.job_id] = job
+            self.known_urls.add(job.url)
+            self.pending_jobs.append(job)
+
+    def run(self):
+        """Work through the queue; returns the process exit code (0 when every job succeeded)."""
+        try:
+            self._schedule()
+            last_rebalance = time.monotonic()
+            # Pending jobs may be waiting out a site's start interval with nothing running
+            while self.running or self.pending_jobs or self.converting:
+                timeout = HEADLESS_REPORT_INTERVAL
+                if self._site_wait is not None:
+                    timeout = min(timeout, self._site_wait)
+                try:
+                    result = self.results.get(timeout=timeout)
+                except queue.Empty:
+                    result = None
+                self._report_updates()
+                if time.monotonic() - last_rebalance >= BANDWIDTH_REBALANCE_INTERVAL:
+                    last_rebalance = time.monotonic()
+                    self.bandwidth.rebalance()
+                while result is not None:
+                    self._job_result(*result)
+                    try:
+                        result = self.results.get_nowait()
+                    except queue.Empty:
+                        result = None
+                self._schedule()
+        except KeyboardInterrupt:
+            self._emit('log', None, "Interrupted, cancelling downloads...")
+            self.pending_jobs.clear()
+            for job, (expansion, task) in list(self.running.items()):
+                job.cancel_requested = True
+                (expansion or task).cancel()
+            for job, task in self.converting.items():
+                task.cancel()
+                job.state = DownloadJob.CANCELLED
+            # Jobs get SHUTDOWN_TIMEOUT between them to stop; process trees still there are killed
+            deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+            for job, (expansion, task) in list(self.running.items()):
+                worker = expansion or task
+                stopped = worker.wait(max(0, deadline - time.monotonic()))
+                if not stopped and worker.process and worker.process.poll() is None:
+                    signal_process_tree(worker.process, kill=True)
+                job.state = DownloadJob.CANCELLED
+            self._report_updates()
+            return 130
+        finally:
+            self.postprocess.shutdown()
+            self.cookies.close()
+            if self.pool:
+                self.pool.shutdown()
+            if self.metrics:
+                self.metrics.close()
+        
+        counts = {}
+        for job in self.jobs.values():
+            if not job.children:
+                counts[job.state] = counts.get(job.state, 0) + 1
+        self._emit('summary', None, None, done=counts.get(DownloadJob.DONE, 0),
+                   failed=counts.get(DownloadJob.FAILED, 0))
+        return 1 if counts.get(DownloadJob.FAILED) else 0
+
+    def _schedule(self):
+        self._site_wait = None
+        while self.pending_jobs and len(self.running) < self.max_workers:
+            job, self._site_wait = self.sites.take_next(self.pending_jobs)
+            if job is None:
+                break
+            job.state = DownloadJob.RUNNING
+            if job.is_playlist:
+                self._emit('log', job, f"Expanding playlist: {job.url}")
+                expansion = PlaylistExpansion(job.url, job.options)
+                self.running[job] = (expansion, None)
+                expansion.start(partial(self._playlist_listed, job))
+                continue
+            self._emit('log', job, f"Starting download from: {job.url}")
+            task = DownloadTask(job.url, job.options, job.output_path, self.updates, job.job_id,
+                                self.pool if job.options.get('engine') == ENGINE_POOL else None,
+                                self.cache if job.options.get('metadata_cache') else None, job.history,
+                                self.cookies)
+            self.bandwidth.add(task)
+            self.running[job] = (None, task)
+            task.start(lambda success, message, job=job: self.results.put((job, 'done', success, message)))
+
+    def _playlist_listed(self, job, playlist, error):
+        if error is None:
+            self.results.put((job, 'expanded', playlist))
+        else:
+            self.results.put((job, 'expand_failed', error))
+
+    def _job_result(self, job, kind, *payload):
+        if kind == 'converted':
+            self._job_finished(job, self.converting.pop(job), *payload)
+            return
+        expansion, task = self.running.pop(job)
+        self.sites.release(job)
+        if task:
+            self.bandwidth.remove(task)
+        if kind == 'expanded':
+            self._playlist_expanded(job, payload[0])
+            return
+        if kind == 'expand_failed':
+            download_instead, message = expansion_failure(job.options, payload[0])
+            if not download_instead:
+                self._finish(job, DownloadJob.FAILED, f"Playlist expansion failed: {message}")
+                return
+            self._emit('log', job, f"Could not list the playlist ({message}); downloading it as one job")
+            job.is_playlist = False
+            job.state = DownloadJob.PENDING
+            self.pending_jobs.appendleft(job)
+            return
+        success, message = payload
+        if success and task.needs_conversion:
+            # The slot is free for the next download while the conversion waits its turn
+            self.converting[job] = task
+            self._finish(job, DownloadJob.PROCESSING, "Downloaded, converting")
+            self.postprocess.submit(task, lambda success, message: self.results.put((job, 'converted', success, message)))
+            return
+        self._job_finished(job, task, success, message)
+
+    def _job_finished(self, job, task, success, message):
+        job.percent = 100 if success else job.percent
+        state = DownloadJob.DONE if success else DownloadJob.FAILED
+        if task and self.metrics:
+            record = self.metrics.record(job, task.metrics, state)
+            if self.json_lines:
+                self._emit('metrics', job, None, **{key: value for key, value in record.items()
+                                                     if key not in ('time', 'job', 'url')})
+            else:
+                self._emit('log', job, f"Metrics: {task.metrics.describe()}")
+        self._finish(job, state, message)
+        if job.parent and not any(child.is_active() for child in job.parent.children):
+            failed = any(child.state == DownloadJob.FAILED for child in job.parent.children)
+            self._finish(job.parent, DownloadJob.FAILED if failed else DownloadJob.DONE,
+                         f"{sum(child.state == DownloadJob.DONE for child in job.parent.children)}"
+                         f"/{len(job.parent.children)} done")
+
+    def _playlist_expanded(self, parent, playlist):
+        if playlist['title']:
+            parent.title = playlist['title']
+        if not playlist['is_playlist']:
+            # Not a playlist after all: run it as an ordinary download
+            parent.is_playlist = False
+            parent.state = DownloadJob.PENDING
+            self.pending_jobs.appendleft(parent)
+            return
+        child_options = dict(parent.options, playlist=False, playlist_fanout=False)
+        archive = DownloadArchive(parent.options['download_archive']) if parent.options.get('download_archive') else None
+        if archive:
+            archive.refresh()
+        children = []
+        for entry in playlist['entries']:
+            if entry['url'] in self.known_urls or (archive and entry['archive_key'] in archive):
+                continue
+            children.append(DownloadJob(self.next_job_id, entry['url'], dict(child_options),
+                                        parent.output_path, entry['title'], parent))
+            self.next_job_id += 1
+        parent.children = children
+        self._emit('log', parent, f"{len(playlist['entries'])} entries, {len(children)} queued")
+        if children:
+            self._add_jobs(children)
+        else:
+            self._finish(parent, DownloadJob.DONE, "Nothing left to download")
+
+    def _finish(self, job, state, message):
+        job.state = state
+        job.message = message
+        if self.json_lines and job.history:
+            self._emit('state', job, message, state=state, attempts=job.history)
+        else:
+            self._emit('state', job, message, state=state)
+
+    def _report_updates(self):
+        lines, progress, dropped = self.updates.drain()
+        for key, line in lines:
+            self._emit('log', self.jobs.get(key), line)
+        if dropped:
+            self._emit('log', None, f"{dropped} log lines dropped")
+        for key, event in progress.items():
+            job = self.jobs.get(key)
+            if job is None:
+                continue
+            if event.percent is not None:
+                job.percent = int(event.percent)
+            job.last_event = event
+            self._emit('progress', job, event.summary(), **asdict(event))
+
+    def _emit(self, kind, job, message, **fields):
+        if self.json_lines:
+            record = {'type': kind, 'time': round(time.time(), 3)}
+            if job is not None:
+                record.update(job=job.job_id, url=job.url)
+                if job.parent:
+                    record['parent'] = job.parent.job_id
+            if message is not None:
+                record['message'] = message
+            record.update(fields)
+            self.out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        elif kind == 'summary':
+            self.out.write(f"Finished: {fields['done']} done, {fields['failed']} failed\n")
+        else:
+            prefix = f"[#{job.job_id}] " if job is not None else ""
+            if kind == 'state':
+                message = f"{fields['state']}: {message}"
+            self.out.write(f"{prefix}{message}\n")
+        self.out.flush()
+
+
+def parse_headless_args(argv):
+    parser = argparse.ArgumentParser(description="Download with yt-dlp from the console, using the GUI's options")
+    parser.add_argument('--headless', action='store_true', help="Run without the window (implied here)")
+    parser.add_argument('urls', nargs='*', help="URLs to download")
+    parser.add_argument('-a', '--batch-file', metavar='FILE',
+                        help="File containing URLs to download, one per line ('-' for stdin)")
+    parser.add_argument('-o', '--output-dir', default=os.getcwd(), help="Directory to save downloads in")
+    parser.add_argument('-q', '--quality', choices=QUALITY_PROFILES, default=QUALITY_PROFILES[0])
+    parser.add_argument('--container', choices=CONTAINERS, default=CONTAINERS[0])
+    parser.add_argument('-x', '--extract-audio', action='store_true')
+    parser.add_argument('--audio-format', choices=AUDIO_FORMATS, default=AUDIO_FORMATS[0])
+    parser.add_argument('--subs', action='store_true', help="Download subtitles")
+    parser.add_argument('--auto-subs', action='store_true', help="Also download auto-generated subtitles")
+    parser.add_argument('--thumbnail', action='store_true')
+    parser.add_argument('--description', action='store_true')
+    parser.add_argument('--playlist', action='store_true', help="Download all videos if the URL is a playlist")
+    parser.add_argument('--parallel-playlist', action='store_true',
+                        help="Queue playlist entries as separate parallel jobs")
+    parser.add_argument('--playlist-start', type=int, metavar='N')
+    parser.add_argument('--playlist-end', type=int, metavar='N')
+    parser.add_argument('-r', '--limit-rate', type=int, default=0, metavar='KB',
+                        help="Total speed limit in KB/s shared by all running downloads (0 = none)")
+    parser.add_argument('--limit-schedule', type=parse_bandwidth_schedule, default=[], metavar='RULES',
+                        help="Time-of-day limits overriding --limit-rate, e.g. '08:00-18:00=2000,18:00-23:00=0'")
+    parser.add_argument('-N', '--concurrent-fragments', type=int, default=DEFAULT_CONCURRENT_FRAGMENTS,
+                        help="DASH/HLS fragments each job downloads at once")
+    parser.add_argument('--http-chunk-size', type=int, default=0, metavar='MB', help="HTTP range size (0 = off)")
+    parser.add_argument('--downloader', choices=EXTERNAL_DOWNLOADERS, default=EXTERNAL_DOWNLOADERS[0])
+    parser.add_argument('--downloader-connections', type=int, default=DEFAULT_DOWNLOADER_CONNECTIONS, metavar='N')
+    parser.add_argument('--cookies-from-browser', choices=COOKIE_BROWSERS, default=COOKIE_BROWSERS[0])
+    parser.add_argument('-j', '--jobs', type=int, default=3, help="Number of parallel downloads")
+    parser.add_argument('--max-per-site', type=int, default=0, metavar='N',
+                        help="Parallel downloads from one site (0 = no limit beyond --jobs)")
+    parser.add_argument('--site-interval', type=float, default=0, metavar='SECONDS',
+                        help="Minimum time between two downloads from one site starting")
+    parser.add_argument('--engine', choices=list(ENGINE_LABELS), default=ENGINE_SUBPROCESS)
+    parser.add_argument('--pool-size', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--pool-recycle', type=int, default=50, metavar='JOBS')
+    parser.add_argument('--pool-max-memory', type=int, default=1024, metavar='MB')
+    parser.add_argument('--convert-jobs', type=int, default=os.cpu_count() or 1, metavar='N',
+                        help="Conversions (remux, recode, audio extraction) that run at once after downloading")
+    parser.add_argument('--metadata-cache', action='store_true', help="Probe and cache metadata before downloading")
+    parser.add_argument('--select-formats', action='store_true',
+                        help="Probe the format list first and download the exact formats picked from it")
+    parser.add_argument('--no-auto-retry', dest='auto_retry', action='store_false',
+                        help="Fail at the first error instead of retrying network errors, throttling and HTTP 403")
+    parser.add_argument('--archive', nargs='?', const=default_archive_path(), metavar='FILE',
+                        help="Skip and record downloaded items (default: the GUI's archive file)")
+    parser.add_argument('--json', action='store_true', help="Print progress as JSON lines")
+    parser.add_argument('--metrics', nargs='?', const=default_metrics_path(), metavar='FILE',
+                        help="Append per-job timings and throughput to FILE as JSON lines "
+                             "(default file: %(const)s)")
+    parser.add_argument('--prometheus-file', metavar='FILE',
+                        help="Keep Prometheus text-format totals in FILE (for a textfile collector)")
+    parser.add_argument('--prometheus-port', type=int, metavar='PORT',
+                        help="Serve Prometheus totals at http://127.0.0.1:PORT/metrics while running")
+    return parser.parse_args(argv)
+
+def headless_options(args):
+    """Build the same option dict the window's widgets would produce."""
+    options = {
+        'extract_audio': args.extract_audio,
+        'video_format': args.container,
+        'audio_format': args.audio_format,
+        'subtitle': args.subs,
+        'auto_sub': args.auto_subs,
+        'thumbnail': args.thumbnail,
+        'description': args.description,
+        'playlist': args.playlist,
+        'playlist_fanout': args.parallel_playlist,
+        'playlist_start': args.playlist_start,
+        'playlist_end': args.playlist_end,
+        'concurrent_fragments': args.concurrent_fragments,
+        'http_chunk_size': args.http_chunk_size,
+        'external_downloader': args.downloader if args.downloader != EXTERNAL_DOWNLOADERS[0] else None,
+        'downloader_connections': args.downloader_connections,
+        'cookies_browser': args.cookies_from_browser,
+        'engine': args.engine,
+        'metadata_cache': args.metadata_cache,
+        'select_formats': args.select_formats,
+        'auto_retry': args.auto_retry,
+        'download_archive': DownloadArchive(args.archive).path if args.archive else None
+    }
+    return apply_quality_profile(options, args.quality)
+
+def headless_main(argv):
+    args = parse_headless_args(argv)
+    urls = list(args.urls)
+    if args.batch_file:
+        try:
+            if args.batch_file == '-':
+                urls.extend(iter_batch_urls(sys.stdin))
+            else:
+                with open(args.batch_file, encoding='utf-8', errors='replace') as batch:
+                    urls.extend(iter_batch_urls(batch))
+        except OSError as e:
+            print(f"Could not read batch file: {e}", file=sys.stderr)
+            return 2
+    invalid = [url for url in urls if not is_valid_url(url)]
+    for url in invalid:
+        print(f"Skipping invalid URL: {url}", file=sys.stderr)
+    urls = [url for url in urls if is_valid_url(url)]
+    if not urls:
+        print("No URLs to download", file=sys.stderr)
+        return 2
+    
+    if args.engine == ENGINE_SUBPROCESS and not ytdlp_installed():
+        print("yt-dlp not found, downloading it...", file=sys.stderr)
+        try:
+            download_ytdlp(local_ytdlp_path())
+        except Exception as e:
+            print(f"Failed to download yt-dlp: {e}", file=sys.stderr)
+            return 2
+    
+    options = headless_options(args)
+    metrics = None
+    if args.metrics or args.prometheus_file or args.prometheus_port:
+        metrics = MetricsRecorder(args.metrics, args.prometheus_file)
+        if args.prometheus_port:
+            try:
+                metrics.serve(args.prometheus_port)
+            except OSError as e:
+                print(f"Could not serve metrics on port {args.prometheus_port}: {e}", file=sys.stderr)
+                return 2
+    pool = None
+    if args.engine == ENGINE_POOL and library_engine_available():
+        pool = WorkerPool(args.pool_size, args.pool_recycle, args.pool_max_memory)
+    cache = MetadataCache(os.path.join(user_cache_dir(), 'metadata')) if args.metadata_cache else None
+    bandwidth = BandwidthBudget(args.limit_rate, args.limit_schedule)
+    runner = HeadlessRunner(options, args.output_dir, args.jobs, pool, cache, args.json, bandwidth=bandwidth,
+                            sites=SiteLimiter(max(0, args.max_per_site), max(0, args.site_interval)),
+                            metrics=metrics, postprocess=PostProcessPool(max(1, args.convert_jobs)))
+    runner.add_urls(urls)
+    return runner.run()
+
+
+if __name__ == "__main__":
+    sys.exit(headless_main(sys.argv[1:]))
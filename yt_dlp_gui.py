@@ -1,150 +1,78 @@
 import sys
 import os
+import re
+import argparse
 import subprocess
 import threading
-import json
-import re
 import platform
-import urllib.request
-import stat
-from urllib.parse import urlparse
+import sqlite3
+import time
+from array import array
+from collections import deque, OrderedDict
+from functools import partial
+
+if __name__ == '__main__' and '--headless' in sys.argv[1:]:
+    # Hand over before PyQt5 is imported; running the core as __main__ keeps the
+    # pool's worker processes (which re-import the main module) Qt-free too
+    import runpy
+    runpy.run_module('yt_dlp_core', run_name='__main__', alter_sys=True)
+    sys.exit()
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
-                            QWidget, QLabel, QLineEdit, QPushButton, QTextEdit, 
+                            QWidget, QLabel, QLineEdit, QPushButton, 
                             QCheckBox, QComboBox, QGroupBox, QProgressBar, QFileDialog,
                             QGridLayout, QSpacerItem, QSizePolicy, QFrame, QSpinBox,
-                            QShortcut)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QSettings
+                            QShortcut, QTableView, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import (Qt, QThread, pyqtSignal, QTimer, QSettings, QAbstractTableModel, QAbstractListModel,
+                          QModelIndex)
 from PyQt5.QtGui import QFont, QPalette, QColor, QKeySequence, QIcon
 
+from yt_dlp_core import (
+    is_valid_url, iter_batch_urls, extract_urls, format_bytes, ENGINE_SUBPROCESS, ENGINE_LIBRARY, ENGINE_POOL,
+    ENGINE_LABELS, QUALITY_PROFILES, CONTAINERS, AUDIO_FORMATS, COOKIE_BROWSERS, library_engine_available,
+    apply_quality_profile, PlaylistExpansion, WorkerPool, UiUpdateBuffer, user_cache_dir,
+    default_archive_path, MetadataCache, DownloadArchive, ArchiveKeyResolver, DownloadTask, DownloadJob,
+    local_ytdlp_path, ytdlp_installed, download_ytdlp, EXTERNAL_DOWNLOADERS, DEFAULT_CONCURRENT_FRAGMENTS,
+    DEFAULT_DOWNLOADER_CONNECTIONS, BandwidthBudget, BANDWIDTH_REBALANCE_INTERVAL, parse_bandwidth_schedule,
+    JobStore, default_job_store_path, expansion_failure, SiteLimiter, MetricsRecorder, default_metrics_path,
+    default_prometheus_path, PostProcessPool, SessionCookies, SHUTDOWN_TIMEOUT, signal_process_tree,
+    JobLogStore, default_log_dir, LOG_INDEX_STRIDE, ffmpeg_executable, target_container,
+)
 
-class DownloadThread(QThread):
-    progress = pyqtSignal(str)
-    progress_percent = pyqtSignal(int)
+# Worker output is handed to the UI at most once per frame
+UI_FRAME_MS = 75
+# Log messages about one job start with an emoji and its number, e.g. "✅ [#3] ..."
+JOB_TAG_RE = re.compile(r'\S*\s*\[#(\d+)\]')
+
+
+class BootstrapThread(QThread):
+    """Download the yt-dlp executable in the background, resuming any earlier partial download."""
+    progress = pyqtSignal(object, object)
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
 
-    def __init__(self, url, options, output_path):
+    def __init__(self, dest_path):
         super().__init__()
-        self.url = url
-        self.options = options
-        self.output_path = output_path
-        self.process = None
+        self.dest_path = dest_path
         self._is_cancelled = False
+        self._last_report = 0
 
     def cancel(self):
-        """Cancel the download process."""
         self._is_cancelled = True
-        if self.process:
-            try:
-                self.process.terminate()
-                self.process.wait(timeout=3)
-            except:
-                try:
-                    self.process.kill()
-                except:
-                    pass
 
     def run(self):
         try:
-            # Build yt-dlp command
-            exe_name = 'yt-dlp.exe' if platform.system() == 'Windows' else 'yt-dlp'
-            # Check if local exists, else assume in path
-            local_exe = os.path.join(os.getcwd(), exe_name)
-            if os.path.exists(local_exe):
-                cmd = [local_exe]
-            else:
-                cmd = [exe_name]
-            
-            # Add progress template for better parsing
-            cmd.extend(['--newline', '--no-colors'])
-            
-            # Add options based on selections
-            if self.options.get('format'):
-                cmd.extend(['-f', self.options['format']])
-            
-            if self.options.get('extract_audio'):
-                cmd.extend(['-x', '--audio-format', self.options.get('audio_format', 'mp3')])
-            else:
-                # Add video format/container preference
-                video_format = self.options.get('video_format')
-                if video_format and video_format != 'Auto (Best)':
-                    cmd.extend(['--merge-output-format', video_format.lower()])
-                    # Also add --recode-video to ensure the format is correct
-                    cmd.extend(['--recode-video', video_format.lower()])
-            
-            if self.options.get('subtitle'):
-                cmd.append('--write-subs')
-                if self.options.get('auto_sub'):
-                    cmd.append('--write-auto-subs')
-            
-            if self.options.get('thumbnail'):
-                cmd.append('--write-thumbnail')
-            
-            if self.options.get('description'):
-                cmd.append('--write-description')
-            
-            # Playlist options
-            if self.options.get('playlist'):
-                if self.options.get('playlist_start'):
-                    cmd.extend(['--playlist-start', str(self.options['playlist_start'])])
-                if self.options.get('playlist_end'):
-                    cmd.extend(['--playlist-end', str(self.options['playlist_end'])])
-            else:
-                cmd.append('--no-playlist')
-            
-            # Speed limit
-            if self.options.get('speed_limit') and self.options['speed_limit'] > 0:
-                cmd.extend(['-r', f"{self.options['speed_limit']}K"])
-            
-            # Cookies from browser
-            cookies_browser = self.options.get('cookies_browser')
-            if cookies_browser and cookies_browser != 'None':
-                cmd.extend(['--cookies-from-browser', cookies_browser.lower()])
-            
-            # Output directory
-            if self.output_path:
-                cmd.extend(['-o', f'{self.output_path}/%(title)s.%(ext)s'])
-            
-            # Add URL
-            cmd.append(self.url)
-            
-            # Run command
-            self.process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.STDOUT, 
-                text=True, 
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            for line in self.process.stdout:
-                if self._is_cancelled:
-                    break
-                    
-                line = line.strip()
-                if line:
-                    self.progress.emit(line)
-                    
-                    # Parse progress percentage
-                    progress_match = re.search(r'(\d+\.\d+)%', line)
-                    if progress_match:
-                        try:
-                            percent = float(progress_match.group(1))
-                            self.progress_percent.emit(int(percent))
-                        except:
-                            pass
-            
-            self.process.wait()
-            
-            if self._is_cancelled:
-                self.error.emit("Download cancelled by user")
-            elif self.process.returncode == 0:
-                self.finished.emit("Download completed successfully!")
-            else:
-                self.error.emit(f"Download failed with return code: {self.process.returncode}")
+            download_ytdlp(self.dest_path, progress=self._report, is_cancelled=lambda: self._is_cancelled)
+            self.finished.emit(f"{os.path.basename(self.dest_path)} downloaded, verified and installed successfully!")
         except Exception as e:
-            self.error.emit(f"Error: {str(e)}")
+            self.error.emit(str(e))
+
+    def _report(self, done, total):
+        # One update per UI frame is plenty
+        now = time.monotonic()
+        if now - self._last_report >= UI_FRAME_MS / 1000 or done == total:
+            self._last_report = now
+            self.progress.emit(done, total)
 
 class UpdateThread(QThread):
     progress = pyqtSignal(str)
@@ -208,79 +136,409 @@ class UpdateThread(QThread):
         except Exception as e:
             self.error.emit(f"pip update error: {str(e)}")
 
+class UrlImportThread(QThread):
+    """Stream URLs from a batch file, stdin or pasted text in chunks."""
+    urls_found = pyqtSignal(list)
+    finished = pyqtSignal(int, int, int)
+    error = pyqtSignal(str)
+
+    BATCH_SIZE = 2000
+
+    def __init__(self, path=None, text=None, archive=None, resolver=None, loader=None):
+        super().__init__()
+        self.path = path
+        self.text = text
+        # URLs whose archive key is already in the download archive are dropped here
+        self.archive = archive
+        self.resolver = resolver
+        # Thread still reading the archive and loading the extractors, waited for before filtering
+        self.loader = loader
+        self.added = 0
+        self.duplicates = 0
+
+    def _open_lines(self):
+        if self.text is not None:
+            return iter(self.text.splitlines())
+        if self.path == '-':
+            return sys.stdin
+        return open(self.path, 'r', encoding='utf-8-sig', errors='replace')
+
+    def run(self):
+        valid = 0
+        invalid = 0
+        archived = 0
+        batch = []
+        try:
+            if self.loader:
+                self.loader.join()
+            lines = self._open_lines()
+            try:
+                for url in iter_batch_urls(lines):
+                    if not is_valid_url(url):
+                        invalid += 1
+                        continue
+                    if self.archive is not None and self.resolver.resolve(url) in self.archive:
+                        archived += 1
+                        continue
+                    valid += 1
+                    batch.append(url)
+                    if len(batch) >= self.BATCH_SIZE:
+                        self.urls_found.emit(batch)
+                        batch = []
+            finally:
+                if self.path not in (None, '-'):
+                    lines.close()
+            if batch:
+                self.urls_found.emit(batch)
+            self.finished.emit(valid, invalid, archived)
+        except Exception as e:
+            self.error.emit(f"Import failed: {str(e)}")
+
+class LogSearchThread(QThread):
+    """Find the lines of a log file matching a regex, reporting them as they are found."""
+    found = pyqtSignal(object)
+    finished = pyqtSignal()
+
+    def __init__(self, log, pattern):
+        super().__init__()
+        self.log = log
+        self.pattern = pattern
+        self._is_cancelled = False
+
+    def cancel(self):
+        self._is_cancelled = True
+
+    def run(self):
+        try:
+            for lines in self.log.search(self.pattern, lambda: self._is_cancelled):
+                self.found.emit(lines)
+        except OSError:
+            # Nothing written to this log yet
+            pass
+        self.finished.emit()
+
+class PlaylistExpandThread(QThread):
+    """Expand a playlist URL into its entries without downloading anything."""
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, url, options):
+        super().__init__()
+        self.expansion = PlaylistExpansion(url, options)
+
+    def cancel(self):
+        self.expansion.cancel()
+
+    def run(self):
+        try:
+            self.finished.emit(self.expansion.run())
+        except Exception as e:
+            self.error.emit(str(e))
+
+class JobTableModel(QAbstractTableModel):
+    """Table model backing the download queue view."""
+    COLUMNS = ["#", "URL", "Status", "Progress", "Formats", "Details"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.jobs = []
+        self._rows = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.jobs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        job = self.jobs[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return job.job_id
+            if column == 1:
+                return job.display_name()
+            if column == 2:
+                return job.state
+            if column == 3:
+                return f"{job.percent}%"
+            if column == 4:
+                return job.selection.summary() if job.selection else ""
+            if column == 5:
+                return job.message
+        elif role == Qt.ForegroundRole and column == 2:
+            return {
+                DownloadJob.RUNNING: QColor('#89b4fa'),
+                DownloadJob.PROCESSING: QColor('#f9e2af'),
+                DownloadJob.PAUSED: QColor('#fab387'),
+                DownloadJob.DONE: QColor('#a6e3a1'),
+                DownloadJob.FAILED: QColor('#f38ba8'),
+                DownloadJob.CANCELLED: QColor('#6c7086'),
+            }.get(job.state)
+        elif role == Qt.ToolTipRole and column == 1:
+            return job.url if not job.title else f"{job.title}\n{job.url}"
+        elif role == Qt.ToolTipRole and column == 4 and job.selection:
+            return job.selection.describe()
+        elif role == Qt.ToolTipRole and column in (2, 5) and job.history:
+            # Attempt history: when each try ran and how it ended
+            return "\n".join(
+                f"#{entry['attempt']} {time.strftime('%H:%M:%S', time.localtime(entry['started']))} "
+                f"{entry.get('result', 'running')}: {entry.get('message', '')}"
+                for entry in job.history
+            )
+        return None
+
+    def add_jobs(self, jobs):
+        if not jobs:
+            return
+        first = len(self.jobs)
+        self.beginInsertRows(QModelIndex(), first, first + len(jobs) - 1)
+        for offset, job in enumerate(jobs):
+            self._rows[job.job_id] = first + offset
+            self.jobs.append(job)
+        self.endInsertRows()
+
+    def job_changed(self, job):
+        row = self._rows.get(job.job_id)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+    def job_at(self, row):
+        return self.jobs[row]
+
+    def remove_finished(self):
+        """Drop jobs that are no longer pending or running."""
+        self.beginResetModel()
+        removed = [job for job in self.jobs if not job.is_active()]
+        self.jobs = [job for job in self.jobs if job.is_active()]
+        self._rows = {job.job_id: row for row, job in enumerate(self.jobs)}
+        self.endResetModel()
+        return removed
+
+class LogListModel(QAbstractListModel):
+    """Rows of a ``LogFile``, read from disk a block at a time as the view scrolls to them.
+
+    Only the rows on screen are asked for and a few blocks are cached. The view itself still
+    costs a little per row, so it holds the last ``MAX_ROWS`` lines (older ones are reached by
+    searching) and memory stays the same however long the log gets. With ``matches`` set only
+    those lines are shown.
+    """
+
+    CACHE_BLOCKS = 8
+    MAX_ROWS = 200000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.log = None
+        # Lines before this one were cleared from the view (they stay in the file)
+        self.cleared_line = 0
+        # First line shown when not searching, past cleared_line once MAX_ROWS are shown
+        self.first_line = 0
+        self.matches = None
+        self._count = 0
+        self._blocks = OrderedDict()
+
+    def set_log(self, log, cleared_line=0):
+        self.beginResetModel()
+        self.log = log
+        self.cleared_line = cleared_line
+        self.first_line = max(cleared_line, log.line_count - self.MAX_ROWS) if log else 0
+        self.matches = None
+        self._count = log.line_count - self.first_line if log else 0
+        self._blocks.clear()
+        self.endResetModel()
+
+    def set_matches(self, matches):
+        """Show only the given line numbers (an empty array to start a search), or everything again with None."""
+        if matches is None:
+            self.set_log(self.log, self.cleared_line)
+            return
+        self.beginResetModel()
+        self.matches = matches
+        self._count = len(matches)
+        self.endResetModel()
+
+    def add_matches(self, lines):
+        """Show more search results; False once ``MAX_ROWS`` of them are shown."""
+        lines = [line for line in lines if line >= self.cleared_line][:self.MAX_ROWS - self._count]
+        if self.matches is None:
+            return False
+        if lines:
+            self.beginInsertRows(QModelIndex(), self._count, self._count + len(lines) - 1)
+            self.matches.extend(lines)
+            self._count = len(self.matches)
+            self.endInsertRows()
+        return self._count < self.MAX_ROWS
+
+    def refresh(self):
+        """Show the lines appended to the log since the last call."""
+        if self.log is None or self.matches is not None:
+            return
+        count = self.log.line_count - self.first_line
+        if count > self._count:
+            self.beginInsertRows(QModelIndex(), self._count, count - 1)
+            self._count = count
+            self.endInsertRows()
+        excess = self._count - self.MAX_ROWS
+        if excess > 0:
+            self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+            self.first_line += excess
+            self._count -= excess
+            self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        line = self.matches[index.row()] if self.matches is not None else self.first_line + index.row()
+        block, offset = divmod(line, LOG_INDEX_STRIDE)
+        lines = self._blocks.get(block)
+        if lines is None or offset >= len(lines):
+            # Not cached, or the block was still being written when it was read
+            lines = self.log.read_lines(block * LOG_INDEX_STRIDE, LOG_INDEX_STRIDE)
+            self._blocks[block] = lines
+            if len(self._blocks) > self.CACHE_BLOCKS:
+                self._blocks.popitem(last=False)
+        self._blocks.move_to_end(block)
+        return lines[offset] if offset < len(lines) else ""
+
 class ModernYTDLPGUI(QMainWindow):
+    # Emitted from PostProcessPool threads: job, success, message
+    conversion_done = pyqtSignal(object, bool, str)
+    # Emitted from download worker threads once a result is in ui_updates
+    download_done = pyqtSignal()
+
     def __init__(self):
         super().__init__()
-        self.download_thread = None
         self.update_thread = None
+        self.bootstrap_thread = None
+        self.job_model = JobTableModel(self)
+        self.pending_jobs = deque()
+        self.running_jobs = set()
+        # Downloaded jobs handed to the PostProcessPool, with their tasks; they hold no worker slot
+        self.converting_jobs = {}
+        self.postprocess_pool = PostProcessPool()
+        # Browser cookies are exported once and shared by all downloads
+        self.session_cookies = SessionCookies()
+        self.conversion_done.connect(self.conversion_finished)
+        self.download_done.connect(self.flush_ui_updates)
+        self.retired_threads = []
+        self.log_store = JobLogStore(default_log_dir())
+        self.log_search_thread = None
+        self.import_threads = []
+        self.known_urls = set()
+        # The missing-ffmpeg warning is shown once per session
+        self.ffmpeg_warned = False
+        self.pending_count = 0
+        self.ui_updates = UiUpdateBuffer()
+        self.worker_pool = None
+        self.metadata_cache = None
+        self.metrics_recorder = None
+        self.bandwidth = BandwidthBudget()
+        self.bandwidth_timer = QTimer(self)
+        self.bandwidth_timer.timeout.connect(self.bandwidth.rebalance)
+        self.bandwidth_timer.start(BANDWIDTH_REBALANCE_INTERVAL * 1000)
+        self.site_limiter = SiteLimiter()
+        # Wakes the scheduler when a site's start interval has passed
+        self.site_timer = QTimer(self)
+        self.site_timer.setSingleShot(True)
+        self.site_timer.timeout.connect(self.schedule_jobs)
+        self.ui_update_timer = QTimer(self)
+        self.ui_update_timer.timeout.connect(self.flush_ui_updates)
+        try:
+            self.job_store = JobStore(default_job_store_path())
+            self.next_job_id = self.job_store.next_job_id()
+        except (sqlite3.Error, OSError) as e:
+            # The queue still works, it just won't survive a restart
+            print(f"Job store unavailable: {e}", file=sys.stderr)
+            self.job_store = None
+            self.next_job_id = 1
+        self.batch_total = 0
+        self.batch_finished = 0
         self.settings = QSettings('YTDLPGui', 'ModernYTDLP')
+        self.download_archive = DownloadArchive(self.settings.value('archive_path', default_archive_path()))
+        self.archive_resolver = ArchiveKeyResolver()
+        self.archive_loader = None
         self.init_ui()
         self.apply_modern_style()
         self.load_settings()
         self.setup_shortcuts()
-        self.check_clipboard_timer = QTimer()
-        self.check_clipboard_timer.timeout.connect(self.check_clipboard)
-        self.check_clipboard_timer.start(1000)  # Check every second
+        # The clipboard is only read when it changes
         self.last_clipboard = ""
+        self.clipboard_urls = []
+        # Threads filtering copied links against the download archive; only the newest one counts
+        self.clipboard_checks = []
+        self.clipboard_check = None
+        QApplication.clipboard().dataChanged.connect(self.check_clipboard)
+        
+        # Pick up where the last session stopped; the jobs start once yt-dlp is known to be there
+        self.restore_jobs()
+        self.check_clipboard()
         
         # Check for yt-dlp and install if missing
         QTimer.singleShot(100, self.check_and_install_ytdlp)
+        QTimer.singleShot(100, self.schedule_jobs)
 
     def check_and_install_ytdlp(self):
-        """Check if yt-dlp is present, if not download it."""
-        exe_name = 'yt-dlp.exe' if platform.system() == 'Windows' else 'yt-dlp'
-        
-        # Check local directory
-        local_path = os.path.join(os.getcwd(), exe_name)
-        if os.path.exists(local_path):
-            return
-
-        # Check PATH
-        import shutil
-        if shutil.which(exe_name):
+        """Check if yt-dlp is present, if not download it in the background."""
+        if ytdlp_installed():
             return
 
-        # Not found, download it
-        self.log_output.append(f"⚠️ {exe_name} not found. Downloading automatically...")
+        # Not found, download it; only starting downloads waits for it
+        self.log(
+            f"⚠️ {os.path.basename(local_ytdlp_path())} not found. Downloading automatically..."
+        )
         self.download_btn.setEnabled(False)
-        self.update_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setFormat("Downloading yt-dlp...")
         
-        try:
-            system = platform.system()
-            if system == 'Windows':
-                url = "https://github.com/yt-dlp/yt-dlp/releases/latest/download/yt-dlp.exe"
-            elif system == 'Darwin': # macOS
-                url = "https://github.com/yt-dlp/yt-dlp/releases/latest/download/yt-dlp_macos"
-            else: # Linux
-                url = "https://github.com/yt-dlp/yt-dlp/releases/latest/download/yt-dlp"
-            
-            # Download with progress
-            def progress_hook(count, block_size, total_size):
-                percent = int(count * block_size * 100 / total_size)
-                self.progress_bar.setVisible(True)
-                self.progress_bar.setValue(percent)
-                self.progress_bar.setFormat(f"Downloading yt-dlp: {percent}%")
-                QApplication.processEvents()
+        self.bootstrap_thread = BootstrapThread(local_ytdlp_path())
+        self.bootstrap_thread.progress.connect(self.bootstrap_progress)
+        self.bootstrap_thread.finished.connect(self.bootstrap_finished)
+        self.bootstrap_thread.error.connect(self.bootstrap_error)
+        self.bootstrap_thread.start()
 
-            urllib.request.urlretrieve(url, local_path, progress_hook)
-            
-            # Make executable on Unix
-            if system != 'Windows':
-                st = os.stat(local_path)
-                os.chmod(local_path, st.st_mode | stat.S_IEXEC)
-            
-            self.log_output.append(f"✅ {exe_name} downloaded and installed successfully!")
-            self.progress_bar.setVisible(False)
-            self.download_btn.setEnabled(True)
-            self.update_btn.setEnabled(True)
-            
-        except Exception as e:
-            self.log_output.append(f"❌ Failed to download yt-dlp: {str(e)}")
-            self.log_output.append("Please download it manually from https://github.com/yt-dlp/yt-dlp/releases")
+    def bootstrap_progress(self, done, total):
+        if total:
+            percent = int(done * 100 / total)
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(percent)
+            self.progress_bar.setFormat(f"Downloading yt-dlp: {percent}%")
+        else:
+            self.progress_bar.setFormat(f"Downloading yt-dlp: {format_bytes(done)}")
+
+    def bootstrap_finished(self, message):
+        self.log(f"✅ {message}")
+        self.bootstrap_done()
+
+    def bootstrap_error(self, message):
+        self.log(f"❌ Failed to download yt-dlp: {message}")
+        self.log("Please download it manually from https://github.com/yt-dlp/yt-dlp/releases")
+        self.bootstrap_done()
+
+    def bootstrap_done(self):
+        self.progress_bar.setFormat("%p%")
+        self.progress_bar.setVisible(False)
+        self.download_btn.setEnabled(True)
+        self.schedule_jobs()
+
+    def ytdlp_busy(self):
+        """Whether yt-dlp is being downloaded or updated, so no download may start."""
+        return any(thread and thread.isRunning() for thread in (self.update_thread, self.bootstrap_thread))
 
     def init_ui(self):
         self.setWindowTitle("yt-dlp Downloader")
-        self.setGeometry(100, 100, 1000, 800)
+        self.setGeometry(100, 100, 1000, 900)
         
         # Central widget
         central_widget = QWidget()
@@ -312,7 +570,7 @@ class ModernYTDLPGUI(QMainWindow):
         
         input_container = QHBoxLayout()
         self.url_input = QLineEdit()
-        self.url_input.setPlaceholderText("Paste video URL here (e.g., YouTube, Twitch, Twitter)...")
+        self.url_input.setPlaceholderText("Paste video URL here (e.g., YouTube, Twitch, Twitter), or import a list...")
         self.url_input.setMinimumHeight(45)
         
         paste_btn = QPushButton("Paste")
@@ -321,8 +579,24 @@ class ModernYTDLPGUI(QMainWindow):
         paste_btn.setMinimumHeight(45)
         paste_btn.clicked.connect(self.paste_from_clipboard)
         
+        # Offered when copied text holds several new links
+        self.queue_clipboard_btn = QPushButton()
+        self.queue_clipboard_btn.setObjectName("secondary_btn")
+        self.queue_clipboard_btn.setMinimumHeight(45)
+        self.queue_clipboard_btn.clicked.connect(self.queue_clipboard_urls)
+        self.queue_clipboard_btn.hide()
+        
+        import_btn = QPushButton("Import...")
+        import_btn.setObjectName("secondary_btn")
+        import_btn.setFixedWidth(90)
+        import_btn.setMinimumHeight(45)
+        import_btn.setToolTip("Queue every URL from a text or batch file (one URL per line)")
+        import_btn.clicked.connect(self.browse_batch_file)
+        
         input_container.addWidget(self.url_input)
         input_container.addWidget(paste_btn)
+        input_container.addWidget(self.queue_clipboard_btn)
+        input_container.addWidget(import_btn)
         url_layout.addLayout(input_container)
         
         main_layout.addWidget(url_group)
@@ -337,19 +611,17 @@ class ModernYTDLPGUI(QMainWindow):
         # Row 1: Formats
         options_layout.addWidget(QLabel("Quality Profile:"), 0, 0)
         self.format_combo = QComboBox()
-        self.format_combo.addItems([
-            "Best Quality", "1080p", "720p", "480p", "360p", "Audio Only"
-        ])
+        self.format_combo.addItems(QUALITY_PROFILES)
         options_layout.addWidget(self.format_combo, 0, 1)
         
         options_layout.addWidget(QLabel("Container:"), 0, 2)
         self.video_format_combo = QComboBox()
-        self.video_format_combo.addItems(["Auto (Best)", "MP4", "MKV", "WEBM"])
+        self.video_format_combo.addItems(CONTAINERS)
         options_layout.addWidget(self.video_format_combo, 0, 3)
         
         options_layout.addWidget(QLabel("Audio Format:"), 0, 4)
         self.audio_format_combo = QComboBox()
-        self.audio_format_combo.addItems(["mp3", "m4a", "wav", "flac"])
+        self.audio_format_combo.addItems(AUDIO_FORMATS)
         options_layout.addWidget(self.audio_format_combo, 0, 5)
 
         # Row 2: Speed Limit and Cookies
@@ -358,15 +630,141 @@ class ModernYTDLPGUI(QMainWindow):
         self.speed_limit_spin.setRange(0, 100000)
         self.speed_limit_spin.setSpecialValueText("Unlimited")
         self.speed_limit_spin.setSuffix(" KB/s")
+        self.speed_limit_spin.setToolTip("Total download speed, shared by all running jobs")
+        self.speed_limit_spin.valueChanged.connect(self.apply_bandwidth_settings)
         options_layout.addWidget(self.speed_limit_spin, 1, 1)
         
         options_layout.addWidget(QLabel("Use Cookies:"), 1, 2)
         self.cookies_combo = QComboBox()
-        self.cookies_combo.addItems(["None", "Chrome", "Firefox", "Safari", "Edge", "Brave", "Opera"])
+        self.cookies_combo.addItems(COOKIE_BROWSERS)
         self.cookies_combo.setToolTip("Use browser cookies to bypass 403 errors")
         options_layout.addWidget(self.cookies_combo, 1, 3)
 
-        # Row 3: Checkboxes
+        options_layout.addWidget(QLabel("Parallel Jobs:"), 1, 4)
+        self.max_workers_spin = QSpinBox()
+        self.max_workers_spin.setRange(1, 16)
+        self.max_workers_spin.setValue(3)
+        self.max_workers_spin.setToolTip("Number of downloads that may run at the same time")
+        self.max_workers_spin.valueChanged.connect(self.schedule_jobs)
+        options_layout.addWidget(self.max_workers_spin, 1, 5)
+
+        # Row 3: Download engine
+        options_layout.addWidget(QLabel("Engine:"), 2, 0)
+        self.engine_combo = QComboBox()
+        for engine, label in ENGINE_LABELS.items():
+            self.engine_combo.addItem(label, engine)
+        if not library_engine_available():
+            # Keep the entries visible but unselectable so users know the options exist
+            for engine in (ENGINE_LIBRARY, ENGINE_POOL):
+                index = self.engine_combo.findData(engine)
+                self.engine_combo.model().item(index).setEnabled(False)
+                self.engine_combo.setItemData(index, "Install the yt-dlp Python package to enable", Qt.ToolTipRole)
+        self.engine_combo.setToolTip(
+            "Run downloads through the yt-dlp executable, in-process via the yt_dlp package, "
+            "or in a pool of worker processes that keep yt-dlp loaded"
+        )
+        self.engine_combo.currentIndexChanged.connect(self.engine_changed)
+        options_layout.addWidget(self.engine_combo, 2, 1, 1, 2)
+        
+        options_layout.addWidget(QLabel("Playlist Range:"), 2, 3)
+        self.playlist_start_spin = QSpinBox()
+        self.playlist_start_spin.setRange(0, 1000000)
+        self.playlist_start_spin.setSpecialValueText("First")
+        self.playlist_start_spin.setToolTip("First playlist item to download")
+        options_layout.addWidget(self.playlist_start_spin, 2, 4)
+        self.playlist_end_spin = QSpinBox()
+        self.playlist_end_spin.setRange(0, 1000000)
+        self.playlist_end_spin.setSpecialValueText("Last")
+        self.playlist_end_spin.setToolTip("Last playlist item to download")
+        options_layout.addWidget(self.playlist_end_spin, 2, 5)
+
+        # Row 4: Worker pool sizing, only used by the worker pool engine
+        options_layout.addWidget(QLabel("Pool Size:"), 3, 0)
+        self.pool_size_spin = QSpinBox()
+        self.pool_size_spin.setRange(1, 64)
+        self.pool_size_spin.setValue(os.cpu_count() or 4)
+        self.pool_size_spin.setToolTip("Number of pre-loaded worker processes")
+        options_layout.addWidget(self.pool_size_spin, 3, 1)
+        
+        options_layout.addWidget(QLabel("Recycle After:"), 3, 2)
+        self.pool_recycle_spin = QSpinBox()
+        self.pool_recycle_spin.setRange(0, 10000)
+        self.pool_recycle_spin.setValue(50)
+        self.pool_recycle_spin.setSpecialValueText("Never")
+        self.pool_recycle_spin.setSuffix(" jobs")
+        self.pool_recycle_spin.setToolTip("Restart a worker process after it has run this many jobs")
+        options_layout.addWidget(self.pool_recycle_spin, 3, 3)
+        
+        options_layout.addWidget(QLabel("Worker Memory:"), 3, 4)
+        self.pool_memory_spin = QSpinBox()
+        self.pool_memory_spin.setRange(0, 65536)
+        self.pool_memory_spin.setValue(1024)
+        self.pool_memory_spin.setSpecialValueText("Unlimited")
+        self.pool_memory_spin.setSuffix(" MB")
+        self.pool_memory_spin.setToolTip("Restart a worker process once its memory use grows past this")
+        options_layout.addWidget(self.pool_memory_spin, 3, 5)
+        
+        for spin in (self.pool_size_spin, self.pool_recycle_spin, self.pool_memory_spin):
+            spin.valueChanged.connect(self.apply_pool_settings)
+
+        # Row 5: Transfer tuning for fragmented (DASH/HLS) and large downloads
+        options_layout.addWidget(QLabel("Fragments:"), 4, 0)
+        self.fragments_spin = QSpinBox()
+        self.fragments_spin.setRange(1, 64)
+        self.fragments_spin.setValue(DEFAULT_CONCURRENT_FRAGMENTS)
+        self.fragments_spin.setToolTip("Number of DASH/HLS fragments each job downloads at once")
+        options_layout.addWidget(self.fragments_spin, 4, 1)
+        
+        options_layout.addWidget(QLabel("HTTP Chunk:"), 4, 2)
+        self.http_chunk_spin = QSpinBox()
+        self.http_chunk_spin.setRange(0, 1024)
+        self.http_chunk_spin.setSpecialValueText("Off")
+        self.http_chunk_spin.setSuffix(" MB")
+        self.http_chunk_spin.setToolTip("Fetch plain HTTP downloads in ranges of this size (helps with throttled servers)")
+        options_layout.addWidget(self.http_chunk_spin, 4, 3)
+        
+        options_layout.addWidget(QLabel("Downloader:"), 4, 4)
+        downloader_layout = QHBoxLayout()
+        self.downloader_combo = QComboBox()
+        self.downloader_combo.addItems(EXTERNAL_DOWNLOADERS)
+        self.downloader_combo.setToolTip("Hand the transfer to an external downloader (must be installed)")
+        downloader_layout.addWidget(self.downloader_combo)
+        self.connections_spin = QSpinBox()
+        self.connections_spin.setRange(1, 16)
+        self.connections_spin.setValue(DEFAULT_DOWNLOADER_CONNECTIONS)
+        self.connections_spin.setSuffix(" conn.")
+        self.connections_spin.setToolTip("Connections per file for the external downloader")
+        downloader_layout.addWidget(self.connections_spin)
+        options_layout.addLayout(downloader_layout, 4, 5)
+        self.downloader_combo.currentIndexChanged.connect(self.downloader_changed)
+
+        # Row 6: Time-of-day speed limits
+        options_layout.addWidget(QLabel("Speed Schedule:"), 5, 0)
+        self.speed_schedule_input = QLineEdit()
+        self.speed_schedule_input.setPlaceholderText("e.g. 08:00-18:00=2000, 18:00-23:00=0 (KB/s, 0 = unlimited)")
+        self.speed_schedule_input.setToolTip("Time ranges whose total speed limit replaces the one above")
+        self.speed_schedule_input.editingFinished.connect(self.apply_bandwidth_settings)
+        options_layout.addWidget(self.speed_schedule_input, 5, 1, 1, 3)
+        
+        options_layout.addWidget(QLabel("Per Site:"), 5, 4)
+        site_layout = QHBoxLayout()
+        self.site_max_spin = QSpinBox()
+        self.site_max_spin.setRange(0, 16)
+        self.site_max_spin.setSpecialValueText("No limit")
+        self.site_max_spin.setSuffix(" jobs")
+        self.site_max_spin.setToolTip("Jobs from one site (e.g. youtube.com) that may run at the same time")
+        site_layout.addWidget(self.site_max_spin)
+        self.site_interval_spin = QSpinBox()
+        self.site_interval_spin.setRange(0, 600)
+        self.site_interval_spin.setSpecialValueText("No gap")
+        self.site_interval_spin.setSuffix(" s gap")
+        self.site_interval_spin.setToolTip("Minimum time between two jobs from one site starting")
+        site_layout.addWidget(self.site_interval_spin)
+        options_layout.addLayout(site_layout, 5, 5)
+        for spin in (self.site_max_spin, self.site_interval_spin):
+            spin.valueChanged.connect(self.apply_site_limits)
+
+        # Row 7: Checkboxes
         checkbox_layout = QGridLayout()
         self.extract_audio_cb = QCheckBox("Extract Audio")
         self.subtitle_cb = QCheckBox("Download Subtitles")
@@ -374,6 +772,34 @@ class ModernYTDLPGUI(QMainWindow):
         self.thumbnail_cb = QCheckBox("Thumbnail")
         self.description_cb = QCheckBox("Description")
         self.playlist_cb = QCheckBox("Process Playlist")
+        self.playlist_fanout_cb = QCheckBox("Parallel Playlist")
+        self.playlist_fanout_cb.setToolTip(
+            "List the playlist first, then download its entries as separate jobs in parallel"
+        )
+        self.archive_cb = QCheckBox("Skip Downloaded")
+        self.archive_cb.setToolTip(
+            f"Record finished downloads in {default_archive_path()} and skip anything already in it"
+        )
+        self.archive_cb.toggled.connect(self.archive_toggled)
+        self.metadata_cache_cb = QCheckBox("Cache Metadata")
+        self.metadata_cache_cb.setToolTip(
+            "Probe each URL once and reuse the extracted metadata for retries and re-downloads"
+        )
+        self.auto_retry_cb = QCheckBox("Auto-Retry")
+        self.auto_retry_cb.setToolTip(
+            "Retry network errors and throttling with increasing pauses, reload cookies after HTTP 403;\n"
+            "geo-blocks, extractor and ffmpeg errors fail at once"
+        )
+        self.select_formats_cb = QCheckBox("Pick Formats")
+        self.select_formats_cb.setToolTip(
+            "Fetch each video's format list first and pick exact formats for the quality and container,\n"
+            "showing them and the download size in the queue"
+        )
+        self.record_metrics_cb = QCheckBox("Record Metrics")
+        self.record_metrics_cb.setToolTip(
+            f"Log each job's timings and throughput to {default_metrics_path()}\n"
+            f"and keep Prometheus totals in {default_prometheus_path()}"
+        )
         
         checkbox_layout.addWidget(self.extract_audio_cb, 0, 0)
         checkbox_layout.addWidget(self.subtitle_cb, 0, 1)
@@ -381,8 +807,14 @@ class ModernYTDLPGUI(QMainWindow):
         checkbox_layout.addWidget(self.thumbnail_cb, 1, 0)
         checkbox_layout.addWidget(self.description_cb, 1, 1)
         checkbox_layout.addWidget(self.playlist_cb, 1, 2)
+        checkbox_layout.addWidget(self.metadata_cache_cb, 2, 0)
+        checkbox_layout.addWidget(self.archive_cb, 2, 1)
+        checkbox_layout.addWidget(self.playlist_fanout_cb, 2, 2)
+        checkbox_layout.addWidget(self.auto_retry_cb, 3, 0)
+        checkbox_layout.addWidget(self.record_metrics_cb, 3, 1)
+        checkbox_layout.addWidget(self.select_formats_cb, 3, 2)
         
-        options_layout.addLayout(checkbox_layout, 2, 0, 1, 6)
+        options_layout.addLayout(checkbox_layout, 6, 0, 1, 6)
         
         main_layout.addWidget(options_group)
         
@@ -414,7 +846,7 @@ class ModernYTDLPGUI(QMainWindow):
         self.download_btn.setCursor(Qt.PointingHandCursor)
         self.download_btn.clicked.connect(self.start_download)
         
-        self.cancel_btn = QPushButton("CANCEL")
+        self.cancel_btn = QPushButton("CANCEL ALL")
         self.cancel_btn.setObjectName("cancel_btn")
         self.cancel_btn.setMinimumHeight(55)
         self.cancel_btn.setCursor(Qt.PointingHandCursor)
@@ -443,11 +875,103 @@ class ModernYTDLPGUI(QMainWindow):
         self.progress_bar.setAlignment(Qt.AlignCenter)
         main_layout.addWidget(self.progress_bar)
         
-        # Log Area
-        self.log_output = QTextEdit()
-        self.log_output.setReadOnly(True)
-        self.log_output.setPlaceholderText("Download logs will appear here...")
-        main_layout.addWidget(self.log_output)
+        # Download Queue
+        queue_group = QGroupBox("Download Queue")
+        queue_layout = QVBoxLayout(queue_group)
+        queue_layout.setContentsMargins(15, 25, 15, 15)
+        
+        self.queue_view = QTableView()
+        self.queue_view.setModel(self.job_model)
+        self.queue_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.queue_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.queue_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.queue_view.verticalHeader().setVisible(False)
+        self.queue_view.setMinimumHeight(160)
+        header = self.queue_view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(1, QHeaderView.Stretch)
+        header.resizeSection(0, 50)
+        header.resizeSection(2, 90)
+        header.resizeSection(3, 80)
+        header.resizeSection(4, 130)
+        header.resizeSection(5, 220)
+        queue_layout.addWidget(self.queue_view)
+        
+        queue_actions = QHBoxLayout()
+        self.queue_status_label = QLabel("Queue is empty")
+        self.queue_status_label.setObjectName("subtitle_label")
+        
+        cancel_selected_btn = QPushButton("Cancel Selected")
+        cancel_selected_btn.setObjectName("secondary_btn")
+        cancel_selected_btn.clicked.connect(self.cancel_selected_jobs)
+        
+        pause_selected_btn = QPushButton("Pause")
+        pause_selected_btn.setObjectName("secondary_btn")
+        pause_selected_btn.setToolTip("Stop the selected jobs and free their slots; the partial files are kept")
+        pause_selected_btn.clicked.connect(self.pause_selected_jobs)
+        
+        resume_selected_btn = QPushButton("Resume")
+        resume_selected_btn.setObjectName("secondary_btn")
+        resume_selected_btn.setToolTip("Queue the selected paused jobs again; they continue from their partial files")
+        resume_selected_btn.clicked.connect(self.resume_selected_jobs)
+        
+        clear_finished_btn = QPushButton("Clear Finished")
+        clear_finished_btn.setObjectName("secondary_btn")
+        clear_finished_btn.clicked.connect(self.clear_finished_jobs)
+        
+        self.cache_stats_label = QLabel()
+        self.cache_stats_label.setObjectName("subtitle_label")
+        
+        queue_actions.addWidget(self.queue_status_label, 1)
+        queue_actions.addWidget(self.cache_stats_label)
+        queue_actions.addWidget(pause_selected_btn)
+        queue_actions.addWidget(resume_selected_btn)
+        queue_actions.addWidget(cancel_selected_btn)
+        queue_actions.addWidget(clear_finished_btn)
+        queue_layout.addLayout(queue_actions)
+        
+        main_layout.addWidget(queue_group, 1)
+        
+        # Log Area: the lines live in log files on disk; the view only reads the rows it shows
+        log_tools = QHBoxLayout()
+        self.log_filter_combo = QComboBox()
+        self.log_filter_combo.addItems(["All jobs", "Selected job"])
+        self.log_filter_combo.setToolTip("Show the whole session log, or only the job selected in the queue")
+        self.log_filter_combo.currentIndexChanged.connect(self.log_filter_changed)
+        self.queue_view.selectionModel().selectionChanged.connect(self.log_filter_changed)
+        
+        self.log_search_input = QLineEdit()
+        self.log_search_input.setPlaceholderText("Search the log (Enter)...")
+        self.log_search_input.returnPressed.connect(self.search_log)
+        self.log_search_input.textChanged.connect(lambda text: text or self.search_log())
+        self.log_regex_cb = QCheckBox("Regex")
+        self.log_search_label = QLabel()
+        self.log_search_label.setObjectName("subtitle_label")
+        
+        log_tools.addWidget(self.log_filter_combo)
+        log_tools.addWidget(self.log_search_input, 1)
+        log_tools.addWidget(self.log_regex_cb)
+        log_tools.addWidget(self.log_search_label)
+        main_layout.addLayout(log_tools)
+        
+        self.log_model = LogListModel(self)
+        self.log_model.set_log(self.log_store.session)
+        self.log_view = QTableView()
+        self.log_view.setObjectName("log_view")
+        self.log_view.setModel(self.log_model)
+        # Fixed-height rows keep the header's layout constant-size however many lines there are
+        self.log_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.log_view.verticalHeader().setDefaultSectionSize(20)
+        self.log_view.verticalHeader().hide()
+        self.log_view.horizontalHeader().hide()
+        self.log_view.horizontalHeader().setStretchLastSection(True)
+        self.log_view.setShowGrid(False)
+        self.log_view.setWordWrap(False)
+        self.log_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        copy_shortcut = QShortcut(QKeySequence.Copy, self.log_view)
+        copy_shortcut.setContext(Qt.WidgetShortcut)
+        copy_shortcut.activated.connect(self.copy_log_lines)
+        main_layout.addWidget(self.log_view, 1)
 
     def apply_modern_style(self):
         # Catppuccin Mocha inspired palette
@@ -626,7 +1150,7 @@ class ModernYTDLPGUI(QMainWindow):
                 border-radius: 6px;
             }
             
-            QTextEdit {
+            QTableView#log_view {
                 background-color: #11111b; /* Crust */
                 border: 1px solid #313244;
                 border-radius: 8px;
@@ -636,6 +1160,24 @@ class ModernYTDLPGUI(QMainWindow):
                 color: #a6adc8;
             }
             
+            QTableView {
+                background-color: #11111b;
+                border: 1px solid #313244;
+                border-radius: 8px;
+                gridline-color: #313244;
+                selection-background-color: #313244;
+                selection-color: #cdd6f4;
+            }
+
+            QHeaderView::section {
+                background-color: #181825;
+                color: #a6adc8;
+                border: none;
+                border-bottom: 1px solid #313244;
+                padding: 6px;
+                font-weight: 600;
+            }
+
             QScrollBar:vertical {
                 border: none;
                 background: #1e1e2e;
@@ -669,31 +1211,74 @@ class ModernYTDLPGUI(QMainWindow):
         clear_shortcut.activated.connect(self.clear_log)
 
     def paste_from_clipboard(self):
-        """Paste URL from clipboard."""
-        clipboard = QApplication.clipboard()
-        text = clipboard.text()
-        if text and self.is_valid_url(text):
-            self.url_input.setText(text)
+        """Paste the URL from the clipboard, or queue every URL when it holds several."""
+        urls = extract_urls(QApplication.clipboard().text())
+        if len(urls) > 1:
+            self.offer_clipboard_urls([])
+            self.import_urls(text='\n'.join(urls), source="the clipboard")
+        elif urls:
+            self.url_input.setText(urls[0])
             self.url_input.setFocus()
 
     def check_clipboard(self):
-        """Auto-detect URLs from clipboard."""
-        clipboard = QApplication.clipboard()
-        text = clipboard.text()
-        
-        if text != self.last_clipboard and self.is_valid_url(text):
-            self.last_clipboard = text
-            # Only auto-paste if URL field is empty
+        """Look for links in newly copied text: one fills an empty URL field, several are offered."""
+        text = QApplication.clipboard().text()
+        if text == self.last_clipboard:
+            return
+        self.last_clipboard = text
+        urls = [url for url in extract_urls(text) if url not in self.known_urls]
+        self.clipboard_check = None
+        if not urls or not self.archive_cb.isChecked():
+            self.clipboard_checked(None, urls)
+            return
+        # Links the import would drop as already downloaded are left out, with the same check it
+        # uses; that waits for the archive and resolves every link, so it runs off the UI thread
+        thread = UrlImportThread(text='\n'.join(urls), archive=self.download_archive,
+                                 resolver=self.archive_resolver, loader=self.archive_loader)
+        fresh = []
+        thread.urls_found.connect(fresh.extend)
+        thread.finished.connect(lambda *counts: self.clipboard_checked(thread, fresh))
+        thread.error.connect(lambda message: self.clipboard_checked(thread, urls))
+        self.clipboard_checks.append(thread)
+        self.clipboard_check = thread
+        thread.start()
+
+    def clipboard_checked(self, thread, urls):
+        """Fill the URL field with a single new link from the clipboard, or offer several."""
+        if thread is not None:
+            self.clipboard_checks.remove(thread)
+            if thread is not self.clipboard_check:
+                # The clipboard changed again while this was checked
+                return
+            self.clipboard_check = None
+        urls = [url for url in urls if url not in self.known_urls]
+        if len(urls) == 1:
             if not self.url_input.text().strip():
-                self.url_input.setText(text)
+                self.url_input.setText(urls[0])
+            urls = []
+        self.offer_clipboard_urls(urls)
+
+    def offer_clipboard_urls(self, urls):
+        """Show (or with no URLs, hide) the button that queues the links found in the clipboard."""
+        self.clipboard_urls = urls
+        if not urls:
+            self.queue_clipboard_btn.hide()
+            return
+        shown = '\n'.join(urls[:10]) + (f"\n... and {len(urls) - 10} more" if len(urls) > 10 else "")
+        self.queue_clipboard_btn.setText(f"Queue {len(urls)} Links")
+        self.queue_clipboard_btn.setToolTip(f"Links copied to the clipboard:\n{shown}")
+        self.queue_clipboard_btn.show()
+        self.log(f"📋 Found {len(urls)} new links in the clipboard")
+
+    def queue_clipboard_urls(self):
+        urls = self.clipboard_urls
+        self.offer_clipboard_urls([])
+        # Goes through the import so links already downloaded are dropped against the full archive
+        self.import_urls(text='\n'.join(urls), source="the clipboard")
 
     def is_valid_url(self, url):
         """Validate if string is a valid URL."""
-        try:
-            result = urlparse(url)
-            return all([result.scheme, result.netloc]) and result.scheme in ['http', 'https']
-        except:
-            return False
+        return is_valid_url(url)
 
     def load_settings(self):
         """Load saved settings."""
@@ -711,8 +1296,33 @@ class ModernYTDLPGUI(QMainWindow):
         self.thumbnail_cb.setChecked(self.settings.value('thumbnail', False, type=bool))
         self.description_cb.setChecked(self.settings.value('description', False, type=bool))
         self.playlist_cb.setChecked(self.settings.value('playlist', False, type=bool))
+        self.playlist_fanout_cb.setChecked(self.settings.value('playlist_fanout', False, type=bool))
+        self.playlist_start_spin.setValue(self.settings.value('playlist_start', 0, type=int))
+        self.playlist_end_spin.setValue(self.settings.value('playlist_end', 0, type=int))
+        self.metadata_cache_cb.setChecked(self.settings.value('metadata_cache', False, type=bool))
+        self.auto_retry_cb.setChecked(self.settings.value('auto_retry', True, type=bool))
+        self.record_metrics_cb.setChecked(self.settings.value('record_metrics', False, type=bool))
+        self.select_formats_cb.setChecked(self.settings.value('select_formats', False, type=bool))
+        self.archive_cb.setChecked(self.settings.value('use_archive', False, type=bool))
         self.speed_limit_spin.setValue(self.settings.value('speed_limit', 0, type=int))
+        self.speed_schedule_input.setText(self.settings.value('speed_schedule', ''))
+        self.apply_bandwidth_settings()
         self.cookies_combo.setCurrentIndex(self.settings.value('cookies_index', 0, type=int))
+        self.max_workers_spin.setValue(self.settings.value('max_workers', 3, type=int))
+        self.site_max_spin.setValue(self.settings.value('site_max_jobs', 0, type=int))
+        self.site_interval_spin.setValue(self.settings.value('site_interval', 0, type=int))
+        self.pool_size_spin.setValue(self.settings.value('pool_size', os.cpu_count() or 4, type=int))
+        self.pool_recycle_spin.setValue(self.settings.value('pool_recycle_jobs', 50, type=int))
+        self.pool_memory_spin.setValue(self.settings.value('pool_max_memory', 1024, type=int))
+        self.fragments_spin.setValue(self.settings.value('concurrent_fragments', DEFAULT_CONCURRENT_FRAGMENTS, type=int))
+        self.http_chunk_spin.setValue(self.settings.value('http_chunk_size', 0, type=int))
+        self.downloader_combo.setCurrentIndex(self.settings.value('downloader_index', 0, type=int))
+        self.connections_spin.setValue(self.settings.value('downloader_connections', DEFAULT_DOWNLOADER_CONNECTIONS, type=int))
+        self.downloader_changed()
+        engine_index = self.engine_combo.findData(self.settings.value('engine', ENGINE_SUBPROCESS))
+        if engine_index >= 0 and self.engine_combo.model().item(engine_index).isEnabled():
+            self.engine_combo.setCurrentIndex(engine_index)
+        self.engine_changed()
 
     def save_settings(self):
         """Save current settings."""
@@ -726,8 +1336,104 @@ class ModernYTDLPGUI(QMainWindow):
         self.settings.setValue('thumbnail', self.thumbnail_cb.isChecked())
         self.settings.setValue('description', self.description_cb.isChecked())
         self.settings.setValue('playlist', self.playlist_cb.isChecked())
+        self.settings.setValue('playlist_fanout', self.playlist_fanout_cb.isChecked())
+        self.settings.setValue('playlist_start', self.playlist_start_spin.value())
+        self.settings.setValue('playlist_end', self.playlist_end_spin.value())
+        self.settings.setValue('metadata_cache', self.metadata_cache_cb.isChecked())
+        self.settings.setValue('auto_retry', self.auto_retry_cb.isChecked())
+        self.settings.setValue('record_metrics', self.record_metrics_cb.isChecked())
+        self.settings.setValue('select_formats', self.select_formats_cb.isChecked())
+        self.settings.setValue('use_archive', self.archive_cb.isChecked())
         self.settings.setValue('speed_limit', self.speed_limit_spin.value())
+        self.settings.setValue('speed_schedule', self.speed_schedule_input.text())
         self.settings.setValue('cookies_index', self.cookies_combo.currentIndex())
+        self.settings.setValue('max_workers', self.max_workers_spin.value())
+        self.settings.setValue('site_max_jobs', self.site_max_spin.value())
+        self.settings.setValue('site_interval', self.site_interval_spin.value())
+        self.settings.setValue('engine', self.engine_combo.currentData())
+        self.settings.setValue('pool_size', self.pool_size_spin.value())
+        self.settings.setValue('pool_recycle_jobs', self.pool_recycle_spin.value())
+        self.settings.setValue('pool_max_memory', self.pool_memory_spin.value())
+        self.settings.setValue('concurrent_fragments', self.fragments_spin.value())
+        self.settings.setValue('http_chunk_size', self.http_chunk_spin.value())
+        self.settings.setValue('downloader_index', self.downloader_combo.currentIndex())
+        self.settings.setValue('downloader_connections', self.connections_spin.value())
+
+    def engine_changed(self):
+        uses_pool = self.engine_combo.currentData() == ENGINE_POOL
+        for spin in (self.pool_size_spin, self.pool_recycle_spin, self.pool_memory_spin):
+            spin.setEnabled(uses_pool)
+        if uses_pool:
+            # Start the workers now so they have yt-dlp loaded by the time a job arrives
+            self.get_worker_pool().warm_up()
+
+    def apply_bandwidth_settings(self):
+        try:
+            schedule = parse_bandwidth_schedule(self.speed_schedule_input.text())
+        except ValueError as e:
+            self.log(f"❌ Speed schedule ignored: {e}")
+            schedule = []
+        self.bandwidth.configure(self.speed_limit_spin.value(), schedule)
+
+    def apply_site_limits(self):
+        self.site_limiter.configure(self.site_max_spin.value(), self.site_interval_spin.value())
+        self.schedule_jobs()
+
+    def downloader_changed(self):
+        self.connections_spin.setEnabled(self.downloader_combo.currentIndex() > 0)
+
+    def archive_toggled(self, enabled):
+        if enabled and self.archive_loader is None:
+            # Reading a large archive and loading the extractors takes a moment; keep it off the UI thread
+            def load():
+                self.download_archive.refresh()
+                self.archive_resolver.warm_up()
+            self.archive_loader = threading.Thread(target=load, daemon=True)
+            self.archive_loader.start()
+
+    def is_archived(self, url):
+        """Whether ``url`` is known to be in the download archive (False if it can't be told offline)."""
+        if not self.archive_cb.isChecked() or not self.archive_resolver.ready:
+            return False
+        return self.archive_resolver.resolve(url) in self.download_archive
+
+    def get_metadata_cache(self):
+        if self.metadata_cache is None:
+            self.metadata_cache = MetadataCache(os.path.join(user_cache_dir(), 'metadata'))
+        return self.metadata_cache
+
+    def get_metrics_recorder(self):
+        if self.metrics_recorder is None:
+            self.metrics_recorder = MetricsRecorder(default_metrics_path(), default_prometheus_path())
+            port = os.environ.get('YT_DLP_GUI_METRICS_PORT')
+            if port:
+                try:
+                    self.metrics_recorder.serve(int(port))
+                    self.log(f"📊 Serving metrics at http://127.0.0.1:{port}/metrics")
+                except (ValueError, OSError) as e:
+                    self.log(f"⚠️ Could not serve metrics on port {port}: {e}")
+        return self.metrics_recorder
+
+    def record_metrics(self, job, task, state):
+        """Record a finished download's timings, if Record Metrics is on."""
+        if not self.record_metrics_cb.isChecked() or task is None:
+            return
+        metrics = task.metrics
+        self.get_metrics_recorder().record(job, metrics, state)
+        self.log(f"📊 [#{job.job_id}] {metrics.describe()}")
+
+    def get_worker_pool(self):
+        if self.worker_pool is None:
+            self.worker_pool = WorkerPool(
+                self.pool_size_spin.value(), self.pool_recycle_spin.value(), self.pool_memory_spin.value()
+            )
+        return self.worker_pool
+
+    def apply_pool_settings(self):
+        if self.worker_pool:
+            self.worker_pool.configure(
+                self.pool_size_spin.value(), self.pool_recycle_spin.value(), self.pool_memory_spin.value()
+            )
 
     def browse_output_dir(self):
         directory = QFileDialog.getExistingDirectory(self, "Select Output Directory", self.output_path.text())
@@ -735,119 +1441,581 @@ class ModernYTDLPGUI(QMainWindow):
             self.output_path.setText(directory)
             self.settings.setValue('output_dir', directory)
 
+    def collect_options(self):
+        """Snapshot the current option widgets into a download option dict."""
+        options = {
+            'extract_audio': self.extract_audio_cb.isChecked(),
+            'video_format': self.video_format_combo.currentText(),
+            'audio_format': self.audio_format_combo.currentText(),
+            'subtitle': self.subtitle_cb.isChecked(),
+            'auto_sub': self.auto_sub_cb.isChecked(),
+            'thumbnail': self.thumbnail_cb.isChecked(),
+            'description': self.description_cb.isChecked(),
+            'playlist': self.playlist_cb.isChecked(),
+            'playlist_fanout': self.playlist_fanout_cb.isChecked(),
+            'playlist_start': self.playlist_start_spin.value() or None,
+            'playlist_end': self.playlist_end_spin.value() or None,
+            'concurrent_fragments': self.fragments_spin.value(),
+            'http_chunk_size': self.http_chunk_spin.value(),
+            'external_downloader': self.downloader_combo.currentText() if self.downloader_combo.currentIndex() else None,
+            'downloader_connections': self.connections_spin.value(),
+            'cookies_browser': self.cookies_combo.currentText(),
+            'engine': self.engine_combo.currentData(),
+            'metadata_cache': self.metadata_cache_cb.isChecked(),
+            'select_formats': self.select_formats_cb.isChecked(),
+            'auto_retry': self.auto_retry_cb.isChecked(),
+            'download_archive': self.download_archive.path if self.archive_cb.isChecked() else None
+        }
+        
+        # Format selection
+        return apply_quality_profile(options, self.format_combo.currentText())
+
     def start_download(self):
         url = self.url_input.text().strip()
         if not url:
-            self.log_output.append("❌ Please enter a URL")
+            self.log("❌ Please enter a URL")
             return
         
         # Validate URL
         if not self.is_valid_url(url):
-            self.log_output.append("❌ Invalid URL. Please enter a valid http:// or https:// URL")
-            return
-        
-        if self.download_thread and self.download_thread.isRunning():
-            self.log_output.append("❌ Download already in progress")
+            self.log("❌ Invalid URL. Please enter a valid http:// or https:// URL")
             return
         
         # Block downloads while an update is running
         if self.update_thread and self.update_thread.isRunning():
-            self.log_output.append("❌ Please wait for yt-dlp update to finish before starting a download")
+            self.log("❌ Please wait for yt-dlp update to finish before starting a download")
+            return
+        
+        if self.is_archived(url):
+            self.log("⏭️ Already downloaded (found in the download archive)")
             return
         
         # Save settings
         self.save_settings()
         
-        # Get options
-        options = {
-            'extract_audio': self.extract_audio_cb.isChecked(),
-            'video_format': self.video_format_combo.currentText(),
-            'audio_format': self.audio_format_combo.currentText(),
-            'subtitle': self.subtitle_cb.isChecked(),
-            'auto_sub': self.auto_sub_cb.isChecked(),
-            'thumbnail': self.thumbnail_cb.isChecked(),
-            'description': self.description_cb.isChecked(),
-            'playlist': self.playlist_cb.isChecked(),
-            'speed_limit': self.speed_limit_spin.value(),
-            'cookies_browser': self.cookies_combo.currentText()
-        }
-        
-        # Format selection
-        format_text = self.format_combo.currentText()
-        if format_text == "Best Quality":
-            # Let yt-dlp auto-select and merge the best formats (no -f)
-            pass
-        elif format_text == "Audio Only":
-            options['extract_audio'] = True
-            # Prefer bestaudio with a safe fallback
-            options['format'] = "bestaudio/best"
-        elif format_text.endswith('p'):
-            height = format_text[:-1]
-            # Select best video up to the chosen height + best audio, with fallback to a single file up to that height
-            options['format'] = f"bestvideo[height<={height}]+bestaudio/best[height<={height}]"
-        
         output_dir = self.output_path.text().strip() or os.getcwd()
+        self.enqueue_jobs([url], self.collect_options(), output_dir)
+        self.url_input.clear()
+        self.schedule_jobs()
+
+    def enqueue_jobs(self, urls, options, output_dir):
+        """Add one job per URL to the queue, each with its own copy of the options."""
+        jobs = []
+        for url in urls:
+            job = DownloadJob(self.next_job_id, url, dict(options), output_dir)
+            # With fan-out a playlist job only expands the playlist; its entries become jobs of their own
+            job.is_playlist = bool(options.get('playlist') and options.get('playlist_fanout'))
+            jobs.append(job)
+            self.next_job_id += 1
+        converts = options.get('extract_audio') or target_container(options)
+        if jobs and converts and not self.ffmpeg_warned and ffmpeg_executable() is None:
+            self.ffmpeg_warned = True
+            self.log("⚠️ ffmpeg not found: downloads are kept in the format they come in, without conversion")
+        return self.add_jobs(jobs)
+
+    def add_jobs(self, jobs, queued=None):
+        """Show ``jobs`` in the queue and make ``queued`` (default: all of them) wait for a slot."""
+        queued = jobs if queued is None else queued
+        if not self.running_jobs and not self.pending_jobs and not self.converting_jobs:
+            # Queue was idle, start a fresh batch for the overall progress bar
+            self.batch_total = 0
+            self.batch_finished = 0
+        self.batch_total += len(queued)
+        self.pending_count += len(queued)
+        self.known_urls.update(job.url for job in jobs)
+        self.job_model.add_jobs(jobs)
+        self.pending_jobs.extend(queued)
+        if self.job_store:
+            self.job_store.add(jobs)
+        self.refresh_queue_status()
+        return jobs
+
+    def restore_jobs(self):
+        """Re-queue the jobs that were pending or running when the app last stopped."""
+        if not self.job_store:
+            return
+        jobs = self.job_store.load_unfinished()
+        if not jobs:
+            return
+        # Playlists that were already expanded only wait for their entries
+        playlists = [job for job in jobs if job.children]
+        for job in playlists:
+            job.state = DownloadJob.RUNNING
+        self.add_jobs(jobs, [job for job in jobs if not job.children and job.state == DownloadJob.PENDING])
+        for job in playlists:
+            self.update_playlist(job)
+        self.log(f"♻️ Restored {len(jobs)} unfinished job(s) from the last session")
+
+    def schedule_jobs(self):
+        """Start pending jobs until every worker slot is busy."""
+        self.retired_threads = [thread for thread in self.retired_threads if thread.isRunning()]
+        if self.ytdlp_busy():
+            return
+        while self.pending_jobs and len(self.running_jobs) < self.max_workers_spin.value():
+            # Jobs cancelled while pending stay in the deque until the limiter drops them; jobs of
+            # sites at their limit are passed over for other sites' jobs
+            job, wait = self.site_limiter.take_next(self.pending_jobs)
+            if job is None:
+                if wait is not None:
+                    self.site_timer.start(int(wait * 1000) + 10)
+                break
+            self.pending_count -= 1
+            self.start_job(job)
+        self.refresh_queue_status()
+
+    def start_job(self, job):
+        if job.is_playlist:
+            self.start_playlist_expansion(job)
+            return
+        self.log(f"🚀 [#{job.job_id}] Starting download from: {job.url}")
+        self.log(f"📁 [#{job.job_id}] Output directory: {job.output_path}")
+        if job.filename and os.path.exists(job.filename + '.part'):
+            # yt-dlp continues partial files by default, so an interrupted job picks up where it stopped
+            self.log(
+                f"↩️ [#{job.job_id}] Resuming {os.path.basename(job.filename)} "
+                f"from {format_bytes(os.path.getsize(job.filename + '.part'))}"
+            )
         
-        self.log_output.append(f"🚀 Starting download from: {url}")
-        self.log_output.append(f"📁 Output directory: {output_dir}")
-        
-        # Start download thread
-        self.download_thread = DownloadThread(url, options, output_dir)
-        self.download_thread.progress.connect(self.update_log)
-        self.download_thread.progress_percent.connect(self.update_progress)
-        self.download_thread.finished.connect(self.download_finished)
-        self.download_thread.error.connect(self.download_error)
+        pool = self.get_worker_pool() if job.options.get('engine') == ENGINE_POOL else None
+        cache = self.get_metadata_cache() if job.options.get('metadata_cache') else None
+        job.task = DownloadTask(job.url, job.options, job.output_path, self.ui_updates, job, pool, cache,
+                                job.history, self.session_cookies)
+        # The new job gets its share of the speed limit before it starts
+        self.bandwidth.add(job.task)
         
-        self.download_btn.setVisible(False)
-        self.cancel_btn.setVisible(True)
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 100)
-        self.progress_bar.setValue(0)
+        self.running_jobs.add(job)
+        self.set_job_state(job, DownloadJob.RUNNING, "Starting...")
+        if not self.ui_update_timer.isActive():
+            self.ui_update_timer.start(UI_FRAME_MS)
+        # No thread of its own: the result comes back through ui_updates, in flush_ui_updates
+        job.task.start(partial(self.download_finished, job))
+
+    def start_playlist_expansion(self, job):
+        self.log(f"📃 [#{job.job_id}] Expanding playlist: {job.url}")
+        job.thread = PlaylistExpandThread(job.url, job.options)
+        job.thread.finished.connect(partial(self.playlist_expanded, job))
+        job.thread.error.connect(partial(self.playlist_expansion_failed, job))
+        self.running_jobs.add(job)
+        self.set_job_state(job, DownloadJob.RUNNING, "Expanding playlist...")
+        job.thread.start()
+
+    def playlist_expansion_failed(self, job, error):
+        if job.cancel_requested:
+            # Cancelling stopped the yt-dlp listing the playlist
+            self.job_error(job, "Download cancelled by user")
+            return
+        download_instead, message = expansion_failure(job.options, error)
+        if not download_instead:
+            self.job_error(job, f"Playlist expansion failed: {message}")
+            return
+        self.log(
+            f"📃 [#{job.job_id}] Could not list the playlist ({message}); downloading it as one job"
+        )
+        self.requeue_as_download(job)
+
+    def requeue_as_download(self, job):
+        """Put a playlist job back at the front of the queue as one ordinary download."""
+        job.is_playlist = False
+        self.running_jobs.discard(job)
+        self.site_limiter.release(job)
+        self.retired_threads.append(job.thread)
+        job.thread = None
+        self.set_job_state(job, DownloadJob.PENDING, "")
+        self.pending_jobs.appendleft(job)
+        self.pending_count += 1
+        self.schedule_jobs()
+
+    def playlist_expanded(self, parent, playlist):
+        if parent.cancel_requested:
+            self.set_job_state(parent, DownloadJob.CANCELLED, "Download cancelled by user")
+            self.release_job(parent)
+            return
+        if playlist['title']:
+            parent.title = playlist['title']
+        if not playlist['is_playlist']:
+            # Not a playlist after all: run it as an ordinary download
+            self.requeue_as_download(parent)
+            return
         
-        self.download_thread.start()
+        child_options = dict(parent.options, playlist=False, playlist_fanout=False)
+        use_archive = bool(parent.options.get('download_archive'))
+        children = []
+        archived = duplicates = 0
+        for entry in playlist['entries']:
+            if use_archive and entry['archive_key'] in self.download_archive:
+                archived += 1
+            elif entry['url'] in self.known_urls:
+                duplicates += 1
+            else:
+                self.known_urls.add(entry['url'])
+                children.append(DownloadJob(self.next_job_id, entry['url'], dict(child_options),
+                                            parent.output_path, entry['title'], parent))
+                self.next_job_id += 1
+        parent.children = children
+        self.log(
+            f"📃 [#{parent.job_id}] {len(playlist['entries'])} entries, {len(children)} queued "
+            f"({archived} already downloaded, {duplicates} already queued)"
+        )
+        self.add_jobs(children)
+        # The expansion is done, so the playlist row gives up its worker slot to its entries
+        self.update_playlist(parent)
+        self.release_job(parent)
+
+    def update_playlist(self, parent):
+        """Refresh a playlist row from its entries, finishing it once none are left to run."""
+        children = parent.children
+        counts = {}
+        for child in children:
+            counts[child.state] = counts.get(child.state, 0) + 1
+        total = len(children)
+        finished = sum(not child.is_active() for child in children)
+        if total:
+            parent.percent = int(sum(100 if not child.is_active() else child.percent for child in children) / total)
+        failed = counts.get(DownloadJob.FAILED, 0)
+        message = f"{counts.get(DownloadJob.DONE, 0)}/{total} done"
+        if failed:
+            message += f", {failed} failed"
+        if counts.get(DownloadJob.PAUSED):
+            message += f", {counts[DownloadJob.PAUSED]} paused"
+        if finished < total:
+            self.set_job_state(parent, DownloadJob.RUNNING, message)
+        elif parent.cancel_requested or (counts.get(DownloadJob.CANCELLED) and not failed):
+            self.set_job_state(parent, DownloadJob.CANCELLED, message)
+        else:
+            parent.percent = 100
+            self.set_job_state(parent, DownloadJob.FAILED if failed else DownloadJob.DONE, message)
+
+    def set_job_state(self, job, state, message=None):
+        job.state = state
+        if message is not None:
+            job.message = message
+        self.job_model.job_changed(job)
+        if self.job_store:
+            self.job_store.record(job)
+
+    def free_slot(self, job):
+        """Give back the worker slot, site slot and bandwidth share a job holds."""
+        self.running_jobs.discard(job)
+        self.site_limiter.release(job)
+        if job.task:
+            self.bandwidth.remove(job.task)
+            job.task = None
+        if job.thread:
+            # The thread may still be unwinding after emitting its final signal
+            self.retired_threads.append(job.thread)
+            job.thread = None
+
+    def release_job(self, job):
+        """Free everything held by a job that reached a final state."""
+        self.free_slot(job)
+        self.converting_jobs.pop(job, None)
+        self.batch_finished += 1
+        if job.parent:
+            self.update_playlist(job.parent)
+        self.schedule_jobs()
+
+    def cancel_job(self, job):
+        if job.children and job.is_active():
+            job.cancel_requested = True
+            for child in job.children:
+                self.cancel_job(child)
+            self.update_playlist(job)
+        elif job.state == DownloadJob.PENDING:
+            self.set_job_state(job, DownloadJob.CANCELLED, "Cancelled before start")
+            self.pending_count -= 1
+            self.batch_finished += 1
+            if job.parent and not job.parent.cancel_requested:
+                self.update_playlist(job.parent)
+        elif job.state == DownloadJob.RUNNING and (job.task or job.thread) and not job.cancel_requested:
+            job.cancel_requested = True
+            self.set_job_state(job, DownloadJob.RUNNING, "Cancelling...")
+            (job.task or job.thread).cancel()
+        elif job.state == DownloadJob.PROCESSING and not job.cancel_requested:
+            job.cancel_requested = True
+            self.set_job_state(job, DownloadJob.PROCESSING, "Cancelling...")
+            self.converting_jobs[job].cancel()
+        elif job.state == DownloadJob.PAUSED:
+            # A paused job already left the batch
+            self.set_job_state(job, DownloadJob.CANCELLED, "Cancelled while paused")
+            if job.parent and not job.parent.cancel_requested:
+                self.update_playlist(job.parent)
+
+    def pause_job(self, job):
+        """Stop a pending or downloading job without losing its partial file, freeing its slot."""
+        if job.children:
+            for child in job.children:
+                self.pause_job(child)
+        elif job.state == DownloadJob.PENDING:
+            self.pending_count -= 1
+            self.batch_total -= 1
+            self.set_job_state(job, DownloadJob.PAUSED, "Paused")
+        elif (job.state == DownloadJob.RUNNING and job.task
+              and not job.cancel_requested and not job.pause_requested):
+            # Stopped like a cancel; job_error sees the request and parks the job instead
+            job.pause_requested = True
+            self.set_job_state(job, DownloadJob.RUNNING, "Pausing...")
+            job.task.cancel()
+
+    def resume_job(self, job):
+        """Queue a paused job again; yt-dlp continues from the partial file."""
+        if job.children:
+            for child in job.children:
+                self.resume_job(child)
+        elif job.state == DownloadJob.PAUSED:
+            if not self.running_jobs and not self.pending_jobs and not self.converting_jobs:
+                self.batch_total = 0
+                self.batch_finished = 0
+            self.batch_total += 1
+            self.pending_count += 1
+            self.set_job_state(job, DownloadJob.PENDING, "Resuming...")
+            self.pending_jobs.append(job)
+
+    def selected_jobs(self):
+        rows = {index.row() for index in self.queue_view.selectionModel().selectedRows()}
+        return [self.job_model.job_at(row) for row in sorted(rows)]
+
+    def pause_selected_jobs(self):
+        for job in self.selected_jobs():
+            self.pause_job(job)
+            if job.parent:
+                self.update_playlist(job.parent)
+        self.schedule_jobs()
+
+    def resume_selected_jobs(self):
+        for job in self.selected_jobs():
+            self.resume_job(job)
+            if job.parent:
+                self.update_playlist(job.parent)
+        self.schedule_jobs()
+
+    def cancel_selected_jobs(self):
+        """Cancel the jobs selected in the queue view."""
+        for job in self.selected_jobs():
+            self.cancel_job(job)
+        self.refresh_queue_status()
 
     def cancel_download(self):
-        """Cancel the current download."""
-        if self.download_thread and self.download_thread.isRunning():
-            self.log_output.append("🛑 Cancelling download...")
-            self.download_thread.cancel()
-            self.cancel_btn.setEnabled(False)
-
-    def update_progress(self, percent):
-        """Update progress bar with percentage."""
+        """Cancel every pending and running download."""
+        if not self.running_jobs and not self.pending_jobs and not self.converting_jobs:
+            return
+        self.log("🛑 Cancelling all downloads...")
+        for job in self.pending_jobs:
+            self.cancel_job(job)
+        self.pending_jobs.clear()
+        self.pending_count = 0
+        for job in list(self.running_jobs) + list(self.converting_jobs):
+            self.cancel_job(job)
+        self.refresh_queue_status()
+
+    def clear_finished_jobs(self):
+        removed = self.job_model.remove_finished()
+        if self.job_store:
+            self.job_store.remove(job.job_id for job in removed)
+        self.known_urls = {job.url for job in self.job_model.jobs}
+        self.refresh_queue_status()
+
+    def browse_batch_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Import URL List", self.output_path.text(), "Text files (*.txt *.list);;All files (*)"
+        )
+        if path:
+            self.import_urls(path=path)
+
+    def import_urls(self, path=None, text=None, source=None):
+        """Queue URLs from a batch file (path, '-' for stdin) or a block of text in the background."""
+        if self.update_thread and self.update_thread.isRunning():
+            self.log("❌ Please wait for yt-dlp update to finish before starting a download")
+            return
+        
+        self.save_settings()
+        options = self.collect_options()
+        output_dir = self.output_path.text().strip() or os.getcwd()
+        if source is None:
+            source = "pasted text" if text is not None else ("stdin" if path == '-' else path)
+        self.log(f"📥 Importing URLs from {source}...")
+        
+        if self.archive_cb.isChecked():
+            thread = UrlImportThread(path=path, text=text, archive=self.download_archive,
+                                     resolver=self.archive_resolver, loader=self.archive_loader)
+        else:
+            thread = UrlImportThread(path=path, text=text)
+        thread.urls_found.connect(partial(self.import_batch, thread, options, output_dir))
+        thread.finished.connect(partial(self.import_finished, thread))
+        thread.error.connect(partial(self.import_error, thread))
+        self.import_threads.append(thread)
+        thread.start()
+
+    def import_batch(self, thread, options, output_dir, urls):
+        fresh = []
+        for url in urls:
+            if url in self.known_urls:
+                thread.duplicates += 1
+            else:
+                # Track here too so duplicates inside the same batch are caught
+                self.known_urls.add(url)
+                fresh.append(url)
+        thread.added += len(fresh)
+        self.enqueue_jobs(fresh, options, output_dir)
+        self.schedule_jobs()
+
+    def import_finished(self, thread, valid, invalid, archived):
+        self.log(
+            f"✅ Imported {thread.added} URLs ({thread.duplicates} duplicates skipped, "
+            f"{archived} already downloaded, {invalid} invalid lines)"
+        )
+        self.import_threads.remove(thread)
+
+    def import_error(self, thread, message):
+        self.log(f"❌ {message}")
+        self.import_threads.remove(thread)
+
+    def flush_ui_updates(self):
+        """Apply everything the workers buffered since the last frame in one go."""
+        # Results first, so every line a finished job wrote is in the drain below
+        results = self.ui_updates.drain_results()
+        lines, progress, dropped = self.ui_updates.drain()
+        if dropped or lines:
+            entries = [(job.job_id, f"[#{job.job_id}] {line}") for job, line in lines]
+            if dropped:
+                entries.insert(0, (None, f"... {dropped} log lines skipped ..."))
+            self.log_store.write(entries)
+            self.log_changed()
+        for job, event in progress.items():
+            self.update_job_progress(job, event)
+        if progress:
+            self.update_progress()
+        for job, success, message in results:
+            (self.job_finished if success else self.job_error)(job, message)
+        if not self.running_jobs and not self.converting_jobs:
+            self.ui_update_timer.stop()
+
+    def update_job_progress(self, job, event):
+        job.last_event = event
+        task = self.job_task(job)
+        if task and task.selection:
+            job.selection = task.selection
+        if event.filename:
+            job.filename = event.filename
+        if event.percent is not None:
+            job.percent = int(event.percent)
+        if job.state in (DownloadJob.RUNNING, DownloadJob.PROCESSING) and not job.cancel_requested:
+            job.message = event.summary()
+        self.job_model.job_changed(job)
+        if self.job_store:
+            self.job_store.record(job)
+        if job.parent:
+            self.update_playlist(job.parent)
+
+    def update_progress(self):
+        """Update the overall progress bar from the jobs of the current batch."""
+        if not self.batch_total:
+            return
+        # Converting jobs count as downloaded, so the bar does not go back while they convert
+        running = sum(job.percent for job in self.running_jobs) + 100 * len(self.converting_jobs)
+        percent = int((self.batch_finished * 100 + running) / self.batch_total)
         self.progress_bar.setValue(percent)
-        self.progress_bar.setFormat(f"{percent}%")
+        self.progress_bar.setFormat(f"{self.batch_finished}/{self.batch_total} jobs - {percent}%")
 
     def update_log(self, message):
         if message:
-            self.log_output.append(message)
-            self.log_output.verticalScrollBar().setValue(
-                self.log_output.verticalScrollBar().maximum()
-            )
+            self.log(message)
 
-    def download_finished(self, message):
-        self.log_output.append(f"✅ {message}")
-        self.reset_download_ui()
+    def job_task(self, job):
+        """The DownloadTask behind a job, while it downloads or converts."""
+        if job in self.converting_jobs:
+            return self.converting_jobs[job]
+        return job.task
 
-    def download_error(self, message):
-        self.log_output.append(f"❌ {message}")
-        self.reset_download_ui()
+    def job_finished(self, job, message):
+        # Deliver the job's buffered output before reporting its result
+        self.flush_ui_updates()
+        # Finished before the pause took effect
+        job.pause_requested = False
+        if job.options.get('download_archive'):
+            self.download_archive.refresh()
+        task = self.job_task(job)
+        if job.state == DownloadJob.RUNNING and task and task.needs_conversion:
+            self.start_conversion(job, task)
+            return
+        self.log(f"✅ [#{job.job_id}] {message}")
+        job.percent = 100
+        self.record_metrics(job, task, DownloadJob.DONE)
+        self.set_job_state(job, DownloadJob.DONE, message)
+        self.release_job(job)
 
-    def reset_download_ui(self):
-        self.download_btn.setVisible(True)
-        self.cancel_btn.setVisible(False)
-        self.cancel_btn.setEnabled(True)
-        self.progress_bar.setVisible(False)
-        self.progress_bar.setValue(0)
+    def job_error(self, job, message):
+        self.flush_ui_updates()
+        if job.pause_requested and not job.cancel_requested:
+            self.job_paused(job)
+            return
+        self.log(f"❌ [#{job.job_id}] {message}")
+        state = DownloadJob.CANCELLED if job.cancel_requested else DownloadJob.FAILED
+        self.record_metrics(job, self.job_task(job), state)
+        self.set_job_state(job, state, message)
+        self.release_job(job)
+
+    def job_paused(self, job):
+        """Park a job stopped by ``pause_job``: its slot and bandwidth go to the others."""
+        job.pause_requested = False
+        self.log(f"⏸️ [#{job.job_id}] Paused")
+        self.set_job_state(job, DownloadJob.PAUSED, "Paused")
+        self.free_slot(job)
+        # It leaves the batch, and joins a batch again when resumed
+        self.batch_total -= 1
+        if job.parent:
+            self.update_playlist(job.parent)
+        self.schedule_jobs()
+
+    def start_conversion(self, job, task):
+        """Hand a downloaded job to the PostProcessPool and give its worker slot to the next download."""
+        self.log(f"🎞️ [#{job.job_id}] Downloaded, queued for conversion")
+        self.converting_jobs[job] = task
+        self.set_job_state(job, DownloadJob.PROCESSING, "Waiting for conversion...")
+        self.free_slot(job)
+        self.postprocess_pool.submit(task, partial(self.conversion_done.emit, job))
+        self.schedule_jobs()
+
+    def download_finished(self, job, success, message):
+        """Called on a worker thread when a download ends; the window picks the result up in its next flush."""
+        self.ui_updates.add_result(job, success, message)
+        # Flush now rather than at the next frame, so the slot is handed on at once
+        self.download_done.emit()
+
+    def conversion_finished(self, job, success, message):
+        (self.job_finished if success else self.job_error)(job, message)
+
+    def refresh_queue_status(self):
+        """Refresh the queue summary, overall progress and action buttons."""
+        pending = self.pending_count
+        running = len(self.running_jobs)
+        converting = len(self.converting_jobs)
+        if self.metadata_cache:
+            self.cache_stats_label.setText(self.metadata_cache.stats_text())
+        if running or pending or converting:
+            status = f"{running} running, {pending} pending"
+            if converting:
+                status = f"{running} running, {converting} converting, {pending} pending"
+            self.queue_status_label.setText(status)
+            self.cancel_btn.setVisible(True)
+            if not self.ytdlp_busy():
+                self.progress_bar.setVisible(True)
+                self.progress_bar.setRange(0, 100)
+                self.update_progress()
+        else:
+            self.queue_status_label.setText("Queue is idle" if self.job_model.jobs else "Queue is empty")
+            self.cancel_btn.setVisible(False)
+            if not self.ytdlp_busy():
+                self.progress_bar.setVisible(False)
+                self.progress_bar.setValue(0)
 
     def start_update(self):
         # Prevent update during an active download
-        if self.download_thread and self.download_thread.isRunning():
-            self.log_output.append("❌ Please wait for the current download to finish before updating yt-dlp")
+        if self.running_jobs:
+            self.log("❌ Please wait for the running downloads to finish before updating yt-dlp")
             return
         # Prevent multiple updates
         if self.update_thread and self.update_thread.isRunning():
-            self.log_output.append("❌ Update already in progress")
+            self.log("❌ Update already in progress")
             return
 
         exe_name = 'yt-dlp.exe' if platform.system() == 'Windows' else 'yt-dlp'
@@ -859,10 +2027,10 @@ class ModernYTDLPGUI(QMainWindow):
             if shutil.which(exe_name):
                 exe_path = exe_name
             else:
-                self.log_output.append(f"❌ {exe_name} not found. Please install it or place it in the app directory.")
+                self.log(f"❌ {exe_name} not found. Please install it or place it in the app directory.")
                 return
 
-        self.log_output.append("🔄 Checking for yt-dlp updates...")
+        self.log("🔄 Checking for yt-dlp updates...")
         self.update_thread = UpdateThread(exe_path)
         self.update_thread.progress.connect(self.update_log)
         self.update_thread.finished.connect(self.update_finished)
@@ -876,32 +2044,162 @@ class ModernYTDLPGUI(QMainWindow):
         self.update_thread.start()
 
     def update_finished(self, message):
-        self.log_output.append(f"✅ {message}")
+        self.log(f"✅ {message}")
         self.update_btn.setText("Update yt-dlp")
         self.update_btn.setEnabled(True)
         self.progress_bar.setVisible(False)
+        self.schedule_jobs()
 
     def update_error(self, message):
-        self.log_output.append(f"❌ {message}")
+        self.log(f"❌ {message}")
         self.update_btn.setText("Update yt-dlp")
         self.update_btn.setEnabled(True)
         self.progress_bar.setVisible(False)
+        self.schedule_jobs()
+
+    def log(self, message):
+        """Write a message to the session log; one tagged with a job ("✅ [#3] ...") also goes to that job's log."""
+        match = JOB_TAG_RE.match(message)
+        job_id = int(match.group(1)) if match else None
+        self.log_store.write([(job_id, message)])
+        self.log_changed()
+
+    def log_changed(self):
+        """Show new log lines, following the end of the log unless the user scrolled up."""
+        scroll_bar = self.log_view.verticalScrollBar()
+        at_end = scroll_bar.value() >= scroll_bar.maximum()
+        self.log_model.refresh()
+        if at_end:
+            self.log_view.scrollToBottom()
+
+    def shown_log(self):
+        """The log picked in the filter: the session's, or the selected job's (None if no job is selected)."""
+        if self.log_filter_combo.currentIndex() == 0:
+            return self.log_store.session
+        rows = self.queue_view.selectionModel().selectedRows()
+        return self.log_store.job(self.job_model.job_at(rows[0].row()).job_id) if rows else None
+
+    def log_filter_changed(self, *args):
+        log = self.shown_log()
+        if log is not self.log_model.log:
+            self.log_model.set_log(log)
+            self.search_log()
+
+    def search_log(self):
+        """Show only the lines matching the search text (substring, or regex), or all lines if it is empty."""
+        if self.log_search_thread:
+            self.log_search_thread.cancel()
+            self.log_search_thread = None
+        text = self.log_search_input.text()
+        if not text or self.log_model.log is None:
+            self.log_model.set_matches(None)
+            self.log_search_label.setText("")
+            self.log_view.scrollToBottom()
+            return
+        try:
+            pattern = re.compile(text if self.log_regex_cb.isChecked() else re.escape(text),
+                                 re.IGNORECASE | re.MULTILINE)
+        except re.error as e:
+            self.log_search_label.setText(f"Invalid regex: {e}")
+            return
+        self.log_model.set_matches(array('Q'))
+        self.log_search_label.setText("Searching...")
+        thread = LogSearchThread(self.log_model.log, pattern)
+        thread.found.connect(partial(self.log_matches_found, thread))
+        thread.finished.connect(partial(self.log_search_finished, thread))
+        self.log_search_thread = thread
+        # Cancelled searches may still be unwinding; keep a reference until they have
+        self.retired_threads.append(thread)
+        thread.start()
+
+    def log_matches_found(self, thread, lines):
+        if thread is not self.log_search_thread:
+            return
+        if self.log_model.add_matches(lines):
+            self.log_search_label.setText(f"{self.log_model.rowCount()} matching lines...")
+        else:
+            thread.cancel()
+            self.log_search_thread = None
+            self.log_search_label.setText(f"First {self.log_model.rowCount()} matching lines")
+
+    def log_search_finished(self, thread):
+        if thread is self.log_search_thread:
+            self.log_search_thread = None
+            self.log_search_label.setText(f"{self.log_model.rowCount()} matching lines")
+
+    def copy_log_lines(self):
+        rows = sorted(index.row() for index in self.log_view.selectionModel().selectedRows())
+        QApplication.clipboard().setText('\n'.join(self.log_model.data(self.log_model.index(row)) for row in rows))
 
     def clear_log(self):
-        self.log_output.clear()
+        """Clear the view; the lines stay in the log files."""
+        self.log_search_input.clear()
+        if self.log_model.log:
+            self.log_model.set_log(self.log_model.log, self.log_model.log.line_count)
 
     def closeEvent(self, event):
         """Save settings on close."""
         self.save_settings()
         
-        # Cancel any running downloads
-        if self.download_thread and self.download_thread.isRunning():
-            self.download_thread.cancel()
-            self.download_thread.wait()
+        if self.bootstrap_thread and self.bootstrap_thread.isRunning():
+            # The partial download is kept and resumed on the next start
+            self.bootstrap_thread.cancel()
+            self.bootstrap_thread.wait()
+        
+        if self.job_store:
+            # Running jobs are stopped below but stay queued in the store, to resume next time
+            for job in list(self.running_jobs) + list(self.converting_jobs):
+                if job.cancel_requested:
+                    job.state = DownloadJob.CANCELLED
+                    self.job_store.record(job)
+                elif job.pause_requested:
+                    job.state = DownloadJob.PAUSED
+                    job.message = "Paused"
+                    self.job_store.record(job)
+                elif job.state in (DownloadJob.RUNNING, DownloadJob.PROCESSING) and not job.children:
+                    job.state = DownloadJob.PENDING
+                    job.message = "Interrupted, will resume"
+                    self.job_store.record(job)
+            self.job_store.close()
+        
+        # Cancel any queued or running downloads; each cancel returns at once
+        self.pending_jobs.clear()
+        for job in list(self.running_jobs):
+            if job.task or job.thread:
+                (job.task or job.thread).cancel()
+        for task in self.converting_jobs.values():
+            task.cancel()
+        # However many jobs are running, they get SHUTDOWN_TIMEOUT between them to stop
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for job in list(self.running_jobs):
+            remaining = max(0, deadline - time.monotonic())
+            if job.thread:
+                stopped = job.thread.wait(int(remaining * 1000))
+                process = job.thread.expansion.process
+            elif job.task:
+                stopped = job.task.wait(remaining)
+                process = job.task.process
+            else:
+                continue
+            if not stopped and process and process.poll() is None:
+                signal_process_tree(process, kill=True)
+        self.postprocess_pool.shutdown()
+        self.session_cookies.close()
+        if self.worker_pool:
+            self.worker_pool.shutdown()
+        if self.metrics_recorder:
+            self.metrics_recorder.close()
         
         event.accept()
 
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Modern yt-dlp GUI")
+    parser.add_argument('urls', nargs='*', help="URLs to add to the download queue")
+    parser.add_argument('-a', '--batch-file', metavar='FILE',
+                        help="File containing URLs to download, one per line ('-' for stdin)")
+    return parser.parse_known_args(argv)[0]
+
 def main():
     app = QApplication(sys.argv)
     
@@ -909,9 +2207,17 @@ def main():
     app.setApplicationName("Modern yt-dlp GUI")
     app.setApplicationVersion("1.0")
     
+    # Qt has already removed its own arguments from sys.argv
+    args = parse_args(sys.argv[1:])
+    
     window = ModernYTDLPGUI()
     window.show()
     
+    if args.urls:
+        window.import_urls(text='\n'.join(args.urls))
+    if args.batch_file:
+        window.import_urls(path=args.batch_file)
+    
     sys.exit(app.exec_())
 
 